@@ -0,0 +1,59 @@
+
+import hashlib
+from datetime import datetime
+from typing import Any, Optional
+from fastapi import Request, Response, status
+
+# Clients may keep responses but must revalidate them with their ETag
+CACHE_CONTROL = "no-cache"
+
+def make_etag(resource_id: Any, updated_at: datetime) -> str:
+    """
+    Build the strong ETag of a version of a resource.
+    
+    Mongo keeps dates to the millisecond, so the update time is truncated
+    the same way for a freshly saved document to match its stored copy.
+    
+    Args:
+        resource_id: The ID of the resource
+        updated_at: When the resource was last updated
+        
+    Returns:
+        Quoted entity tag
+    """
+    version = f"{resource_id}:{updated_at.isoformat(timespec='milliseconds')}"
+    return f'"{hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the If-None-Match header of a request lists an ETag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    
+    if header.strip() == "*":
+        return True
+    
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def check_not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Handle a conditional GET.
+    
+    Sets the ETag on the response, so an endpoint can return early when the
+    client's copy is still current.
+    
+    Args:
+        request: The request, possibly with an If-None-Match header
+        response: The response of the endpoint
+        etag: The ETag of the current version of the resource
+        
+    Returns:
+        A 304 response if the client's copy is current, None otherwise
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return None
@@ -1,38 +1,43 @@
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import update, func, and_
+from datetime import datetime
+from loguru import logger
+from beanie import Link, PydanticObjectId
 
-from app.db.session import get_db
+from app.api.conditional import check_not_modified, make_etag
+from app.api.pagination import decode_cursor, set_page_headers
 from app.models.report import Report, ReportStatus
 from app.models.regulatory_requirement import RegulatoryRequirement
-from app.models.compliance_result import ComplianceResult
+from app.models.compliance_result import ComplianceResult, DecisionPath
+from app.models.compliance_batch import ComplianceBatch
+from app.models.job import JobStatus
 from app.schemas.compliance_result import (
     ComplianceResultCreate,
     ComplianceResultUpdate,
     ComplianceResultResponse,
-    ComplianceSummaryResponse,
-    RequirementResultResponse
+    ComplianceSummaryResponse
 )
-from app.services.compliance_checker import check_compliance_for_report
+from app.schemas.compliance_batch import ComplianceBatchCreate, ComplianceBatchResponse
+from app.services.compliance_summary import (
+    aggregate_requirement_results,
+    apply_result_changes,
+    find_compliance_summary,
+    rebuild_compliance_summary
+)
+from app.services.verdict_cache import get_verdict_cache, hash_requirement
+from app.services.job_queue import enqueue_job, enqueue_jobs, get_batch_job_counts, JOB_CHECK_COMPLIANCE
 
 router = APIRouter()
 
 @router.post("/check/{report_id}", status_code=status.HTTP_202_ACCEPTED)
-async def trigger_compliance_check(
-    report_id: int,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db)
-):
+async def trigger_compliance_check(report_id: PydanticObjectId):
     """
     Trigger a compliance check for a specific report.
     
     - **report_id**: ID of the report to check
     """
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = result.scalars().first()
+    report = await Report.get(report_id)
     
     if not report:
         raise HTTPException(
@@ -47,103 +52,259 @@ async def trigger_compliance_check(
         )
     
     # Update report status to processing
-    await db.execute(
-        update(Report)
-        .where(Report.id == report_id)
-        .values(status=ReportStatus.PROCESSING)
+    report.status = ReportStatus.PROCESSING
+    await report.save_with_timestamp()
+    
+    # Queue compliance check for the workers
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": str(report_id)})
+    
+    return {"message": f"Compliance check for report ID {report_id} has been triggered."}
+
+@router.post("/check:batch", response_model=ComplianceBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def trigger_batch_compliance_check(batch: ComplianceBatchCreate):
+    """
+    Trigger compliance checks for many reports at once.
+    
+    Reports are selected by ID and/or by filter. Only reports whose text has
+    been extracted are checked. Their status is switched to processing with a
+    single update and the checks are queued in bulk.
+    
+    - **batch**: Report IDs and/or filters selecting the reports to check
+    """
+    if batch.status in (ReportStatus.PENDING, ReportStatus.PROCESSING):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Reports with status {batch.status.value} cannot be checked."
+        )
+    
+    criteria = {"status": batch.status.value, "page_count": {"$ne": None}}
+    
+    if batch.report_ids is not None:
+        criteria["_id"] = {"$in": batch.report_ids}
+    
+    if batch.company_name:
+        criteria["company_name"] = batch.company_name
+    
+    if batch.fiscal_year:
+        criteria["fiscal_year"] = batch.fiscal_year
+    
+    new_batch = ComplianceBatch(criteria=batch.dict(exclude_none=True, exclude={"report_ids"}))
+    await new_batch.insert()
+    
+    # Claim the matching reports for this batch and mark them as processing
+    claimed = await Report.get_motor_collection().update_many(
+        criteria,
+        {"$set": {
+            "status": ReportStatus.PROCESSING.value,
+            "compliance_batch_id": new_batch.id,
+            "updated_at": datetime.utcnow()
+        }}
     )
-    await db.commit()
     
-    # Trigger background compliance check
-    background_tasks.add_task(
-        check_compliance_for_report,
-        report_id
+    # Queue one check per claimed report, reading the IDs in chunks
+    report_count = 0
+    cursor = Report.get_motor_collection().find(
+        {"compliance_batch_id": new_batch.id},
+        projection={"_id": 1},
+        batch_size=1000
     )
+    while chunk := await cursor.to_list(length=1000):
+        report_count += await enqueue_jobs(
+            JOB_CHECK_COMPLIANCE,
+            [{"report_id": str(doc["_id"])} for doc in chunk],
+            batch_id=new_batch.id
+        )
     
-    return {"message": f"Compliance check for report ID {report_id} has been triggered."}
+    new_batch.report_count = report_count
+    await new_batch.save()
+    
+    logger.info(f"Batch {new_batch.id} queued compliance checks for {report_count} reports ({claimed.modified_count} claimed)")
+    
+    return ComplianceBatchResponse(
+        batch_id=new_batch.id,
+        report_count=report_count,
+        queued_count=report_count,
+        done=report_count == 0,
+        created_at=new_batch.created_at
+    )
+
+@router.get("/batch/{batch_id}", response_model=ComplianceBatchResponse)
+async def get_batch_progress(batch_id: PydanticObjectId):
+    """
+    Get the progress of a batch compliance check.
+    
+    Finished checks stay counted after their jobs expire, so a finished
+    batch stays done.
+    
+    - **batch_id**: ID of the batch
+    """
+    batch = await ComplianceBatch.get(batch_id)
+    
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Batch with ID {batch_id} not found."
+        )
+    
+    counts = await get_batch_job_counts(batch.id)
+    # Succeeded jobs expire, so finished checks are counted on the batch.
+    # Batches from before those counts are covered by their remaining jobs
+    succeeded_count = max(batch.succeeded_count, counts.get(JobStatus.SUCCEEDED, 0))
+    failed_count = max(batch.failed_count, counts.get(JobStatus.FAILED, 0))
+    
+    return ComplianceBatchResponse(
+        batch_id=batch.id,
+        report_count=batch.report_count,
+        queued_count=counts.get(JobStatus.QUEUED, 0),
+        running_count=counts.get(JobStatus.RUNNING, 0),
+        succeeded_count=succeeded_count,
+        failed_count=failed_count,
+        done=succeeded_count + failed_count >= batch.report_count,
+        created_at=batch.created_at
+    )
 
 @router.get("/report/{report_id}", response_model=ComplianceSummaryResponse)
 async def get_compliance_summary(
-    report_id: int,
-    db: AsyncSession = Depends(get_db)
+    report_id: PydanticObjectId,
+    request: Request,
+    response: Response,
+    summary_only: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None
 ):
     """
     Get compliance check summary for a specific report.
     
+    The counts come from the report's materialized summary, built on first
+    access. The per-requirement results are joined in a single aggregation.
+    
+    The summary is marked as updated by every change to the report's
+    results or to the listed requirements, so its ETag versions the whole
+    response. While If-None-Match holds the current ETag, 304 Not Modified
+    is returned without running the aggregation.
+    
+    With a limit, the X-Next-Cursor response header holds the cursor of the
+    next page of results, absent on the last page.
+    
     - **report_id**: ID of the report to get summary for
+    - **summary_only**: If true, return only the counts without per-requirement results
+    - **skip**: Number of requirement results to skip (ignored with a cursor)
+    - **limit**: Maximum number of requirement results to return
+    - **cursor**: Cursor of the page of results to return, from X-Next-Cursor
     """
-    # Check if report exists
-    report_result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = report_result.scalars().first()
+    summary = await find_compliance_summary(report_id, dashboard=True)
     
-    if not report:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Report with ID {report_id} not found."
-        )
+    if summary is None:
+        # A lagging secondary may not have it yet, the primary is authoritative
+        summary = await find_compliance_summary(report_id)
     
-    # Get all active requirements
-    req_result = await db.execute(
-        select(RegulatoryRequirement).filter(RegulatoryRequirement.active == True)
-    )
-    requirements = req_result.scalars().all()
-    
-    # Get compliance results for this report
-    result_query = select(ComplianceResult).filter(ComplianceResult.report_id == report_id)
-    result_result = await db.execute(result_query)
-    results = result_result.scalars().all()
-    
-    # Calculate summary statistics
-    total_requirements = len(requirements)
-    compliant_count = sum(1 for r in results if r.is_compliant is True)
-    non_compliant_count = sum(1 for r in results if r.is_compliant is False)
-    pending_count = total_requirements - (compliant_count + non_compliant_count)
-    
-    overall_compliance_percentage = (compliant_count / total_requirements * 100) if total_requirements > 0 else 0
-    
-    # Create detailed results
-    detailed_results = []
-    
-    # Create a lookup dict for the results
-    results_by_req_id = {r.requirement_id: r for r in results}
-    
-    for req in requirements:
-        result = results_by_req_id.get(req.id)
-        detailed_results.append(
-            RequirementResultResponse(
-                id=req.id,
-                name=req.name,
-                description=req.description,
-                category=req.category,
-                is_compliant=result.is_compliant if result else None,
-                confidence_score=result.confidence_score if result else None,
-                extracted_evidence=result.extracted_evidence if result else None
+    if summary is None:
+        # Check if report exists, then build its summary
+        report = await Report.get(report_id)
+        
+        if not report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Report with ID {report_id} not found."
             )
+        
+        summary = await rebuild_compliance_summary(report.id)
+    
+    not_modified = check_not_modified(request, response, make_etag(report_id, summary.updated_at))
+    if not_modified:
+        return not_modified
+    
+    results = None
+    if not summary_only:
+        after = decode_cursor(cursor, 1)[0] if cursor else None
+        results = await aggregate_requirement_results(
+            report_id,
+            skip=0 if cursor else skip,
+            limit=limit,
+            after=after,
+            dashboard=True
         )
+        if limit is not None:
+            set_page_headers(response, results, limit, lambda result: (result["id"],))
+    
+    total_requirements = summary.total_requirements
     
     return ComplianceSummaryResponse(
         report_id=report_id,
         total_requirements=total_requirements,
-        compliant_count=compliant_count,
-        non_compliant_count=non_compliant_count,
-        pending_count=pending_count,
-        overall_compliance_percentage=overall_compliance_percentage,
-        results=detailed_results
+        compliant_count=summary.compliant_count,
+        non_compliant_count=summary.non_compliant_count,
+        pending_count=summary.pending_count,
+        overall_compliance_percentage=(summary.compliant_count / total_requirements * 100) if total_requirements > 0 else 0,
+        by_category=summary.by_category,
+        results=results
     )
 
-@router.post("/result", response_model=ComplianceResultResponse, status_code=status.HTTP_201_CREATED)
-async def create_compliance_result(
-    result: ComplianceResultCreate,
-    db: AsyncSession = Depends(get_db)
+@router.delete("/cache")
+async def invalidate_verdict_cache(
+    requirement_id: Optional[PydanticObjectId] = None,
+    model_version: Optional[str] = None
 ):
+    """
+    Invalidate cached LLM verdicts so the next checks call the LLM again.
+    
+    Without parameters the whole cache is cleared.
+    
+    - **requirement_id**: Only invalidate verdicts for this requirement
+    - **model_version**: Only invalidate verdicts of this model version
+    """
+    cache = get_verdict_cache()
+    
+    if cache is None:
+        return {"deleted": 0}
+    
+    requirement_hash = None
+    if requirement_id:
+        requirement = await RegulatoryRequirement.get(requirement_id)
+        
+        if not requirement:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Requirement with ID {requirement_id} not found."
+            )
+        
+        requirement_hash = hash_requirement(requirement.name, requirement.description)
+    
+    deleted = await cache.invalidate(requirement_hash=requirement_hash, model_version=model_version)
+    
+    return {"deleted": deleted}
+
+@router.get("/decisions")
+async def get_decision_path_counts(report_id: Optional[PydanticObjectId] = None):
+    """
+    Count compliance results by the path that decided them.
+    
+    Shows how many verdicts were settled by rules or the verdict cache
+    rather than by an LLM call.
+    
+    - **report_id**: Only count the results of this report
+    """
+    match = {"report.$id": report_id} if report_id else {}
+    
+    counts = {path.value: 0 for path in DecisionPath}
+    async for group in ComplianceResult.get_motor_collection().aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$decision_path", "count": {"$sum": 1}}},
+    ]):
+        counts[group["_id"] or "unknown"] = group["count"]
+    
+    return counts
+
+@router.post("/result", response_model=ComplianceResultResponse, status_code=status.HTTP_201_CREATED)
+async def create_compliance_result(result: ComplianceResultCreate):
     """
     Create a new compliance result.
     
     - **result**: Compliance result data
     """
     # Check if report exists
-    report_result = await db.execute(select(Report).filter(Report.id == result.report_id))
-    report = report_result.scalars().first()
+    report = await Report.get(result.report_id)
     
     if not report:
         raise HTTPException(
@@ -152,8 +313,7 @@ async def create_compliance_result(
         )
     
     # Check if requirement exists
-    req_result = await db.execute(select(RegulatoryRequirement).filter(RegulatoryRequirement.id == result.requirement_id))
-    requirement = req_result.scalars().first()
+    requirement = await RegulatoryRequirement.get(result.requirement_id)
     
     if not requirement:
         raise HTTPException(
@@ -162,34 +322,38 @@ async def create_compliance_result(
         )
     
     # Check if result already exists
-    existing_result = await db.execute(
-        select(ComplianceResult).filter(
-            and_(
-                ComplianceResult.report_id == result.report_id,
-                ComplianceResult.requirement_id == result.requirement_id
-            )
-        )
-    )
+    existing_result = await ComplianceResult.find_one({
+        "report.$id": report.id,
+        "requirement.$id": requirement.id
+    })
     
-    if existing_result.scalars().first():
+    if existing_result:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"A compliance result for report ID {result.report_id} and requirement ID {result.requirement_id} already exists."
         )
     
     # Create new compliance result
-    new_result = ComplianceResult(**result.dict())
-    db.add(new_result)
-    await db.commit()
-    await db.refresh(new_result)
+    new_result = ComplianceResult(
+        report=report,
+        requirement=requirement,
+        is_compliant=result.is_compliant,
+        confidence_score=result.confidence_score,
+        extracted_evidence=result.extracted_evidence,
+        requirement_version=requirement.version,
+        decision_path=DecisionPath.MANUAL
+    )
+    await new_result.insert()
+    
+    if requirement.active:
+        await apply_result_changes(report.id, [(requirement.category, None, new_result.is_compliant)])
     
-    return new_result
+    return _result_response(new_result)
 
 @router.patch("/result/{result_id}", response_model=ComplianceResultResponse)
 async def update_compliance_result(
-    result_id: int,
-    result_update: ComplianceResultUpdate,
-    db: AsyncSession = Depends(get_db)
+    result_id: PydanticObjectId,
+    result_update: ComplianceResultUpdate
 ):
     """
     Update a specific compliance result.
@@ -197,8 +361,7 @@ async def update_compliance_result(
     - **result_id**: ID of the compliance result to update
     - **result_update**: Data to update
     """
-    result = await db.execute(select(ComplianceResult).filter(ComplianceResult.id == result_id))
-    compliance_result = result.scalars().first()
+    compliance_result = await ComplianceResult.get(result_id)
     
     if not compliance_result:
         raise HTTPException(
@@ -209,15 +372,40 @@ async def update_compliance_result(
     update_data = result_update.dict(exclude_unset=True)
     
     if update_data:
-        await db.execute(
-            update(ComplianceResult)
-            .where(ComplianceResult.id == result_id)
-            .values(**update_data)
-        )
-        await db.commit()
+        previous = compliance_result.is_compliant
+        
+        for field, value in update_data.items():
+            setattr(compliance_result, field, value)
+        compliance_result.decision_path = DecisionPath.MANUAL
+        await compliance_result.save_with_timestamp()
         
-        # Refresh result data
-        result = await db.execute(select(ComplianceResult).filter(ComplianceResult.id == result_id))
-        compliance_result = result.scalars().first()
+        # Keep the report's summary in step with the new verdict
+        if compliance_result.is_compliant != previous:
+            requirement = await RegulatoryRequirement.get(_link_id(compliance_result.requirement))
+            if requirement and requirement.active:
+                await apply_result_changes(
+                    _link_id(compliance_result.report),
+                    [(requirement.category, previous, compliance_result.is_compliant)]
+                )
     
-    return compliance_result
+    return _result_response(compliance_result)
+
+def _link_id(value) -> PydanticObjectId:
+    """Get the ID of a linked document, whether or not the link was fetched."""
+    return value.ref.id if isinstance(value, Link) else value.id
+
+def _result_response(result: ComplianceResult) -> ComplianceResultResponse:
+    """Build the API response for a compliance result."""
+    return ComplianceResultResponse(
+        id=result.id,
+        report_id=_link_id(result.report),
+        requirement_id=_link_id(result.requirement),
+        is_compliant=result.is_compliant,
+        confidence_score=result.confidence_score,
+        extracted_evidence=result.extracted_evidence,
+        requirement_version=result.requirement_version,
+        decision_path=result.decision_path,
+        analysis_date=result.analysis_date,
+        created_at=result.created_at,
+        updated_at=result.updated_at
+    )
@@ -1,67 +1,100 @@
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import update
-import os
-import shutil
-from datetime import datetime
+import asyncio
 from loguru import logger
+from beanie import PydanticObjectId
+from pydantic import ValidationError
+from pymongo import DESCENDING
 
-from app.db.session import get_db
+from app.api.conditional import check_not_modified, make_etag
+from app.api.file_transfer import accel_redirect, send_file, send_stored
+from app.api.multipart_upload import UPLOAD_FORM_OPENAPI, InvalidUploadError, StreamingUpload
+from app.api.pagination import decode_cursor, keyset_filter, response_projection, set_page_headers
+from app.db.session import dashboard_collection
 from app.models.report import Report, ReportStatus
-from app.schemas.report import ReportCreate, ReportUpdate, ReportResponse, ReportDetail
-from app.services.pdf_processor import process_pdf_report
+from app.schemas.report import (
+    ReportCreate,
+    ReportUpdate,
+    ReportResponse,
+    ReportDetail,
+    ReportPageResponse,
+    ReportSearchResult,
+    ReportTextResponse,
+    ReportUploadForm
+)
+from app.services.job_queue import enqueue_job, JOB_DELETE_BLOB, JOB_PROCESS_PDF
+from app.services.storage import get_storage
+from app.services.upload_store import report_blob_key, store_upload_blob, UploadTooLargeError
+from app.services.compliance_checker import copy_compliance_results
+from app.services.compliance_summary import delete_compliance_summary
+from app.services.events import format_sse, status_message, subscribe_report_events
+from app.services.report_search import search_report_text
+from app.services.report_text import (
+    copy_report_pages,
+    delete_report_pages,
+    iter_report_pages,
+    update_report_page_metadata
+)
 from app.core.config import settings
 
 router = APIRouter()
 
-@router.post("/", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-async def upload_report(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    company_name: Optional[str] = Form(None),
-    fiscal_year: Optional[int] = Form(None),
-    db: AsyncSession = Depends(get_db)
-):
+# Order of report listings, also the key of their pagination cursor
+REPORT_SORT = [("upload_date", DESCENDING), ("_id", DESCENDING)]
+
+# Fields read for report listings
+REPORT_LIST_PROJECTION = response_projection(ReportResponse)
+
+@router.post(
+    "/",
+    response_model=ReportResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=UPLOAD_FORM_OPENAPI
+)
+async def upload_report(request: Request):
     """
     Upload a new annual report PDF file.
     
+    Files are stored by content, so uploading a file that was already
+    processed reuses its stored copy and extracted text instead of
+    processing it again. The file is streamed to disk as it is received
+    and the upload is rejected as soon as it exceeds the size limit.
+    
     - **file**: PDF file to upload
     - **company_name**: Name of the company (optional)
     - **fiscal_year**: Fiscal year of the report (optional)
+    - **reuse_results**: Copy compliance results from a previous upload of the same file
     """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File size exceeds the maximum allowed size of {settings.MAX_UPLOAD_SIZE / (1024 * 1024)}MB."
+    )
+    
+    try:
+        upload = StreamingUpload(request, "file", settings.MAX_UPLOAD_SIZE)
+        filename = await upload.read_filename()
+    except UploadTooLargeError:
+        raise too_large
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
     # Validate file extension
-    if not file.filename.lower().endswith('.pdf'):
+    if not filename.lower().endswith('.pdf'):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only PDF files are accepted."
         )
     
-    # Validate file size
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    await file.seek(0)
-    
-    if file_size > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds the maximum allowed size of {settings.MAX_UPLOAD_SIZE / (1024 * 1024)}MB."
-        )
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    file_path = os.path.join(settings.TEMP_UPLOAD_DIR, filename)
-    
-    # Save file to disk
+    # Stream file into the blob store, enforcing the size limit while reading
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "wb") as f:
-            f.write(content)
+        stored = await store_upload_blob(upload.file_chunks())
+    except UploadTooLargeError:
+        raise too_large
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error saving file: {e}")
         raise HTTPException(
@@ -69,65 +102,135 @@ async def upload_report(
             detail="Could not save the file."
         )
     
+    # The other fields may follow the file in the form
+    try:
+        form = ReportUploadForm(**await upload.read_fields())
+    except (InvalidUploadError, ValidationError) as e:
+        # No report refers to the stored file, delete it unless another one does
+        await enqueue_job(
+            JOB_DELETE_BLOB,
+            {"key": stored.key, "content_hash": stored.sha256},
+            delay_seconds=settings.BLOB_DELETE_DELAY_SECONDS
+        )
+        if isinstance(e, ValidationError):
+            raise RequestValidationError(e.errors())
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Look for an already processed copy of the same content
+    duplicate = None
+    if stored.deduplicated:
+        duplicate = await Report.find(
+            {"content_hash": stored.sha256, "page_count": {"$ne": None}}
+        ).sort(-Report.upload_date).first_or_none()
+    
     # Create database record
     new_report = Report(
-        file_name=file.filename,
-        file_path=file_path,
-        file_size=file_size,
+        file_name=filename,
+        storage_key=stored.key,
+        file_size=stored.size,
+        content_hash=stored.sha256,
         status=ReportStatus.PENDING,
-        company_name=company_name,
-        fiscal_year=fiscal_year
+        company_name=form.company_name,
+        fiscal_year=form.fiscal_year
     )
     
-    db.add(new_report)
-    await db.commit()
-    await db.refresh(new_report)
+    if duplicate:
+        new_report.page_count = duplicate.page_count
+        new_report.status = ReportStatus.COMPLETED
     
-    # Process PDF in background
-    background_tasks.add_task(
-        process_pdf_report,
-        new_report.id,
-        file_path
-    )
+    await new_report.insert()
+    
+    if duplicate:
+        logger.info(f"Report ID {new_report.id} is a duplicate of report ID {duplicate.id}, skipping processing")
+        await copy_report_pages(duplicate.id, new_report)
+        if form.reuse_results:
+            await copy_compliance_results(duplicate, new_report)
+    else:
+        # Queue PDF processing for the workers
+        await enqueue_job(JOB_PROCESS_PDF, {"report_id": str(new_report.id)})
     
     return new_report
 
 @router.get("/", response_model=List[ReportResponse])
 async def list_reports(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[ReportStatus] = None,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None
 ):
     """
     List all uploaded reports with optional filtering and pagination.
     
-    - **skip**: Number of reports to skip (for pagination)
+    Reports are returned newest first. The X-Next-Cursor response header
+    holds the cursor of the next page, absent on the last page, and
+    X-Total-Count the number of matching reports. Paging with the cursor
+    costs the same at any depth, unlike skip.
+    
+    - **skip**: Number of reports to skip (ignored with a cursor)
     - **limit**: Maximum number of reports to return
     - **status**: Filter reports by status
+    - **cursor**: Cursor of the page to return, from X-Next-Cursor
     """
-    query = select(Report).offset(skip).limit(limit).order_by(Report.upload_date.desc())
+    filters = {}
     
     if status:
-        query = query.filter(Report.status == status)
+        filters["status"] = status.value
+    
+    query = dict(filters)
+    if cursor:
+        query.update(keyset_filter(REPORT_SORT, decode_cursor(cursor, len(REPORT_SORT))))
+    
+    collection = dashboard_collection(Report)
+    find = collection.find(query, projection=REPORT_LIST_PROJECTION).sort(REPORT_SORT)
+    if not cursor:
+        find = find.skip(skip)
+    
+    documents, total = await asyncio.gather(
+        find.limit(limit).to_list(length=limit),
+        collection.count_documents(filters) if filters else collection.estimated_document_count()
+    )
+    reports = [{"id": document.pop("_id"), **document} for document in documents]
     
-    result = await db.execute(query)
-    reports = result.scalars().all()
+    set_page_headers(response, reports, limit, lambda report: (report["upload_date"], report["id"]), total)
     
     return reports
 
-@router.get("/{report_id}", response_model=ReportDetail)
-async def get_report(
-    report_id: int,
-    db: AsyncSession = Depends(get_db)
+@router.get("/search", response_model=List[ReportSearchResult])
+async def search_reports(
+    q: str = Query(..., min_length=1, max_length=500),
+    company_name: Optional[str] = None,
+    fiscal_year: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
 ):
+    """
+    Search the extracted text of all reports.
+    
+    Reports are ranked by their best matching pages, each returned with a
+    snippet around its hit. Terms are matched by stem; quote a phrase to
+    match it exactly and prefix a term with - to exclude it.
+    
+    - **q**: Search terms
+    - **company_name**: Only search the reports of this company
+    - **fiscal_year**: Only search the reports of this fiscal year
+    - **skip**: Number of ranked reports to skip
+    - **limit**: Maximum number of reports to return
+    """
+    return await search_report_text(q, company_name=company_name, fiscal_year=fiscal_year, skip=skip, limit=limit)
+
+@router.get("/{report_id}", response_model=ReportDetail)
+async def get_report(report_id: PydanticObjectId, request: Request, response: Response):
     """
     Get detailed information about a specific report.
     
+    The extracted text is not included, see the text endpoint. The ETag
+    response header changes whenever the report does; sending it back in
+    If-None-Match returns 304 Not Modified while the report is unchanged.
+    
     - **report_id**: ID of the report to retrieve
     """
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = result.scalars().first()
+    report = await Report.get(report_id)
     
     if not report:
         raise HTTPException(
@@ -135,20 +238,152 @@ async def get_report(
             detail=f"Report with ID {report_id} not found."
         )
     
+    not_modified = check_not_modified(request, response, make_etag(report.id, report.updated_at))
+    if not_modified:
+        return not_modified
+    
     return report
 
-@router.get("/{report_id}/download")
-async def download_report(
-    report_id: int,
-    db: AsyncSession = Depends(get_db)
+@router.get("/{report_id}/text", response_model=ReportTextResponse)
+async def get_report_text(
+    report_id: PydanticObjectId,
+    page: Optional[int] = Query(None, ge=1),
+    limit: int = Query(1, ge=1, le=100)
 ):
+    """
+    Get the extracted text of a specific report.
+    
+    Without a page, the whole text is streamed as plain text one page at a
+    time. With a page, that page and the following ones (up to the limit)
+    are returned as JSON.
+    
+    - **report_id**: ID of the report
+    - **page**: 1-based number of the first page to return
+    - **limit**: Maximum number of pages to return
+    """
+    report = await Report.get(report_id)
+    
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Report with ID {report_id} not found."
+        )
+    
+    if not report.page_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The text for this report is not available."
+        )
+    
+    if page is None:
+        async def stream_text():
+            async for report_page in iter_report_pages(report.id):
+                yield report_page.text + "\n\n"
+        
+        return StreamingResponse(stream_text(), media_type="text/plain; charset=utf-8")
+    
+    pages = [report_page async for report_page in iter_report_pages(report.id, first_page=page, limit=limit)]
+    
+    return ReportTextResponse(
+        report_id=report.id,
+        page_count=report.page_count,
+        pages=[ReportPageResponse(page_number=p.page_number, text=p.text) for p in pages]
+    )
+
+@router.get("/{report_id}/events")
+async def stream_report_events(report_id: PydanticObjectId, request: Request):
+    """
+    Stream the progress of a report as server-sent events.
+    
+    The current status is sent first, then status changes of the extraction
+    and compliance check jobs and the per-requirement progress of compliance
+    checks as they happen. Comment lines are sent as keep-alives while idle.
+    
+    - **report_id**: ID of the report to follow
+    """
+    report = await Report.get(report_id)
+    
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Report with ID {report_id} not found."
+        )
+    
+    async def event_stream():
+        async with subscribe_report_events(report_id) as queue:
+            # Read the status after subscribing, so no transition is missed
+            current = await Report.get(report_id)
+            if current:
+                yield format_sse(status_message(current))
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{report_id}/ws")
+async def report_events_websocket(websocket: WebSocket, report_id: PydanticObjectId):
+    """
+    Send the progress of a report over a WebSocket.
+    
+    Same events as the server-sent events stream, as JSON messages.
+    """
+    report = await Report.get(report_id)
+    
+    if not report:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Report not found")
+        return
+    
+    await websocket.accept()
+    
+    try:
+        async with subscribe_report_events(report_id) as queue:
+            current = await Report.get(report_id)
+            if current:
+                await websocket.send_json(status_message(current))
+            
+            # Detect the client closing the socket while waiting for events
+            receiving = asyncio.create_task(websocket.receive_text())
+            try:
+                while True:
+                    getting = asyncio.create_task(queue.get())
+                    done, _ = await asyncio.wait({getting, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                    
+                    if receiving in done:
+                        getting.cancel()
+                        receiving.result()  # Raises WebSocketDisconnect when closed
+                        receiving = asyncio.create_task(websocket.receive_text())
+                        continue
+                    
+                    await websocket.send_json(getting.result())
+            finally:
+                receiving.cancel()
+    except WebSocketDisconnect:
+        pass
+
+@router.get("/{report_id}/download")
+async def download_report(report_id: PydanticObjectId, request: Request):
     """
     Download the original PDF file for a specific report.
     
+    Supports single byte ranges (Range and If-Range), so PDF viewers can
+    fetch the parts they display, and conditional requests: the ETag is
+    the SHA-256 of the file content. Files in S3 are streamed with ranged
+    reads. With DOWNLOAD_ACCEL_REDIRECT_PREFIX set, the fronting nginx
+    sends locally stored files instead of the API.
+    
     - **report_id**: ID of the report to download
     """
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = result.scalars().first()
+    report = await Report.get(report_id)
     
     if not report:
         raise HTTPException(
@@ -156,32 +391,41 @@ async def download_report(
             detail=f"Report with ID {report_id} not found."
         )
     
-    if not os.path.exists(report.file_path):
+    key = report_blob_key(report)
+    storage = get_storage()
+    size = await storage.size(key) if key else None
+    
+    if size is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The file for this report is not available."
         )
     
-    return FileResponse(
-        path=report.file_path,
-        filename=report.file_name,
-        media_type="application/pdf"
-    )
+    # Stored files never change, so the content hash and upload date version them
+    etag = f'"{report.content_hash}"' if report.content_hash else None
+    
+    # Locally stored files can go out with sendfile, or be sent by the proxy
+    path = storage.local_path(key)
+    if path is None:
+        return send_stored(request, storage, key, size, report.file_name, "application/pdf", etag, report.upload_date)
+    
+    if settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        return accel_redirect(path, report.file_name, "application/pdf", etag, report.upload_date)
+    
+    return send_file(request, path, report.file_name, "application/pdf", etag, report.upload_date)
 
 @router.patch("/{report_id}", response_model=ReportResponse)
-async def update_report(
-    report_id: int,
-    report_update: ReportUpdate,
-    db: AsyncSession = Depends(get_db)
-):
+async def update_report(report_id: PydanticObjectId, report_update: ReportUpdate):
     """
     Update information about a specific report.
     
+    A new company name or fiscal year is also copied onto the report's
+    extracted pages, which searches filter on.
+    
     - **report_id**: ID of the report to update
     - **report_update**: Data to update
     """
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = result.scalars().first()
+    report = await Report.get(report_id)
     
     if not report:
         raise HTTPException(
@@ -192,31 +436,27 @@ async def update_report(
     update_data = report_update.dict(exclude_unset=True)
     
     if update_data:
-        await db.execute(
-            update(Report)
-            .where(Report.id == report_id)
-            .values(**update_data)
-        )
-        await db.commit()
+        for field, value in update_data.items():
+            setattr(report, field, value)
+        await report.save_with_timestamp()
         
-        # Refresh report data
-        result = await db.execute(select(Report).filter(Report.id == report_id))
-        report = result.scalars().first()
+        if "company_name" in update_data or "fiscal_year" in update_data:
+            await update_report_page_metadata(report)
     
     return report
 
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_report(
-    report_id: int,
-    db: AsyncSession = Depends(get_db)
-):
+async def delete_report(report_id: PydanticObjectId):
     """
     Delete a specific report and its associated file.
     
+    The stored file is removed by a background job after
+    BLOB_DELETE_DELAY_SECONDS, and only if no report refers to the same
+    content by then, which covers duplicates uploaded meanwhile.
+    
     - **report_id**: ID of the report to delete
     """
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    report = result.scalars().first()
+    report = await Report.get(report_id)
     
     if not report:
         raise HTTPException(
@@ -224,16 +464,17 @@ async def delete_report(
             detail=f"Report with ID {report_id} not found."
         )
     
-    # Delete file if it exists
-    if os.path.exists(report.file_path):
-        try:
-            os.remove(report.file_path)
-        except Exception as e:
-            logger.error(f"Error deleting file {report.file_path}: {e}")
-            # Continue with deletion even if file removal fails
-    
-    # Delete database record
-    await db.delete(report)
-    await db.commit()
+    # Delete database records
+    await delete_report_pages(report.id)
+    await delete_compliance_summary(report.id)
+    await report.delete()
+    
+    key = report_blob_key(report)
+    if key:
+        await enqueue_job(
+            JOB_DELETE_BLOB,
+            {"key": key, "content_hash": report.content_hash},
+            delay_seconds=settings.BLOB_DELETE_DELAY_SECONDS
+        )
     
     return None
@@ -1,80 +1,119 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from beanie import PydanticObjectId
+from pymongo import ASCENDING
 
-from app.db.session import get_db
-from app.models.regulatory_requirement import RegulatoryRequirement
+from app.api.conditional import check_not_modified, make_etag
+from app.api.pagination import decode_cursor, keyset_filter, response_projection, set_page_headers
+from app.db.session import dashboard_collection
+from app.models.regulatory_requirement import RegulatoryRequirement, RequirementRules
 from app.schemas.regulatory_requirement import (
     RegulatoryRequirementCreate,
     RegulatoryRequirementUpdate,
     RegulatoryRequirementResponse
 )
+from app.services.compliance_summary import sync_requirement_summaries, touch_compliance_summaries
+from app.services.job_queue import enqueue_job, JOB_RECHECK_REQUIREMENTS
+from app.services.rule_matcher import validate_rules
 
 router = APIRouter()
 
+# Order of requirement listings, also the key of their pagination cursor
+REQUIREMENT_SORT = [("_id", ASCENDING)]
+
+# Fields read for requirement listings
+REQUIREMENT_LIST_PROJECTION = response_projection(RegulatoryRequirementResponse)
+
 @router.post("/", response_model=RegulatoryRequirementResponse, status_code=status.HTTP_201_CREATED)
-async def create_requirement(
-    requirement: RegulatoryRequirementCreate,
-    db: AsyncSession = Depends(get_db)
-):
+async def create_requirement(requirement: RegulatoryRequirementCreate, recheck: bool = True):
     """
     Create a new regulatory requirement.
     
+    An active requirement is checked against all processed reports in the
+    background, unless ``recheck`` is false.
+    
     - **requirement**: Regulatory requirement data
+    - **recheck**: Whether to check the existing reports against the requirement
     """
     new_requirement = RegulatoryRequirement(**requirement.dict())
-    db.add(new_requirement)
-    await db.commit()
-    await db.refresh(new_requirement)
+    _validate_rules(new_requirement.rules)
+    await new_requirement.insert()
+    
+    # Count the new requirement in every report's summary
+    await sync_requirement_summaries(
+        new_requirement.id,
+        was_active=False,
+        old_category=None,
+        is_active=new_requirement.active,
+        new_category=new_requirement.category
+    )
+    
+    if recheck and new_requirement.active:
+        await enqueue_job(JOB_RECHECK_REQUIREMENTS, {"requirement_ids": [str(new_requirement.id)]})
     
     return new_requirement
 
 @router.get("/", response_model=List[RegulatoryRequirementResponse])
 async def list_requirements(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     active_only: bool = False,
     category: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None
 ):
     """
     List all regulatory requirements with optional filtering and pagination.
     
-    - **skip**: Number of requirements to skip (for pagination)
+    Requirements are returned in ID order. The X-Next-Cursor response
+    header holds the cursor of the next page, absent on the last page, and
+    X-Total-Count the number of matching requirements.
+    
+    - **skip**: Number of requirements to skip (ignored with a cursor)
     - **limit**: Maximum number of requirements to return
     - **active_only**: If true, return only active requirements
     - **category**: Filter requirements by category
+    - **cursor**: Cursor of the page to return, from X-Next-Cursor
     """
-    query = select(RegulatoryRequirement).offset(skip).limit(limit)
+    filters = {}
     
     if active_only:
-        query = query.filter(RegulatoryRequirement.active == True)
+        filters["active"] = True
     
     if category:
-        query = query.filter(RegulatoryRequirement.category == category)
+        filters["category"] = category
     
-    result = await db.execute(query)
-    requirements = result.scalars().all()
+    query = dict(filters)
+    if cursor:
+        query.update(keyset_filter(REQUIREMENT_SORT, decode_cursor(cursor, len(REQUIREMENT_SORT))))
+    
+    collection = dashboard_collection(RegulatoryRequirement)
+    find = collection.find(query, projection=REQUIREMENT_LIST_PROJECTION).sort(REQUIREMENT_SORT)
+    if not cursor:
+        find = find.skip(skip)
+    
+    documents, total = await asyncio.gather(
+        find.limit(limit).to_list(length=limit),
+        collection.count_documents(filters) if filters else collection.estimated_document_count()
+    )
+    requirements = [{"id": document.pop("_id"), **document} for document in documents]
+    
+    set_page_headers(response, requirements, limit, lambda requirement: (requirement["id"],), total)
     
     return requirements
 
 @router.get("/{requirement_id}", response_model=RegulatoryRequirementResponse)
-async def get_requirement(
-    requirement_id: int,
-    db: AsyncSession = Depends(get_db)
-):
+async def get_requirement(requirement_id: PydanticObjectId, request: Request, response: Response):
     """
     Get a specific regulatory requirement by ID.
     
+    Returns 304 Not Modified when If-None-Match holds the current ETag.
+    
     - **requirement_id**: ID of the requirement to retrieve
     """
-    result = await db.execute(
-        select(RegulatoryRequirement).filter(RegulatoryRequirement.id == requirement_id)
-    )
-    requirement = result.scalars().first()
+    requirement = await RegulatoryRequirement.get(requirement_id)
     
     if not requirement:
         raise HTTPException(
@@ -82,24 +121,32 @@ async def get_requirement(
             detail=f"Requirement with ID {requirement_id} not found."
         )
     
+    not_modified = check_not_modified(request, response, make_etag(requirement.id, requirement.updated_at))
+    if not_modified:
+        return not_modified
+    
     return requirement
 
 @router.patch("/{requirement_id}", response_model=RegulatoryRequirementResponse)
 async def update_requirement(
-    requirement_id: int,
+    requirement_id: PydanticObjectId,
     requirement_update: RegulatoryRequirementUpdate,
-    db: AsyncSession = Depends(get_db)
+    recheck: bool = True
 ):
     """
     Update a specific regulatory requirement.
     
+    Activating, deactivating or re-categorising a requirement updates the
+    compliance summaries of all reports. Changing the name, description or
+    rules bumps the requirement version; the processed reports are then re-checked
+    against this requirement only, in the background. Activating it also
+    triggers a re-check, which skips results already at the current version.
+    
     - **requirement_id**: ID of the requirement to update
     - **requirement_update**: Data to update
+    - **recheck**: Whether to re-check the existing reports against the requirement
     """
-    result = await db.execute(
-        select(RegulatoryRequirement).filter(RegulatoryRequirement.id == requirement_id)
-    )
-    requirement = result.scalars().first()
+    requirement = await RegulatoryRequirement.get(requirement_id)
     
     if not requirement:
         raise HTTPException(
@@ -109,36 +156,49 @@ async def update_requirement(
     
     update_data = requirement_update.dict(exclude_unset=True)
     
+    if update_data.get("rules") is not None:
+        update_data["rules"] = RequirementRules(**update_data["rules"])
+        _validate_rules(update_data["rules"])
+    
     if update_data:
-        await db.execute(
-            update(RegulatoryRequirement)
-            .where(RegulatoryRequirement.id == requirement_id)
-            .values(**update_data)
-        )
-        await db.commit()
+        was_active, old_category = requirement.active, requirement.category
+        changed = {
+            field for field, value in update_data.items()
+            if value != getattr(requirement, field)
+        }
+        content_changed = bool(changed & {"name", "description", "rules"})
+        
+        for field, value in update_data.items():
+            setattr(requirement, field, value)
+        if content_changed:
+            requirement.version += 1
+        await requirement.save_with_timestamp()
         
-        # Refresh requirement data
-        result = await db.execute(
-            select(RegulatoryRequirement).filter(RegulatoryRequirement.id == requirement_id)
+        await sync_requirement_summaries(
+            requirement.id,
+            was_active=was_active,
+            old_category=old_category,
+            is_active=requirement.active,
+            new_category=requirement.category
         )
-        requirement = result.scalars().first()
+        
+        # Every report's results list the requirement's name and description
+        if requirement.active and changed & {"name", "description"}:
+            await touch_compliance_summaries()
+        
+        if recheck and requirement.active and (content_changed or not was_active):
+            await enqueue_job(JOB_RECHECK_REQUIREMENTS, {"requirement_ids": [str(requirement.id)]})
     
     return requirement
 
 @router.delete("/{requirement_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_requirement(
-    requirement_id: int,
-    db: AsyncSession = Depends(get_db)
-):
+async def delete_requirement(requirement_id: PydanticObjectId):
     """
     Delete a specific regulatory requirement.
     
     - **requirement_id**: ID of the requirement to delete
     """
-    result = await db.execute(
-        select(RegulatoryRequirement).filter(RegulatoryRequirement.id == requirement_id)
-    )
-    requirement = result.scalars().first()
+    requirement = await RegulatoryRequirement.get(requirement_id)
     
     if not requirement:
         raise HTTPException(
@@ -146,9 +206,28 @@ async def delete_requirement(
             detail=f"Requirement with ID {requirement_id} not found."
         )
     
-    await db.execute(
-        delete(RegulatoryRequirement).where(RegulatoryRequirement.id == requirement_id)
+    await requirement.delete()
+    
+    # Stop counting the requirement in the reports' summaries
+    await sync_requirement_summaries(
+        requirement.id,
+        was_active=requirement.active,
+        old_category=requirement.category,
+        is_active=False,
+        new_category=requirement.category
     )
-    await db.commit()
     
     return None
+
+def _validate_rules(rules: Optional[RequirementRules]) -> None:
+    """Reject matching rules that cannot be compiled."""
+    if rules is None:
+        return
+    
+    try:
+        validate_rules(rules)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -0,0 +1,57 @@
+
+import asyncio
+from fastapi import APIRouter, HTTPException, status
+
+from app.core.config import settings
+from app.db.pool_metrics import get_pool_metrics
+from app.services.page_cache import get_page_cache
+
+router = APIRouter()
+
+@router.get("/mongo-pool")
+async def get_mongo_pool_metrics():
+    """
+    Get the Mongo connection pool settings and statistics of this process.
+    
+    Per server: open and checked out connections, operations waiting for
+    a connection now and at most, check-outs and their wait times, and
+    failed check-outs by reason. A growing wait time or frequent timeouts
+    mean the pool is too small for the API concurrency.
+    """
+    return {
+        "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+        "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "read_preference": settings.MONGO_READ_PREFERENCE,
+        "dashboard_read_preference": settings.MONGO_DASHBOARD_READ_PREFERENCE,
+        "servers": get_pool_metrics().snapshot()
+    }
+
+@router.get("/page-cache")
+async def get_page_cache_stats():
+    """
+    Get the settings and statistics of the page text cache on this host.
+    
+    Hits and misses are cumulative page lookups of every process sharing
+    the cache file. A low hit rate with the cache at max_bytes means
+    entries are evicted before they are reused.
+    """
+    if not settings.PAGE_CACHE_ENABLED:
+        return {"enabled": False}
+    
+    try:
+        cache = await asyncio.to_thread(get_page_cache)
+        stats = await asyncio.to_thread(cache.stats)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Page cache unavailable: {e}"
+        )
+    
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "enabled": True,
+        "path": settings.PAGE_CACHE_PATH,
+        **stats,
+        "hit_rate": stats["hits"] / lookups if lookups else None
+    }
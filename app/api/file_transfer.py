@@ -0,0 +1,322 @@
+
+import os
+import posixpath
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+
+from app.api.conditional import CACHE_CONTROL, etag_matches
+from app.core.config import settings
+from app.services.storage import StorageBackend
+
+# ASGI extension letting the server send a file with sendfile(2)
+ZEROCOPY_SEND_EXTENSION = "http.response.zerocopysend"
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when a requested byte range lies outside the file."""
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse the Range header of a request for a single byte range.
+    
+    Malformed headers and requests for several ranges are ignored, as the
+    HTTP spec allows, and answered with the whole file.
+    
+    Args:
+        header: Value of the Range header
+        size: Size of the file in bytes
+        
+    Returns:
+        First and last byte offset of the range (inclusive), or None to send the whole file
+        
+    Raises:
+        RangeNotSatisfiableError: If the range does not overlap the file
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    
+    first, dash, last = ranges.strip().partition("-")
+    if not dash:
+        return None
+    
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiableError(header)
+            return max(size - length, 0), size - 1
+        
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    
+    if start >= size:
+        raise RangeNotSatisfiableError(header)
+    
+    if start > end:
+        return None
+    
+    return start, min(end, size - 1)
+
+def _if_range_matches(header: Optional[str], etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """Check whether a range request still applies to the current file (If-Range, strong comparison)."""
+    if header is None:
+        return True
+    
+    header = header.strip()
+    if header.startswith(('"', "W/")):
+        return etag is not None and header == etag
+    
+    try:
+        date = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    
+    return last_modified is not None and date == _http_date_time(last_modified)
+
+def _http_date_time(value: datetime) -> datetime:
+    """Convert a naive UTC datetime to the precision of an HTTP date."""
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def _file_headers(
+    filename: str,
+    media_type: str,
+    etag: Optional[str],
+    last_modified: Optional[datetime]
+) -> Dict[str, str]:
+    headers = {
+        "Content-Type": media_type,
+        "Content-Disposition": _content_disposition(filename),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": CACHE_CONTROL,
+    }
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(_http_date_time(last_modified), usegmt=True)
+    return headers
+
+class FileRangeResponse(Response):
+    """
+    Response sending a byte range of a file.
+    
+    When the server supports the zero-copy send extension, the range is
+    handed to it as a file descriptor and sent with sendfile(2), without
+    passing through the application. Otherwise it is read and sent in
+    chunks off the event loop.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        length: int,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None,
+        chunk_size: Optional[int] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        self.path = path
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size or settings.DOWNLOAD_CHUNK_SIZE
+        self.status_code = status_code
+        self.background = background
+        self.init_headers({**(headers or {}), "Content-Length": str(length)})
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, "rb") as file:
+                if ZEROCOPY_SEND_EXTENSION in scope.get("extensions", {}):
+                    await send({
+                        "type": ZEROCOPY_SEND_EXTENSION,
+                        "file": file.wrapped,
+                        "offset": self.start,
+                        "count": self.length,
+                        "more_body": False,
+                    })
+                else:
+                    await self._send_chunks(file, send)
+        
+        if self.background is not None:
+            await self.background()
+    
+    async def _send_chunks(self, file, send: Send) -> None:
+        await file.seek(self.start)
+        remaining = self.length
+        
+        while remaining > 0:
+            chunk = await file.read(min(self.chunk_size, remaining))
+            if not chunk:
+                # The file was truncated, end the body early
+                break
+            remaining -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def _select_range(
+    request: Request,
+    size: int,
+    headers: Dict[str, str],
+    etag: Optional[str],
+    last_modified: Optional[datetime]
+) -> Union[Response, Tuple[int, int, int, Dict[str, str]]]:
+    """
+    Evaluate the conditional and range headers of a request for content.
+    
+    Handles If-None-Match (304), a single-range Range header (206, or 416
+    when the range is outside the content) and If-Range, which only applies
+    the range while the client's copy is still current.
+    
+    Returns:
+        A response to send as is, or the status code, first byte offset,
+        length and headers of the content to send
+    """
+    if etag and etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    range_header = request.headers.get("range")
+    
+    if range_header and _if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiableError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        
+        if byte_range is not None:
+            start, end = byte_range
+            return (
+                status.HTTP_206_PARTIAL_CONTENT,
+                start,
+                end - start + 1,
+                {**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+            )
+    
+    return status.HTTP_200_OK, 0, size, headers
+
+def send_file(
+    request: Request,
+    path: str,
+    filename: str,
+    media_type: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """
+    Answer a (possibly conditional or ranged) request for a local file.
+    
+    Args:
+        request: The request for the file
+        path: Path of the file
+        filename: Name offered to the client for saving the file
+        media_type: Content type of the file
+        etag: Strong ETag of the file content, if known
+        last_modified: When the file content last changed (naive UTC), if known
+        
+    Returns:
+        The response to send
+    """
+    headers = _file_headers(filename, media_type, etag, last_modified)
+    selected = _select_range(request, os.path.getsize(path), headers, etag, last_modified)
+    if isinstance(selected, Response):
+        return selected
+    
+    status_code, start, length, headers = selected
+    return FileRangeResponse(path, start, length, status_code=status_code, headers=headers)
+
+def send_stored(
+    request: Request,
+    storage: StorageBackend,
+    key: str,
+    size: int,
+    filename: str,
+    media_type: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """
+    Answer a (possibly conditional or ranged) request for a stored object.
+    
+    Only the requested range is read from the storage backend, and it is
+    streamed to the client as it arrives.
+    
+    Args:
+        request: The request for the object
+        storage: The storage backend holding the object
+        key: Key of the object
+        size: Size of the object in bytes
+        filename: Name offered to the client for saving the file
+        media_type: Content type of the file
+        etag: Strong ETag of the object content, if known
+        last_modified: When the object content last changed (naive UTC), if known
+        
+    Returns:
+        The response to send
+    """
+    headers = _file_headers(filename, media_type, etag, last_modified)
+    selected = _select_range(request, size, headers, etag, last_modified)
+    if isinstance(selected, Response):
+        return selected
+    
+    status_code, start, length, headers = selected
+    return StreamingResponse(
+        storage.read_range(key, start, length),
+        status_code=status_code,
+        headers={**headers, "Content-Length": str(length)}
+    )
+
+def accel_redirect(
+    path: str,
+    filename: str,
+    media_type: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """
+    Let the fronting proxy send a file from the upload directory.
+    
+    The X-Accel-Redirect header points nginx at the file under the
+    internal location configured as DOWNLOAD_ACCEL_REDIRECT_PREFIX, and
+    nginx then serves the bytes, ranges included, itself.
+    
+    Args:
+        path: Path of the file, under TEMP_UPLOAD_DIR
+        filename: Name offered to the client for saving the file
+        media_type: Content type of the file
+        etag: Strong ETag of the file content, if known
+        last_modified: When the file content last changed (naive UTC), if known
+        
+    Returns:
+        The empty response carrying the redirect
+    """
+    relative = os.path.relpath(path, settings.TEMP_UPLOAD_DIR).replace(os.sep, "/")
+    location = posixpath.join(settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX, quote(relative))
+    
+    headers = _file_headers(filename, media_type, etag, last_modified)
+    headers["X-Accel-Redirect"] = location
+    return Response(headers=headers)
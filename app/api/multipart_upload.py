@@ -0,0 +1,219 @@
+
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+from app.services.upload_store import UploadTooLargeError
+
+# Room left in the body for the boundaries, part headers and form fields
+MAX_FORM_OVERHEAD = 64 * 1024
+
+# OpenAPI description of a form uploading a file, as the body is parsed by hand
+UPLOAD_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "company_name": {"type": "string"},
+                        "fiscal_year": {"type": "integer"},
+                        "reuse_results": {"type": "boolean", "default": True},
+                    },
+                }
+            }
+        },
+    }
+}
+
+class InvalidUploadError(Exception):
+    """Raised when an upload request is not a well-formed form carrying the file."""
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+class StreamingUpload:
+    """
+    Multipart form upload parsed as the request body arrives.
+    
+    Unlike ``UploadFile`` parameters, which are only passed to the handler
+    once the whole body has been spooled to a temporary file, the file
+    part is handed over chunk by chunk as it is received, and reading
+    stops as soon as it exceeds the size limit. Only one body chunk is held
+    in memory at a time. The other form fields are kept as strings.
+    
+    Read the file with ``read_filename`` and ``file_chunks``, then the
+    remaining fields with ``read_fields``.
+    """
+    
+    def __init__(self, request: Request, file_field: str, max_size: int):
+        """
+        Start parsing an upload request.
+        
+        Args:
+            request: The upload request
+            file_field: Name of the form field carrying the file
+            max_size: Maximum size of the file in bytes
+            
+        Raises:
+            InvalidUploadError: If the request is not a multipart form
+            UploadTooLargeError: If the announced body is larger than the file size limit allows
+        """
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise InvalidUploadError("Expected a multipart/form-data body")
+        
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_size + MAX_FORM_OVERHEAD:
+            raise UploadTooLargeError(max_size)
+        
+        self.file_field = file_field
+        self.filename: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+        
+        self._body = request.stream()
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+        
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._header_field = b""
+        self._header_value = b""
+        # Name of the field being read, None while reading the file or skipping a part
+        self._part_field: Optional[str] = None
+        self._part_data = bytearray()
+        self._overhead = 0
+        self._in_file = False
+        self._file_done = False
+        self._file_chunks: Deque[bytes] = deque()
+        self._body_done = False
+    
+    async def read_filename(self) -> str:
+        """
+        Read the body up to the start of the file.
+        
+        Returns:
+            The file name sent by the client
+            
+        Raises:
+            InvalidUploadError: If the form has no file
+        """
+        while self.filename is None:
+            if not await self._feed():
+                raise InvalidUploadError(f"Missing file field {self.file_field!r}")
+        return self.filename
+    
+    async def file_chunks(self) -> AsyncIterator[bytes]:
+        """
+        Yield the content of the file as it arrives.
+        
+        Raises:
+            InvalidUploadError: If the body ends within the file
+        """
+        await self.read_filename()
+        
+        while True:
+            while self._file_chunks:
+                yield self._file_chunks.popleft()
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise InvalidUploadError("Upload ended before the end of the file")
+    
+    async def read_fields(self) -> Dict[str, str]:
+        """
+        Read the rest of the body.
+        
+        Returns:
+            The form fields other than the file
+        """
+        while await self._feed():
+            # Content of files after the upload is dropped
+            self._file_chunks.clear()
+        return self.fields
+    
+    async def _feed(self) -> bool:
+        """Parse the next chunk of the body; False once the whole body has been parsed."""
+        if self._body_done:
+            return False
+        
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            chunk = b""
+        
+        try:
+            if chunk:
+                self._parser.write(chunk)
+                return True
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise InvalidUploadError(f"Malformed multipart body: {e}")
+        
+        self._body_done = True
+        return False
+    
+    def _on_part_begin(self) -> None:
+        self._headers = []
+    
+    def _count_overhead(self, size: int) -> None:
+        self._overhead += size
+        if self._overhead > MAX_FORM_OVERHEAD:
+            raise InvalidUploadError("Form fields are too large")
+    
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._count_overhead(end - start)
+        self._header_field += data[start:end]
+    
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._count_overhead(end - start)
+        self._header_value += data[start:end]
+    
+    def _on_header_end(self) -> None:
+        self._headers.append((self._header_field.lower(), self._header_value))
+        self._header_field = b""
+        self._header_value = b""
+    
+    def _on_headers_finished(self) -> None:
+        disposition = dict(self._headers).get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        name = _decode(options.get(b"name", b""))
+        filename = options.get(b"filename")
+        
+        self._part_field = None
+        self._part_data = bytearray()
+        
+        if filename is None:
+            self._part_field = name
+        elif name == self.file_field and self.filename is None:
+            self.filename = _decode(filename)
+            self._in_file = True
+    
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._file_chunks.append(bytes(data[start:end]))
+        elif self._part_field is not None:
+            self._count_overhead(end - start)
+            self._part_data += data[start:end]
+    
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+        elif self._part_field is not None:
+            self.fields[self._part_field] = _decode(bytes(self._part_data))
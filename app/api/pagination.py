@@ -0,0 +1,114 @@
+
+import base64
+import binascii
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+from bson import json_util
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+
+# Response headers of paginated listings
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last returned item as an opaque cursor.
+    
+    Args:
+        values: Values of the sort fields, in sort order
+        
+    Returns:
+        URL-safe cursor string
+    """
+    return base64.urlsafe_b64encode(json_util.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor: The cursor from the client
+        size: Expected number of sort values
+        
+    Returns:
+        Values of the sort fields
+        
+    Raises:
+        HTTPException: If the cursor is invalid
+    """
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        values = None
+    
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor."
+        )
+    
+    return values
+
+def keyset_filter(sort: Sequence[Tuple[str, int]], values: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Build the filter selecting the items after a cursor.
+    
+    For a sort on (a desc, b desc) and cursor values (x, y) this is
+    ``a < x or (a == x and b < y)``, which Mongo answers with an index
+    seek on the sort fields however deep the page is.
+    
+    Args:
+        sort: (field, direction) pairs, direction 1 for ascending and -1 for descending
+        values: Values of the sort fields from the cursor
+        
+    Returns:
+        Mongo filter document
+    """
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {name: value for (name, _), value in zip(sort[:position], values[:position])}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[position]}
+        branches.append(branch)
+    
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+def response_projection(schema: Type[BaseModel]) -> Dict[str, int]:
+    """
+    Build the projection of the fields a listing returns.
+    
+    Listings read raw documents, so projecting them on the response schema
+    keeps fields the client never sees from being read and transferred.
+    
+    Args:
+        schema: The response schema of the listed items
+        
+    Returns:
+        Mongo projection document (the ``_id`` is returned as ``id``)
+    """
+    return {field: 1 for field in schema.__fields__ if field != "id"}
+
+def set_page_headers(
+    response: Response,
+    items: List[Any],
+    limit: int,
+    sort_key: Callable[[Any], Sequence[Any]],
+    total: Optional[int] = None
+) -> None:
+    """
+    Set the pagination headers of a listing.
+    
+    A next cursor is only returned when the page is full, so a client
+    pages until the header is absent.
+    
+    Args:
+        response: The response to set the headers on
+        items: The returned page
+        limit: The requested page size
+        sort_key: Function giving the sort values of an item
+        total: Number of matching items, if known
+    """
+    if items and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key(items[-1]))
+    
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
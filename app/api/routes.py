@@ -1,6 +1,6 @@
 
 from fastapi import APIRouter
-from app.api.endpoints import reports, requirements, compliance
+from app.api.endpoints import reports, requirements, compliance, system
 
 router = APIRouter()
 
@@ -8,3 +8,4 @@ router = APIRouter()
 router.include_router(reports.router, prefix="/reports", tags=["reports"])
 router.include_router(requirements.router, prefix="/requirements", tags=["requirements"])
 router.include_router(compliance.router, prefix="/compliance", tags=["compliance"])
+router.include_router(system.router, prefix="/system", tags=["system"])
@@ -15,6 +15,75 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     TEMP_UPLOAD_DIR: str = os.getenv("TEMP_UPLOAD_DIR", "./uploads")
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", "20971520"))  # 20MB default
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "1048576"))  # 1MB per read
+    DOWNLOAD_CHUNK_SIZE: int = int(os.getenv("DOWNLOAD_CHUNK_SIZE", "262144"))  # 256KB per read without sendfile
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX: str = os.getenv("DOWNLOAD_ACCEL_REDIRECT_PREFIX", "")  # empty = the API sends the files
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")  # local (under TEMP_UPLOAD_DIR) or s3
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "compliance-reports")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")  # empty = AWS, set for MinIO or moto
+    S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")  # empty = default AWS credential chain
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_PART_SIZE: int = int(os.getenv("S3_PART_SIZE", "8388608"))  # 8MB multipart parts
+    S3_MAX_CONCURRENCY: int = int(os.getenv("S3_MAX_CONCURRENCY", "4"))  # parts transferred at once per file
+    BLOB_DELETE_DELAY_SECONDS: float = float(os.getenv("BLOB_DELETE_DELAY_SECONDS", "600"))  # files of deleted reports are removed after this
+    PDF_EXTRACTION_WORKERS: int = int(os.getenv("PDF_EXTRACTION_WORKERS", "0"))  # 0 = one per CPU core
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+    OCR_MIN_TEXT_CHARS: int = int(os.getenv("OCR_MIN_TEXT_CHARS", "20"))  # below this a page is OCR'd
+    OCR_DPI: int = int(os.getenv("OCR_DPI", "300"))
+    OCR_LANGUAGE: str = os.getenv("OCR_LANGUAGE", "eng")
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "True").lower() == "true"
+    PAGE_CACHE_PATH: str = os.getenv("PAGE_CACHE_PATH", "./cache/page_text.sqlite3")
+    PAGE_CACHE_MAX_BYTES: int = int(os.getenv("PAGE_CACHE_MAX_BYTES", "536870912"))  # 512MB default
+    SEARCH_LANGUAGE: str = os.getenv("SEARCH_LANGUAGE", "english")  # stemming and stop words of the text index
+    SEARCH_MAX_PAGE_HITS: int = int(os.getenv("SEARCH_MAX_PAGE_HITS", "1000"))  # best matching pages ranked per search
+    SEARCH_SNIPPET_PAGES: int = int(os.getenv("SEARCH_SNIPPET_PAGES", "3"))  # pages with a snippet per report
+    SEARCH_SNIPPET_CHARS: int = int(os.getenv("SEARCH_SNIPPET_CHARS", "240"))
+    COMPLIANCE_CONCURRENCY: int = int(os.getenv("COMPLIANCE_CONCURRENCY", "10"))  # requirements checked at once
+    LLM_RATE_LIMIT_PER_SECOND: float = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", "5"))  # 0 = unlimited
+    LLM_RATE_LIMIT_BURST: int = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "stub")  # stub or http
+    LLM_API_URL: str = os.getenv("LLM_API_URL", "http://localhost:8100")
+    LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_ATTEMPTS: int = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+    LLM_RETRY_BACKOFF_SECONDS: float = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "1"))
+    LLM_RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_BACKOFF_MAX_SECONDS", "30"))
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    LLM_BATCH_SIZE: int = int(os.getenv("LLM_BATCH_SIZE", "5"))  # requirements of a category per call, 1 = no batching
+    LLM_STUB_LATENCY_SECONDS: float = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0.5"))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "5"))  # passages sent to the LLM per requirement
+    RETRIEVAL_PASSAGE_CHARS: int = int(os.getenv("RETRIEVAL_PASSAGE_CHARS", "1500"))
+    RETRIEVAL_PASSAGE_OVERLAP: int = int(os.getenv("RETRIEVAL_PASSAGE_OVERLAP", "200"))
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))  # jobs run at once per worker process
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF_SECONDS: float = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "10"))
+    JOB_RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("JOB_RETRY_BACKOFF_MAX_SECONDS", "600"))
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", "604800"))  # keep finished jobs 7 days
+    SUMMARY_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("SUMMARY_RECONCILE_INTERVAL_SECONDS", "600"))  # 0 = never
+    LLM_MODEL_VERSION: str = os.getenv("LLM_MODEL_VERSION", "simulated-v1")  # bump when the model or prompt changes
+    VERDICT_CACHE_ENABLED: bool = os.getenv("VERDICT_CACHE_ENABLED", "True").lower() == "true"
+    VERDICT_CACHE_TTL_SECONDS: int = int(os.getenv("VERDICT_CACHE_TTL_SECONDS", "2592000"))  # 30 days
+    VERDICT_CACHE_LRU_SIZE: int = int(os.getenv("VERDICT_CACHE_LRU_SIZE", "10000"))
+    VERDICT_CACHE_SYNC_SECONDS: float = float(os.getenv("VERDICT_CACHE_SYNC_SECONDS", "5"))  # how often invalidations reach other processes
+    EVENT_POLL_INTERVAL_SECONDS: float = float(os.getenv("EVENT_POLL_INTERVAL_SECONDS", "1"))  # when change streams are unavailable
+    EVENT_HEARTBEAT_SECONDS: float = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+    EVENT_RETENTION_SECONDS: int = int(os.getenv("EVENT_RETENTION_SECONDS", "3600"))
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))  # 0 = no limit
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))  # 0 = wait for the server selection timeout
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "")  # e.g. zstd,snappy,zlib
+    MONGO_READ_PREFERENCE: str = os.getenv("MONGO_READ_PREFERENCE", "primary")
+    MONGO_DASHBOARD_READ_PREFERENCE: str = os.getenv("MONGO_DASHBOARD_READ_PREFERENCE", "primary")  # listings and summaries
+    MONGO_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))  # -1 = no limit, else at least 90
+    QUERY_PLAN_CHECK_ENABLED: bool = os.getenv("QUERY_PLAN_CHECK_ENABLED", "True").lower() == "true"  # warn at startup on unindexed queries
     DB_NAME: str = "compliance_db"  # Extract from MongoDB URL or set explicitly
 
     class Config:
@@ -0,0 +1,123 @@
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from pymongo import monitoring
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool statistics of the Mongo client, per server.
+    
+    Tracks open and checked out connections, how many operations are
+    waiting for a connection, and how long check-outs wait, so the pool
+    can be sized against the actual concurrency. PyMongo calls the
+    listener from its own threads, hence the lock.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, Any]] = {}
+        self._local = threading.local()
+    
+    def _server(self, address) -> Dict[str, Any]:
+        key = "%s:%s" % address
+        server = self._servers.get(key)
+        if server is None:
+            server = self._servers[key] = {
+                "open": 0,
+                "checked_out": 0,
+                "waiting": 0,
+                "max_waiting": 0,
+                "checkouts": 0,
+                "checkout_failures": Counter(),
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0,
+                "cleared": 0,
+            }
+        return server
+    
+    def _end_wait(self, event) -> float:
+        """Close the wait started on this thread, returning its duration."""
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        server = self._server(event.address)
+        server["waiting"] = max(server["waiting"] - 1, 0)
+        return time.monotonic() - started if started is not None else 0.0
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)["cleared"] += 1
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)["open"] += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["open"] = max(server["open"] - 1, 0)
+    
+    def connection_check_out_started(self, event):
+        # The started and finished events of a check-out fire on the same thread
+        self._local.checkout_started = time.monotonic()
+        with self._lock:
+            server = self._server(event.address)
+            server["waiting"] += 1
+            server["max_waiting"] = max(server["max_waiting"], server["waiting"])
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._end_wait(event)
+            self._server(event.address)["checkout_failures"][event.reason] += 1
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            waited = self._end_wait(event)
+            server = self._server(event.address)
+            server["checked_out"] += 1
+            server["checkouts"] += 1
+            server["wait_seconds_total"] += waited
+            server["wait_seconds_max"] = max(server["wait_seconds_max"], waited)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["checked_out"] = max(server["checked_out"] - 1, 0)
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the current statistics.
+        
+        Returns:
+            Statistics by server address, including the average check-out wait
+        """
+        with self._lock:
+            servers = {}
+            for address, server in self._servers.items():
+                stats = dict(server, checkout_failures=dict(server["checkout_failures"]))
+                stats["wait_seconds_avg"] = server["wait_seconds_total"] / server["checkouts"] if server["checkouts"] else 0.0
+                servers[address] = stats
+            return servers
+
+# Shared listener, registered on the Mongo client
+_pool_metrics: Optional[PoolMetrics] = None
+
+def get_pool_metrics() -> PoolMetrics:
+    """Get the process-wide connection pool listener."""
+    global _pool_metrics
+    if _pool_metrics is None:
+        _pool_metrics = PoolMetrics()
+    return _pool_metrics
@@ -0,0 +1,179 @@
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+from beanie import Document
+from bson import ObjectId
+from loguru import logger
+from pymongo import ASCENDING, DESCENDING
+
+from app.models.compliance_result import ComplianceResult
+from app.models.compliance_summary import ComplianceSummary
+from app.models.job import Job, JobStatus
+from app.models.regulatory_requirement import RegulatoryRequirement
+from app.models.report import Report, ReportStatus
+from app.models.report_event import ReportEvent
+from app.models.report_page import ReportPage
+from app.models.verdict_cache_entry import VerdictCacheEntry
+
+@dataclass
+class QueryShape:
+    """A query run by the application, with placeholder values, whose plan is checked at startup."""
+    name: str
+    model: Type[Document]
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+    projection: Optional[Dict[str, int]] = None
+
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime(2000, 1, 1)
+
+# Query paths of the API, the checker and the job queue. Register new
+# query paths here so a missing index shows up as a startup warning.
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape(
+        "list reports",
+        Report,
+        {"$or": [{"upload_date": {"$lt": _SAMPLE_DATE}}, {"upload_date": _SAMPLE_DATE, "_id": {"$lt": _SAMPLE_ID}}]},
+        [("upload_date", DESCENDING), ("_id", DESCENDING)]
+    ),
+    QueryShape(
+        "list reports by status",
+        Report,
+        {"status": ReportStatus.COMPLETED.value, "upload_date": {"$lt": _SAMPLE_DATE}},
+        [("upload_date", DESCENDING), ("_id", DESCENDING)]
+    ),
+    QueryShape(
+        "find processed copy of an upload",
+        Report,
+        {"content_hash": "0" * 64, "page_count": {"$ne": None}},
+        [("upload_date", DESCENDING)]
+    ),
+    QueryShape(
+        "select reports for a batch check",
+        Report,
+        {"status": ReportStatus.COMPLETED.value, "page_count": {"$ne": None}, "company_name": "Example", "fiscal_year": 2023}
+    ),
+    QueryShape(
+        "select reports of a year for a batch check",
+        Report,
+        {"status": ReportStatus.COMPLETED.value, "page_count": {"$ne": None}, "fiscal_year": 2023}
+    ),
+    QueryShape("reports of a batch check", Report, {"compliance_batch_id": _SAMPLE_ID}, projection={"_id": 1}),
+    QueryShape("processed reports to re-check", Report, {"page_count": {"$gt": 0}}, projection={"_id": 1}),
+    QueryShape(
+        "list requirements",
+        RegulatoryRequirement,
+        {"_id": {"$gt": _SAMPLE_ID}},
+        [("_id", ASCENDING)]
+    ),
+    QueryShape(
+        "list requirements by category",
+        RegulatoryRequirement,
+        {"category": "SEC", "_id": {"$gt": _SAMPLE_ID}},
+        [("_id", ASCENDING)]
+    ),
+    QueryShape(
+        "list active requirements",
+        RegulatoryRequirement,
+        {"active": True, "_id": {"$gt": _SAMPLE_ID}},
+        [("_id", ASCENDING)]
+    ),
+    QueryShape(
+        "list active requirements by category",
+        RegulatoryRequirement,
+        {"active": True, "category": "SEC", "_id": {"$gt": _SAMPLE_ID}},
+        [("_id", ASCENDING)]
+    ),
+    QueryShape("pages of a report", ReportPage, {"report_id": _SAMPLE_ID, "page_number": {"$gte": 1}}, [("page_number", ASCENDING)]),
+    QueryShape("search report text", ReportPage, {"$text": {"$search": "climate risk"}, "fiscal_year": 2023}),
+    QueryShape("results of a report", ComplianceResult, {"report.$id": _SAMPLE_ID}),
+    QueryShape(
+        "result of a requirement check",
+        ComplianceResult,
+        {"report.$id": _SAMPLE_ID, "requirement.$id": {"$in": [_SAMPLE_ID]}}
+    ),
+    QueryShape(
+        "verdicts for a requirement",
+        ComplianceResult,
+        {"requirement.$id": _SAMPLE_ID, "is_compliant": True},
+        projection={"report": 1}
+    ),
+    QueryShape("summary of a report", ComplianceSummary, {"report_id": _SAMPLE_ID}),
+    QueryShape("summaries to reconcile", ComplianceSummary, {"results_changed_at": {"$gte": _SAMPLE_DATE}}),
+    QueryShape(
+        "claim a job",
+        Job,
+        {"$or": [
+            {"status": JobStatus.QUEUED.value, "run_after": {"$lte": _SAMPLE_DATE}},
+            {
+                "status": JobStatus.RUNNING.value,
+                "lease_expires_at": {"$lt": _SAMPLE_DATE},
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+            },
+        ]},
+        [("run_after", ASCENDING)]
+    ),
+    QueryShape(
+        "fail exhausted jobs",
+        Job,
+        {
+            "status": JobStatus.RUNNING.value,
+            "lease_expires_at": {"$lt": _SAMPLE_DATE},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+        }
+    ),
+    QueryShape("jobs of a batch", Job, {"batch_id": _SAMPLE_ID}),
+    QueryShape("poll report events", ReportEvent, {"created_at": {"$gte": _SAMPLE_DATE}}, [("created_at", ASCENDING)]),
+    QueryShape("cached verdict", VerdictCacheEntry, {"key": "0" * 64, "created_at": {"$gt": _SAMPLE_DATE}}),
+]
+
+def _stages(plan: Any) -> Iterator[str]:
+    """Yield the stage names of an explained query plan, at any depth."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+async def verify_query_plans(shapes: Optional[List[QueryShape]] = None) -> List[str]:
+    """
+    Explain each registered query and warn about collection scans.
+    
+    A collection scan means no index serves the query, so it gets slower
+    as the collection grows. This only plans the queries, it does not run
+    them.
+    
+    Args:
+        shapes: The queries to check (all registered queries by default)
+        
+    Returns:
+        Names of the queries planned as collection scans
+    """
+    scans = []
+    
+    for shape in shapes or QUERY_SHAPES:
+        cursor = shape.model.get_motor_collection().find(shape.filter, projection=shape.projection)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        
+        try:
+            explained = await cursor.explain()
+        except Exception as e:
+            logger.warning(f"Could not explain query '{shape.name}': {e}")
+            continue
+        
+        if "COLLSCAN" in set(_stages(explained.get("queryPlanner", {}).get("winningPlan"))):
+            scans.append(shape.name)
+            logger.warning(
+                f"Query '{shape.name}' on {shape.model.Settings.name} is planned as a collection scan, "
+                f"an index is missing (filter: {shape.filter}, sort: {shape.sort})"
+            )
+    
+    if not scans:
+        logger.info(f"All {len(shapes or QUERY_SHAPES)} registered queries are served by indexes")
+    
+    return scans
@@ -1,12 +1,27 @@
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
+from typing import Any, Dict, Type, Union
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from beanie import Document, init_beanie
 from loguru import logger
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
 
 from app.core.config import settings
+from app.db.pool_metrics import get_pool_metrics
 from app.models.regulatory_requirement import RegulatoryRequirement
 from app.models.report import Report
+from app.models.report_page import ReportPage
 from app.models.compliance_result import ComplianceResult
+from app.models.job import Job
+from app.models.verdict_cache_entry import VerdictCacheEntry, VerdictCacheInvalidation
+from app.models.compliance_batch import ComplianceBatch
+from app.models.compliance_summary import ComplianceSummary
+from app.models.report_event import ReportEvent
 
 # MongoDB client instance
 client = None
@@ -15,18 +30,89 @@ async def get_db():
     """Get MongoDB database instance."""
     return client[settings.DB_NAME]
 
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def read_preference(name: str) -> Union[Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest]:
+    """
+    Build a read preference from its mode name.
+    
+    Args:
+        name: One of primary, primaryPreferred, secondary, secondaryPreferred or nearest
+        
+    Returns:
+        The read preference, with MONGO_MAX_STALENESS_SECONDS applied to secondary reads
+    """
+    mode = _READ_PREFERENCES.get(name)
+    
+    if mode is None:
+        raise ValueError(f"Unknown read preference {name!r}")
+    
+    if mode is Primary or settings.MONGO_MAX_STALENESS_SECONDS < 0:
+        return mode()
+    return mode(max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
+
+def dashboard_collection(model: Type[Document]) -> AsyncIOMotorCollection:
+    """
+    Get a model's collection for the read-heavy dashboard routes.
+    
+    Listings and summaries tolerate slightly stale data, so they read with
+    MONGO_DASHBOARD_READ_PREFERENCE, which can send them to secondaries.
+    
+    Args:
+        model: The document model
+        
+    Returns:
+        The collection with the dashboard read preference
+    """
+    return model.get_motor_collection().with_options(
+        read_preference=read_preference(settings.MONGO_DASHBOARD_READ_PREFERENCE)
+    )
+
+def _client_options() -> Dict[str, Any]:
+    """Pool and wire options of the Mongo client, from the settings."""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "read_preference": read_preference(settings.MONGO_READ_PREFERENCE),
+        "event_listeners": [get_pool_metrics()],
+    }
+    
+    # 0 keeps the driver default (no limit)
+    if settings.MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    
+    return options
+
 async def connect_to_mongo():
     """Connect to MongoDB."""
     global client
     try:
         logger.info(f"Connecting to MongoDB at {settings.MONGODB_URL.split('@')[-1]}")
-        client = AsyncIOMotorClient(settings.MONGODB_URL)
+        client = AsyncIOMotorClient(settings.MONGODB_URL, **_client_options())
+        # Also creates the indexes declared by the models, if missing
         await init_beanie(
             database=client[settings.DB_NAME],
             document_models=[
                 RegulatoryRequirement,
                 Report,
-                ComplianceResult
+                ReportPage,
+                ComplianceResult,
+                ComplianceBatch,
+                ComplianceSummary,
+                Job,
+                VerdictCacheEntry,
+                VerdictCacheInvalidation,
+                ReportEvent
             ]
         )
         logger.info("Successfully connected to MongoDB")
@@ -40,15 +126,3 @@ async def close_mongo_connection():
     if client:
         client.close()
         logger.info("MongoDB connection closed")
-
-async def create_indexes():
-    """Create necessary indexes."""
-    try:
-        # Create indexes as needed
-        await RegulatoryRequirement.create_indexes()
-        await Report.create_indexes()
-        await ComplianceResult.create_indexes()
-        logger.info("MongoDB indexes created or already exist")
-    except Exception as e:
-        logger.error(f"Error creating MongoDB indexes: {e}")
-        raise
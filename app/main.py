@@ -6,10 +6,15 @@ from loguru import logger
 import os
 from dotenv import load_dotenv
 
+from app.api.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
 from app.api.routes import router as api_router
 from app.core.config import settings
 from app.core.logging import configure_logging
-from app.db.session import connect_to_mongo, close_mongo_connection, create_indexes
+from app.db.query_plans import verify_query_plans
+from app.db.session import connect_to_mongo, close_mongo_connection
+from app.services.events import stop_event_watcher
+from app.services.llm_backend import close_compliance_backend
+from app.services.pdf_processor import shutdown_extraction_executor
 
 # Load environment variables
 load_dotenv()
@@ -32,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, "ETag", "Accept-Ranges", "Content-Range"],
 )
 
 # Create upload directory if it doesn't exist
@@ -41,11 +47,15 @@ os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)
 async def startup_event():
     logger.info("Starting up compliance scan API")
     await connect_to_mongo()
-    await create_indexes()
+    if settings.QUERY_PLAN_CHECK_ENABLED:
+        await verify_query_plans()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down compliance scan API")
+    shutdown_extraction_executor()
+    await close_compliance_backend()
+    await stop_event_watcher()
     await close_mongo_connection()
 
 # Include API routes
@@ -0,0 +1,20 @@
+
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+from typing import Any, Dict
+
+class ComplianceBatch(Document):
+    """MongoDB document for a batch of compliance checks triggered together."""
+    criteria: Dict[str, Any] = Field(default_factory=dict)
+    report_count: int = 0
+    # Finished checks, counted as their jobs finish since finished jobs expire
+    succeeded_count: int = 0
+    failed_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "compliance_batches"
+        
+    def __repr__(self):
+        return f"<ComplianceBatch(id={self.id}, report_count={self.report_count})>"
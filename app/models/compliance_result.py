@@ -1,12 +1,21 @@
 
 from datetime import datetime
+from enum import Enum
 from beanie import Document, Indexed, Link
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING
 from typing import Optional
 
 from app.models.report import Report
 from app.models.regulatory_requirement import RegulatoryRequirement
 
+class DecisionPath(str, Enum):
+    """How the verdict of a compliance result was reached."""
+    RULE = "rule"
+    LLM = "llm"
+    CACHE = "cache"
+    MANUAL = "manual"
+
 class ComplianceResult(Document):
     """MongoDB document for compliance check results."""
     report: Link[Report]
@@ -14,6 +23,8 @@ class ComplianceResult(Document):
     is_compliant: Optional[bool] = None
     confidence_score: Optional[float] = None
     extracted_evidence: Optional[str] = None
+    requirement_version: Optional[int] = None  # Version of the requirement that was checked
+    decision_path: Optional[DecisionPath] = None
     analysis_date: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -22,10 +33,13 @@ class ComplianceResult(Document):
         name = "compliance_results"
         indexes = [
             # Compound index to ensure one result per report-requirement pair
-            [
-                ("report.id", 1),
-                ("requirement.id", 1),
-            ],
+            # (links are stored as DBRefs, hence the $id paths)
+            IndexModel(
+                [("report.$id", ASCENDING), ("requirement.$id", ASCENDING)],
+                unique=True
+            ),
+            # Verdicts for a requirement across reports, when it is added to or removed from the summaries
+            IndexModel([("requirement.$id", ASCENDING), ("is_compliant", ASCENDING)]),
         ]
         
     def __repr__(self):
@@ -0,0 +1,34 @@
+
+from datetime import datetime
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Dict, Optional
+
+class ComplianceSummary(Document):
+    """
+    MongoDB document holding the materialized compliance summary of a report.
+    
+    The counts cover the active requirements and are kept up to date
+    incrementally as results and requirements change.
+    """
+    report_id: PydanticObjectId
+    total_requirements: int = 0
+    compliant_count: int = 0
+    non_compliant_count: int = 0
+    pending_count: int = 0
+    # Category -> {"total", "compliant", "non_compliant", "pending"} counts
+    by_category: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Last result write, the summaries written since are recounted for drift
+    results_changed_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "compliance_summaries"
+        indexes = [
+            IndexModel([("report_id", ASCENDING)], unique=True),
+            IndexModel([("results_changed_at", ASCENDING)], sparse=True),
+        ]
+        
+    def __repr__(self):
+        return f"<ComplianceSummary(report_id={self.report_id}, total_requirements={self.total_requirements})>"
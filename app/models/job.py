@@ -0,0 +1,50 @@
+
+from datetime import datetime
+from enum import Enum
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(Document):
+    """MongoDB document for a queued background job."""
+    kind: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    batch_id: Optional[PydanticObjectId] = None
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    max_attempts: int = Field(default_factory=lambda: settings.JOB_MAX_ATTEMPTS)
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    lease_expires_at: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    last_error: Optional[str] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "jobs"
+        indexes = [
+            # Claiming due jobs and jobs with an expired lease
+            IndexModel([("status", ASCENDING), ("run_after", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+            # Progress of a batch
+            IndexModel([("batch_id", ASCENDING), ("status", ASCENDING)]),
+            # Finished jobs are removed after the retention period
+            IndexModel(
+                [("finished_at", ASCENDING)],
+                expireAfterSeconds=settings.JOB_RETENTION_SECONDS,
+                partialFilterExpression={"status": JobStatus.SUCCEEDED.value}
+            ),
+        ]
+        
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}', attempts={self.attempts})>"
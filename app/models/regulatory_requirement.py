@@ -1,8 +1,23 @@
 
 from datetime import datetime
 from beanie import Document, Indexed
-from pydantic import Field
-from typing import Optional
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from typing import List, Optional
+
+class RequirementRules(BaseModel):
+    """
+    Deterministic matching rules that can settle a requirement without the LLM.
+    
+    Patterns are case-insensitive regular expressions, keywords are matched
+    literally on word boundaries. A match makes the requirement compliant.
+    Without a match the requirement is non-compliant if
+    ``non_compliant_if_absent`` is set, otherwise the LLM decides.
+    """
+    patterns: List[str] = []
+    keywords: List[str] = []
+    non_compliant_if_absent: bool = False
+    confidence: float = 0.95
 
 class RegulatoryRequirement(Document):
     """MongoDB document for regulatory requirements."""
@@ -10,11 +25,24 @@ class RegulatoryRequirement(Document):
     description: str
     category: Optional[str] = None
     active: bool = True
+    rules: Optional[RequirementRules] = None  # Checked before calling the LLM
+    version: int = 1  # Incremented when the checked content (name, description, rules) changes
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "regulatory_requirements"
+        indexes = [
+            # Keyset pagination of the requirement listing by category and active flag
+            IndexModel([("category", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("active", ASCENDING), ("_id", ASCENDING)]),
+            # Active requirements by category; inactive ones are rarely listed, so left out
+            IndexModel(
+                [("category", ASCENDING), ("_id", ASCENDING)],
+                name="category_1__id_1_active",
+                partialFilterExpression={"active": True}
+            ),
+        ]
         
     def __repr__(self):
         return f"<RegulatoryRequirement(id={self.id}, name='{self.name}', active={self.active})>"
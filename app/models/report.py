@@ -1,8 +1,9 @@
 
 from datetime import datetime
 from enum import Enum
-from beanie import Document, Indexed
+from beanie import Document, Indexed, PydanticObjectId
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from typing import Optional
 
 class ReportStatus(str, Enum):
@@ -14,18 +15,35 @@ class ReportStatus(str, Enum):
 class Report(Document):
     """MongoDB document for uploaded reports."""
     file_name: Indexed(str)
-    file_path: str
+    file_path: Optional[str] = None  # Local path, only set on reports stored before storage keys
+    storage_key: Optional[str] = None  # Key of the file in the storage backend
     file_size: int
+    content_hash: Optional[str] = None  # SHA-256 of the file content
     upload_date: datetime = Field(default_factory=datetime.utcnow)
     status: ReportStatus = ReportStatus.PENDING
     company_name: Optional[str] = None
     fiscal_year: Optional[int] = None
-    processed_text: Optional[str] = None
+    page_count: Optional[int] = None  # Set once text has been extracted, see ReportPage
+    compliance_batch_id: Optional[PydanticObjectId] = None  # Last batch compliance check
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "reports"
+        indexes = [
+            # Lookup of previously uploaded copies of the same file, newest first
+            IndexModel([("content_hash", ASCENDING), ("upload_date", DESCENDING)]),
+            # Reports claimed by a batch compliance check
+            IndexModel([("compliance_batch_id", ASCENDING)]),
+            # Keyset pagination of the report listing, with and without a status filter
+            IndexModel([("upload_date", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)]),
+            # Batch compliance checks selecting reports by company and year, or by year alone
+            IndexModel([("company_name", ASCENDING), ("fiscal_year", ASCENDING), ("status", ASCENDING)]),
+            IndexModel([("fiscal_year", ASCENDING), ("status", ASCENDING)]),
+            # Processed reports, re-checked when requirements change
+            IndexModel([("page_count", ASCENDING)], partialFilterExpression={"page_count": {"$gt": 0}}),
+        ]
         
     def __repr__(self):
         return f"<Report(id={self.id}, file_name='{self.file_name}', status='{self.status}')>"
@@ -0,0 +1,26 @@
+
+from datetime import datetime
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Any, Dict
+
+from app.core.config import settings
+
+class ReportEvent(Document):
+    """MongoDB document for a progress event of a report, relayed to subscribed clients."""
+    report_id: PydanticObjectId
+    type: str
+    data: Dict[str, Any] = Field(default_factory=dict)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "report_events"
+        indexes = [
+            # Polled by creation time when change streams are unavailable;
+            # events are only relayed live, so they expire quickly
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.EVENT_RETENTION_SECONDS),
+        ]
+        
+    def __repr__(self):
+        return f"<ReportEvent(report_id={self.report_id}, type='{self.type}')>"
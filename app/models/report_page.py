@@ -0,0 +1,34 @@
+
+from datetime import datetime
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, TEXT
+from typing import Optional
+
+from app.core.config import settings
+
+class ReportPage(Document):
+    """MongoDB document for the extracted text of one report page."""
+    report_id: PydanticObjectId
+    page_number: int
+    text: str
+    # Copied from the report, so searches filter on them within the text index
+    company_name: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "report_pages"
+        indexes = [
+            # One document per page, read back in page order
+            IndexModel([("report_id", ASCENDING), ("page_number", ASCENDING)], unique=True),
+            # Full-text search, with the search filters stored in the index entries
+            IndexModel(
+                [("text", TEXT), ("company_name", ASCENDING), ("fiscal_year", ASCENDING)],
+                name="text_search",
+                default_language=settings.SEARCH_LANGUAGE
+            ),
+        ]
+        
+    def __repr__(self):
+        return f"<ReportPage(report_id={self.report_id}, page_number={self.page_number})>"
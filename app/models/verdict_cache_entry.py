@@ -0,0 +1,52 @@
+
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+class VerdictCacheEntry(Document):
+    """MongoDB document caching the LLM verdict for one text and requirement."""
+    key: str
+    text_hash: str
+    requirement_hash: str
+    model_version: str
+    verdict: Dict[str, Any]
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "llm_verdict_cache"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+            # Invalidation by requirement or model version
+            IndexModel([("requirement_hash", ASCENDING)]),
+            IndexModel([("model_version", ASCENDING)]),
+            # Entries expire after the cache TTL
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.VERDICT_CACHE_TTL_SECONDS),
+        ]
+        
+    def __repr__(self):
+        return f"<VerdictCacheEntry(key='{self.key}', model_version='{self.model_version}')>"
+
+class VerdictCacheInvalidation(Document):
+    """
+    MongoDB document recording an invalidation of the verdict cache.
+    
+    Every process applies the invalidations recorded by the others to its
+    in-process LRU.
+    """
+    requirement_hash: Optional[str] = None  # None = all requirements
+    model_version: Optional[str] = None  # None = all model versions
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "llm_verdict_cache_invalidations"
+        indexes = [
+            # Read by creation time; older than the cache TTL, no entry they cover is left
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.VERDICT_CACHE_TTL_SECONDS),
+        ]
+        
+    def __repr__(self):
+        return f"<VerdictCacheInvalidation(requirement_hash={self.requirement_hash!r}, model_version={self.model_version!r})>"
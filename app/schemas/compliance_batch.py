@@ -0,0 +1,25 @@
+
+from pydantic import BaseModel
+from beanie import PydanticObjectId
+from typing import List, Optional
+from datetime import datetime
+
+from app.schemas.report import ReportStatus
+
+class ComplianceBatchCreate(BaseModel):
+    """Schema for selecting the reports of a batch compliance check."""
+    report_ids: Optional[List[PydanticObjectId]] = None
+    company_name: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    status: ReportStatus = ReportStatus.COMPLETED
+
+class ComplianceBatchResponse(BaseModel):
+    """Schema for the progress of a batch compliance check."""
+    batch_id: PydanticObjectId
+    report_count: int
+    queued_count: int = 0
+    running_count: int = 0
+    succeeded_count: int = 0
+    failed_count: int = 0
+    done: bool
+    created_at: datetime
@@ -1,12 +1,20 @@
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from beanie import PydanticObjectId
+from typing import Dict, Optional, List
 from datetime import datetime
+from enum import Enum
+
+class DecisionPath(str, Enum):
+    RULE = "rule"
+    LLM = "llm"
+    CACHE = "cache"
+    MANUAL = "manual"
 
 class ComplianceResultBase(BaseModel):
     """Base schema for compliance result data."""
-    report_id: int
-    requirement_id: int
+    report_id: PydanticObjectId
+    requirement_id: PydanticObjectId
     is_compliant: Optional[bool] = None
     confidence_score: Optional[float] = None
     extracted_evidence: Optional[str] = None
@@ -23,7 +31,9 @@ class ComplianceResultUpdate(BaseModel):
 
 class ComplianceResultResponse(ComplianceResultBase):
     """Schema for compliance result response data."""
-    id: int
+    id: PydanticObjectId
+    requirement_version: Optional[int] = None
+    decision_path: Optional[DecisionPath] = None
     analysis_date: datetime
     created_at: datetime
     updated_at: datetime
@@ -33,26 +43,27 @@ class ComplianceResultResponse(ComplianceResultBase):
 
 class RequirementResultResponse(BaseModel):
     """Schema for combined requirement and result response."""
-    id: int
+    id: PydanticObjectId
     name: str
     description: str
-    category: Optional[str]
-    is_compliant: Optional[bool]
-    confidence_score: Optional[float]
-    extracted_evidence: Optional[str]
+    category: Optional[str] = None
+    is_compliant: Optional[bool] = None
+    confidence_score: Optional[float] = None
+    extracted_evidence: Optional[str] = None
 
     class Config:
         orm_mode = True
 
 class ComplianceSummaryResponse(BaseModel):
     """Schema for compliance summary response."""
-    report_id: int
+    report_id: PydanticObjectId
     total_requirements: int
     compliant_count: int
     non_compliant_count: int
     pending_count: int
     overall_compliance_percentage: float
-    results: List[RequirementResultResponse]
+    by_category: Optional[Dict[str, Dict[str, int]]] = None
+    results: Optional[List[RequirementResultResponse]] = None
 
     class Config:
         orm_mode = True
@@ -1,14 +1,23 @@
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from beanie import PydanticObjectId
+from typing import List, Optional
 from datetime import datetime
 
+class RequirementRules(BaseModel):
+    """Schema for the deterministic matching rules of a requirement."""
+    patterns: List[str] = []
+    keywords: List[str] = []
+    non_compliant_if_absent: bool = False
+    confidence: float = Field(0.95, ge=0, le=1)
+
 class RegulatoryRequirementBase(BaseModel):
     """Base schema for regulatory requirement data."""
     name: str
     description: str
     category: Optional[str] = None
     active: bool = True
+    rules: Optional[RequirementRules] = None
 
 class RegulatoryRequirementCreate(RegulatoryRequirementBase):
     """Schema for creating a new regulatory requirement."""
@@ -20,10 +29,12 @@ class RegulatoryRequirementUpdate(BaseModel):
     description: Optional[str] = None
     category: Optional[str] = None
     active: Optional[bool] = None
+    rules: Optional[RequirementRules] = None
 
 class RegulatoryRequirementResponse(RegulatoryRequirementBase):
     """Schema for regulatory requirement response data."""
-    id: int
+    id: PydanticObjectId
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -1,6 +1,7 @@
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from beanie import PydanticObjectId
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -19,6 +20,10 @@ class ReportCreate(ReportBase):
     """Schema for creating a new report."""
     # No additional fields needed - file is handled separately
 
+class ReportUploadForm(ReportCreate):
+    """Schema of the form fields sent with an uploaded report file."""
+    reuse_results: bool = True
+
 class ReportUpdate(ReportBase):
     """Schema for updating an existing report."""
     company_name: Optional[str] = None
@@ -27,9 +32,10 @@ class ReportUpdate(ReportBase):
 
 class ReportResponse(ReportBase):
     """Schema for report response data."""
-    id: int
+    id: PydanticObjectId
     file_name: str
     file_size: int
+    content_hash: Optional[str] = None
     upload_date: datetime
     status: ReportStatus
     company_name: Optional[str] = None
@@ -42,7 +48,38 @@ class ReportResponse(ReportBase):
 
 class ReportDetail(ReportResponse):
     """Detailed report schema including processing details."""
-    processed_text: Optional[str] = None
+    page_count: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+class ReportPageResponse(BaseModel):
+    """Schema for the extracted text of one report page."""
+    page_number: int
+    text: str
 
     class Config:
         orm_mode = True
+
+class ReportTextResponse(BaseModel):
+    """Schema for a page range of a report's extracted text."""
+    report_id: PydanticObjectId
+    page_count: int
+    pages: List[ReportPageResponse]
+
+class ReportSearchPage(BaseModel):
+    """Schema for a matching page of a searched report."""
+    page_number: int
+    score: float
+    snippet: str
+
+class ReportSearchResult(BaseModel):
+    """Schema for a report matching a text search."""
+    report_id: PydanticObjectId
+    file_name: str
+    company_name: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    upload_date: datetime
+    score: float
+    page_hits: int
+    pages: List[ReportSearchPage]
@@ -1,127 +1,460 @@
 
 import asyncio
 from loguru import logger
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from beanie import PydanticObjectId
+from bson import DBRef
+from pymongo import UpdateOne
 
 from app.models.report import Report, ReportStatus
 from app.models.regulatory_requirement import RegulatoryRequirement
-from app.models.compliance_result import ComplianceResult
+from app.models.compliance_result import ComplianceResult, DecisionPath
+from app.core.config import settings
+from app.services.rate_limiter import get_llm_rate_limiter
+from app.services.compliance_summary import apply_result_changes
+from app.services.events import (
+    EVENT_COMPLIANCE_COMPLETED,
+    EVENT_COMPLIANCE_PROGRESS,
+    EVENT_COMPLIANCE_STARTED,
+    publish_report_event,
+    publish_report_status,
+)
+from app.services.job_queue import enqueue_jobs, JOB_CHECK_COMPLIANCE
+from app.services.report_text import iter_report_pages
+from app.services.llm_backend import MalformedResponseError, get_compliance_backend
+from app.services.retrieval import BM25Index, Passage, chunk_pages, format_passages
+from app.services.rule_matcher import RuleMatcher
+from app.services.verdict_cache import get_verdict_cache, hash_requirement, hash_text
 
-async def check_compliance_for_report(report_id: str) -> None:
+async def check_compliance_for_report(report_id: str, requirement_ids: Optional[List[str]] = None) -> None:
     """
     Check compliance of a report against all active regulatory requirements.
     
-    This is run as a background task.
+    With ``requirement_ids``, only those requirements are re-checked (delta
+    mode) and the report status is left untouched. Requirements whose
+    result was already evaluated against their current version are skipped.
+    
+    This is run as a background job. Requirements with matching rules are
+    settled first by a single scan of the report; the LLM is only called
+    when the rules are inconclusive.
+    
+    For those, the report text is split into passages and indexed once.
+    Each requirement is then checked against only the RETRIEVAL_TOP_K
+    passages that best match its name and description, which caps the
+    prompt size however long the report is. Requirements of the same
+    category are checked together, up to LLM_BATCH_SIZE per LLM call, and
+    are checked one by one if the batched response cannot be used. Calls
+    are made concurrently, up to COMPLIANCE_CONCURRENCY at a time, and are
+    rate limited.
+    
+    Verdicts are cached by the passages sent with each requirement and, for
+    batched calls, by the other requirements of the batch, so re-checking
+    an unchanged report does not call the LLM again.
+    
+    A failing requirement is logged and does not discard the results of the
+    others. Other errors are re-raised after the report is marked as
+    failed, so the job queue can retry it.
     
     Args:
         report_id: The ID of the report in the database
+        requirement_ids: IDs of the requirements to re-check (optional)
     """
-    logger.info(f"Starting compliance check for report ID {report_id}")
+    delta = requirement_ids is not None
+    logger.info(f"Starting {'delta ' if delta else ''}compliance check for report ID {report_id}")
     
     try:
         # Get the report
         report = await Report.get(report_id)
         
-        if not report or not report.processed_text:
+        if not report or not report.page_count:
             logger.error(f"Report ID {report_id} not found or has no processed text")
             return
         
         # Get all active requirements
-        requirements = await RegulatoryRequirement.find(
-            RegulatoryRequirement.active == True
-        ).to_list()
+        query = {"active": True}
+        if delta:
+            query["_id"] = {"$in": [PydanticObjectId(req_id) for req_id in requirement_ids]}
+        requirements = await RegulatoryRequirement.find(query).to_list()
+        
+        if delta:
+            requirements = await _outdated_requirements(report, requirements)
+            if not requirements:
+                logger.info(f"Compliance results for report ID {report_id} are up to date")
+                return
+        
+        await publish_report_event(report.id, EVENT_COMPLIANCE_STARTED, {"total": len(requirements), "delta": delta})
+        
+        pages = [(page.page_number, page.text) async for page in iter_report_pages(report.id)]
+        
+        # Settle what the deterministic rules can before calling the LLM
+        matcher = RuleMatcher(requirements)
+        rule_matches = await asyncio.to_thread(matcher.scan, pages) if matcher else {}
+        rule_verdicts = {
+            req.id: verdict for req in requirements
+            if (verdict := matcher.decide(req, rule_matches.get(req.id))) is not None
+        }
+        
+        logger.info(f"Rules settled {len(rule_verdicts)} of {len(requirements)} requirements for report ID {report_id}")
         
-        # Check compliance for each requirement
+        index = None
+        if len(rule_verdicts) < len(requirements):
+            index = await asyncio.to_thread(_build_passage_index, pages)
+        cache = get_verdict_cache()
+        backend = get_compliance_backend()
+        rate_limiter = get_llm_rate_limiter()
+        
+        # LLM calls run concurrently, bounded by the concurrency limit
+        semaphore = asyncio.Semaphore(settings.COMPLIANCE_CONCURRENCY)
+        
+        outcomes: Dict[PydanticObjectId, Any] = {
+            req_id: {**verdict, "decision_path": DecisionPath.RULE}
+            for req_id, verdict in rule_verdicts.items()
+        }
+        
+        # Retrieve the passages of each remaining requirement
+        contexts: Dict[PydanticObjectId, Tuple[List[Passage], str]] = {}
         for req in requirements:
-            # Check if there's already a result for this report-requirement pair
-            existing = await ComplianceResult.find_one({
-                "report.id": report_id,
-                "requirement.id": req.id
+            if req.id not in outcomes:
+                passages = index.search(f"{req.name}\n{req.description}", settings.RETRIEVAL_TOP_K)
+                contexts[req.id] = (passages, hash_requirement(req.name, req.description))
+        
+        def batch_passages(batch: List[RegulatoryRequirement]) -> List[Passage]:
+            # One call carries the passages retrieved for all the requirements
+            return sorted(
+                {passage for req in batch for passage in contexts[req.id][0]},
+                key=lambda passage: (passage.page_number, passage.offset)
+            )
+        
+        def cache_keys(batch: List[RegulatoryRequirement]) -> Dict[PydanticObjectId, Tuple[str, str]]:
+            # A batched verdict depends on everything sent with it: the
+            # passages of the whole batch and the other requirements. Both
+            # go into the text hash, the requirement hash stays the
+            # requirement's own, so invalidation by requirement still works
+            if len(batch) == 1:
+                passages, requirement_hash = contexts[batch[0].id]
+                return {batch[0].id: (hash_text(format_passages(passages)), requirement_hash)}
+            members = "\n".join(contexts[req.id][1] for req in batch)
+            text_hash = hash_text(f"{members}\n\n{format_passages(batch_passages(batch))}")
+            return {req.id: (text_hash, contexts[req.id][1]) for req in batch}
+        
+        batches = _batch_requirements([req for req in requirements if req.id in contexts], settings.LLM_BATCH_SIZE)
+        
+        # Unchanged passages and requirements reuse the earlier verdict
+        if cache and contexts:
+            keys = {req_id: key for batch in batches for req_id, key in cache_keys(batch).items()}
+            cached = await asyncio.gather(*(
+                cache.get(text_hash, requirement_hash, settings.LLM_MODEL_VERSION)
+                for text_hash, requirement_hash in keys.values()
+            ))
+            for req_id, verdict in zip(keys, cached):
+                if verdict is not None:
+                    outcomes[req_id] = {**verdict, "decision_path": DecisionPath.CACHE}
+            batches = [batch for batch in ([req for req in batch if req.id not in outcomes] for batch in batches) if batch]
+        
+        done = 0
+        
+        async def report_progress(checked: List[Tuple[RegulatoryRequirement, Any]]) -> None:
+            nonlocal done
+            done += len(checked)
+            await publish_report_event(report.id, EVENT_COMPLIANCE_PROGRESS, {
+                "done": done,
+                "total": len(requirements),
+                "results": [_progress_entry(req, outcome) for req, outcome in checked]
             })
+        
+        if outcomes:
+            await report_progress([(req, outcomes[req.id]) for req in requirements if req.id in outcomes])
+        
+        async def record_verdict(
+            req: RegulatoryRequirement,
+            verdict: Dict[str, Any],
+            keys: Dict[PydanticObjectId, Tuple[str, str]]
+        ) -> Dict[str, Any]:
+            if cache:
+                text_hash, requirement_hash = keys[req.id]
+                await cache.set(text_hash, requirement_hash, settings.LLM_MODEL_VERSION, verdict)
+            return {**verdict, "decision_path": DecisionPath.LLM}
+        
+        async def check_requirement(req: RegulatoryRequirement) -> Dict[str, Any]:
+            async with semaphore:
+                await rate_limiter.acquire()
+                verdict = await backend.check(contexts[req.id][0], req.name, req.description)
+            return await record_verdict(req, verdict, cache_keys([req]))
+        
+        async def check_batch(batch: List[RegulatoryRequirement]) -> List[Any]:
+            if len(batch) == 1:
+                return await asyncio.gather(check_requirement(batch[0]), return_exceptions=True)
             
-            # Simulate LLM-based compliance check
-            compliance_result = await simulate_llm_compliance_check(
-                report.processed_text,
-                req.name,
-                req.description
-            )
+            try:
+                async with semaphore:
+                    await rate_limiter.acquire()
+                    verdicts = await backend.check_batch(
+                        batch_passages(batch),
+                        [(str(req.id), req.name, req.description) for req in batch]
+                    )
+            except MalformedResponseError as e:
+                logger.warning(f"Unusable batched response for {len(batch)} requirements, checking them one by one: {e}")
+                verdicts = {}
+            except Exception as e:
+                return [e] * len(batch)
             
-            if existing:
-                # Update existing result
-                existing.is_compliant = compliance_result["is_compliant"]
-                existing.confidence_score = compliance_result["confidence_score"]
-                existing.extracted_evidence = compliance_result["evidence"]
-                existing.analysis_date = datetime.utcnow()
-                await existing.save_with_timestamp()
-            else:
-                # Create new result
-                new_result = ComplianceResult(
-                    report=report,
-                    requirement=req,
-                    is_compliant=compliance_result["is_compliant"],
-                    confidence_score=compliance_result["confidence_score"],
-                    extracted_evidence=compliance_result["evidence"],
-                    analysis_date=datetime.utcnow()
-                )
-                await new_result.save()
+            # Batched verdicts are cached under the batch they were given in;
+            # requirements missing from the response are checked one by one
+            keys = cache_keys(batch)
+            return await asyncio.gather(*(
+                record_verdict(req, verdicts[str(req.id)], keys) if str(req.id) in verdicts else check_requirement(req)
+                for req in batch
+            ), return_exceptions=True)
+        
+        async def run_batch(batch: List[RegulatoryRequirement]) -> List[Any]:
+            batch_outcomes = await check_batch(batch)
+            await report_progress(list(zip(batch, batch_outcomes)))
+            return batch_outcomes
+        
+        for batch, batch_outcomes in zip(batches, await asyncio.gather(*(run_batch(batch) for batch in batches))):
+            outcomes.update({req.id: outcome for req, outcome in zip(batch, batch_outcomes)})
+        
+        # Results of successful checks are kept even if others failed
+        failures = [(req, outcomes[req.id]) for req in requirements if isinstance(outcomes[req.id], Exception)]
+        for req, error in failures:
+            logger.error(f"Error checking requirement ID {req.id} for report ID {report_id}: {error}")
+        
+        if requirements and len(failures) == len(requirements):
+            raise RuntimeError(f"All {len(failures)} requirement checks failed")
+        
+        # Write all results in one round trip
+        await save_compliance_results(report, [
+            (req, outcomes[req.id]) for req in requirements
+            if not isinstance(outcomes[req.id], Exception)
+        ])
         
         # Update report status to completed
-        report.status = ReportStatus.COMPLETED
-        await report.save_with_timestamp()
+        if not delta:
+            report.status = ReportStatus.COMPLETED
+            await report.save_with_timestamp()
+            await publish_report_status(report)
         
-        logger.info(f"Completed compliance check for report ID {report_id}")
+        await publish_report_event(report.id, EVENT_COMPLIANCE_COMPLETED, {
+            "checked": len(requirements) - len(failures),
+            "failed": len(failures),
+            "delta": delta
+        })
+        
+        if failures:
+            logger.warning(f"Completed compliance check for report ID {report_id} with {len(failures)} of {len(requirements)} requirements failed")
+        else:
+            logger.info(f"Completed compliance check for report ID {report_id}")
         
     except Exception as e:
         logger.error(f"Error during compliance check for report ID {report_id}: {e}")
         
+        await publish_report_event(report_id, EVENT_COMPLIANCE_COMPLETED, {"error": str(e), "delta": delta})
+        
+        if delta:
+            raise
+        
         try:
             # Update report status to failed
             report = await Report.get(report_id)
             if report:
                 report.status = ReportStatus.FAILED
                 await report.save_with_timestamp()
+                await publish_report_status(report)
         except Exception as update_error:
             logger.error(f"Error updating report status: {update_error}")
+        
+        raise
 
-async def simulate_llm_compliance_check(
-    text: str,
-    requirement_name: str,
-    requirement_description: str
-) -> Dict[str, Any]:
+def _progress_entry(req: RegulatoryRequirement, outcome: Any) -> Dict[str, Any]:
+    """Describe the outcome of a requirement check in a progress event."""
+    if isinstance(outcome, Exception):
+        return {"requirement_id": str(req.id), "error": str(outcome)}
+    return {
+        "requirement_id": str(req.id),
+        "is_compliant": outcome["is_compliant"],
+        "decision_path": outcome["decision_path"].value
+    }
+
+def _batch_requirements(
+    requirements: List[RegulatoryRequirement],
+    batch_size: int
+) -> List[List[RegulatoryRequirement]]:
     """
-    Simulate an LLM-based compliance check.
+    Group requirements by category into batches checked with one LLM call.
     
-    In a real implementation, this would call an actual LLM API.
+    Args:
+        requirements: The requirements to check
+        batch_size: Maximum number of requirements per batch (1 disables batching)
+        
+    Returns:
+        The batches
+    """
+    by_category: Dict[Optional[str], List[RegulatoryRequirement]] = {}
+    for req in requirements:
+        by_category.setdefault(req.category, []).append(req)
+    
+    size = max(batch_size, 1)
+    return [
+        group[start:start + size]
+        for group in by_category.values()
+        for start in range(0, len(group), size)
+    ]
+
+def _build_passage_index(pages: List[Tuple[int, str]]) -> BM25Index:
+    """Split the report pages into passages and index them for retrieval."""
+    return BM25Index(chunk_pages(
+        pages,
+        settings.RETRIEVAL_PASSAGE_CHARS,
+        settings.RETRIEVAL_PASSAGE_OVERLAP
+    ))
+
+async def _outdated_requirements(
+    report: Report,
+    requirements: List[RegulatoryRequirement]
+) -> List[RegulatoryRequirement]:
+    """Keep the requirements whose result for the report is missing or from an older version."""
+    evaluated = {
+        doc["requirement"].id: doc.get("requirement_version")
+        for doc in await ComplianceResult.get_motor_collection().find(
+            {"report.$id": report.id, "requirement.$id": {"$in": [req.id for req in requirements]}},
+            projection={"requirement": 1, "requirement_version": 1}
+        ).to_list(length=None)
+    }
+    return [req for req in requirements if evaluated.get(req.id) != req.version]
+
+async def enqueue_requirement_rechecks(requirement_ids: List[str]) -> int:
+    """
+    Queue delta re-checks of some requirements on every processed report.
+    
+    This is run as a background job after requirements are added or their
+    checked content changes. One job is queued per report, covering only
+    the given requirements.
     
     Args:
-        text: The processed text from the report
-        requirement_name: The name of the requirement to check
-        requirement_description: The description of the requirement
+        requirement_ids: IDs of the requirements to re-check
         
     Returns:
-        Dict containing compliance check results
+        Number of queued re-check jobs
     """
-    # This is a simulation - in a real implementation, this would call an LLM API
-    import random
+    queued = 0
+    cursor = Report.get_motor_collection().find(
+        {"page_count": {"$gt": 0}},
+        projection={"_id": 1},
+        batch_size=1000
+    )
+    while chunk := await cursor.to_list(length=1000):
+        queued += await enqueue_jobs(
+            JOB_CHECK_COMPLIANCE,
+            [{"report_id": str(doc["_id"]), "requirement_ids": requirement_ids} for doc in chunk]
+        )
     
-    # In a real implementation, we would analyze the document content
-    # to determine compliance with the specific requirement
+    logger.info(f"Queued re-checks of {len(requirement_ids)} requirements on {queued} reports")
+    return queued
+
+async def save_compliance_results(
+    report: Report,
+    verdicts: List[Tuple[RegulatoryRequirement, Dict[str, Any]]]
+) -> None:
+    """
+    Create or update the stored results of several requirement checks.
     
-    # Simulate some processing time (removed in production)
-    await asyncio.sleep(0.5)
+    All results are written with a single unordered bulk write of upserts
+    keyed on the report-requirement pair, and the report's compliance
+    summary is adjusted for the verdicts that changed. The previous
+    verdicts are read just before the write; should a concurrent check of
+    the same report change them in between, the summary drift is
+    corrected by reconcile_compliance_summaries.
     
-    # Generate random results for demonstration purposes
-    is_compliant = random.choice([True, False])
-    confidence_score = random.uniform(0.7, 0.98)
+    Args:
+        report: The checked report
+        verdicts: Pairs of checked requirement and compliance check result
+    """
+    if not verdicts:
+        return
     
-    if is_compliant:
-        evidence = f"The document appears to comply with the requirement '{requirement_name}'. Evidence found in the document mentions relevant information that satisfies the requirement criteria."
-    else:
-        evidence = f"The document does not appear to comply with the requirement '{requirement_name}'. The document lacks necessary information or disclosures related to this requirement."
+    collection = ComplianceResult.get_motor_collection()
     
-    return {
-        "is_compliant": is_compliant,
-        "confidence_score": confidence_score,
-        "evidence": evidence
+    # Previous verdicts, to adjust the summary counts incrementally
+    previous = {
+        doc["requirement"].id: doc.get("is_compliant")
+        for doc in await collection.find(
+            {"report.$id": report.id, "requirement.$id": {"$in": [req.id for req, _ in verdicts]}},
+            projection={"requirement": 1, "is_compliant": 1}
+        ).to_list(length=None)
     }
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"report.$id": report.id, "requirement.$id": req.id},
+            {
+                "$set": {
+                    "is_compliant": compliance_result["is_compliant"],
+                    "confidence_score": compliance_result["confidence_score"],
+                    "extracted_evidence": compliance_result["evidence"],
+                    "requirement_version": req.version,
+                    "decision_path": compliance_result["decision_path"].value,
+                    "analysis_date": now,
+                    "updated_at": now
+                },
+                "$setOnInsert": {
+                    "report": DBRef(Report.Settings.name, report.id),
+                    "requirement": DBRef(RegulatoryRequirement.Settings.name, req.id),
+                    "created_at": now
+                }
+            },
+            upsert=True
+        )
+        for req, compliance_result in verdicts
+    ]
+    
+    result = await collection.bulk_write(operations, ordered=False)
+    logger.debug(
+        f"Saved {len(operations)} compliance results for report ID {report.id} "
+        f"({result.upserted_count} new, {result.modified_count} updated)"
+    )
+    
+    await apply_result_changes(report.id, [
+        (req.category, previous.get(req.id), compliance_result["is_compliant"])
+        for req, compliance_result in verdicts
+        if req.active
+    ])
+
+async def copy_compliance_results(source_report: Report, target_report: Report) -> int:
+    """
+    Copy the compliance results of one report onto another.
+    
+    Used when a duplicate of an already analysed file is uploaded, so the
+    compliance checks do not have to be repeated.
+    
+    Args:
+        source_report: The report whose results are copied
+        target_report: The report receiving the copies
+        
+    Returns:
+        Number of results copied
+    """
+    results = await ComplianceResult.find({"report.$id": source_report.id}).to_list()
+    
+    if not results:
+        return 0
+    
+    copies = [
+        ComplianceResult(
+            report=target_report,
+            requirement=result.requirement,
+            is_compliant=result.is_compliant,
+            confidence_score=result.confidence_score,
+            extracted_evidence=result.extracted_evidence,
+            # Keep the copies current for incremental re-checks and decision statistics
+            requirement_version=result.requirement_version,
+            decision_path=result.decision_path,
+            analysis_date=result.analysis_date
+        )
+        for result in results
+    ]
+    await ComplianceResult.insert_many(copies)
+    
+    logger.info(f"Copied {len(copies)} compliance results from report ID {source_report.id} to report ID {target_report.id}")
+    return len(copies)
@@ -0,0 +1,355 @@
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from beanie import PydanticObjectId
+from loguru import logger
+from pymongo import ReturnDocument
+
+from app.db.session import dashboard_collection
+from app.models.regulatory_requirement import RegulatoryRequirement
+from app.models.compliance_result import ComplianceResult
+from app.models.compliance_summary import ComplianceSummary
+
+# Summary key of requirements without a category
+UNCATEGORIZED = "uncategorized"
+
+def status_key(is_compliant: Optional[bool]) -> str:
+    """Get the summary status key of a verdict."""
+    if is_compliant is True:
+        return "compliant"
+    if is_compliant is False:
+        return "non_compliant"
+    return "pending"
+
+def category_key(category: Optional[str]) -> str:
+    """Get the summary key of a requirement category (usable as a field name)."""
+    if not category:
+        return UNCATEGORIZED
+    return category.replace(".", "_").lstrip("$") or UNCATEGORIZED
+
+def _result_lookup(
+    report_id: PydanticObjectId,
+    fields: Dict[str, int],
+    page: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Pipeline stages joining active requirements to the report's result.
+    
+    The ``page`` stages run before the join, so only the requirements of
+    the returned page are joined.
+    """
+    return [
+        {"$match": {"active": True}},
+        {"$sort": {"_id": 1}},
+        *(page or []),
+        {"$lookup": {
+            "from": ComplianceResult.Settings.name,
+            "localField": "_id",
+            "foreignField": "requirement.$id",
+            "pipeline": [
+                {"$match": {"report.$id": report_id}},
+                {"$project": fields},
+            ],
+            "as": "result",
+        }},
+        {"$set": {"result": {"$first": "$result"}}},
+    ]
+
+async def find_compliance_summary(report_id: PydanticObjectId, dashboard: bool = False) -> Optional[ComplianceSummary]:
+    """
+    Get the materialized compliance summary of a report.
+    
+    Summaries are maintained incrementally once built, so reads are a
+    single document fetch.
+    
+    Args:
+        report_id: The ID of the report
+        dashboard: Read with the dashboard read preference, possibly from a secondary
+        
+    Returns:
+        The compliance summary, or None if it has not been built yet
+    """
+    if not dashboard:
+        return await ComplianceSummary.find_one(ComplianceSummary.report_id == report_id)
+    
+    document = await dashboard_collection(ComplianceSummary).find_one({"report_id": report_id})
+    return ComplianceSummary(id=document.pop("_id"), **document) if document else None
+
+async def _compute_compliance_summary(report_id: PydanticObjectId) -> ComplianceSummary:
+    """Count the results of a report's active requirements from scratch."""
+    pipeline = _result_lookup(report_id, {"is_compliant": 1}) + [
+        {"$group": {
+            "_id": {"category": "$category", "is_compliant": "$result.is_compliant"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    rows = await RegulatoryRequirement.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    
+    summary = ComplianceSummary(report_id=report_id)
+    for row in rows:
+        status = status_key(row["_id"].get("is_compliant"))
+        counts = summary.by_category.setdefault(
+            category_key(row["_id"].get("category")),
+            {"total": 0, "compliant": 0, "non_compliant": 0, "pending": 0}
+        )
+        
+        summary.total_requirements += row["count"]
+        setattr(summary, f"{status}_count", getattr(summary, f"{status}_count") + row["count"])
+        counts["total"] += row["count"]
+        counts[status] += row["count"]
+    
+    return summary
+
+async def rebuild_compliance_summary(report_id: PydanticObjectId) -> ComplianceSummary:
+    """
+    Build the compliance summary of a report from scratch.
+    
+    The summary is only inserted if there is none yet, so a summary built
+    concurrently, and the changes applied to it since, are never
+    overwritten. Changes applied while no summary existed are caught up by
+    reconcile_compliance_summaries.
+    
+    Args:
+        report_id: The ID of the report
+        
+    Returns:
+        The stored compliance summary
+    """
+    summary = await _compute_compliance_summary(report_id)
+    # Results written while counting are caught up by the next reconciliation
+    summary.results_changed_at = summary.updated_at
+    
+    document = await ComplianceSummary.get_motor_collection().find_one_and_update(
+        {"report_id": report_id},
+        {"$setOnInsert": summary.dict(exclude={"id"})},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    return ComplianceSummary(id=document.pop("_id"), **document)
+
+async def reconcile_compliance_summaries(since: Optional[datetime] = None) -> int:
+    """
+    Recount summaries and correct those that drifted from the results.
+    
+    Only summaries whose results were written since ``since`` can have
+    drifted, so requirement changes, which update every summary, do not
+    make the next run recount the whole archive. A summary is only
+    replaced if it was not updated while it was being recounted; one that
+    was is left for the next run.
+    
+    Args:
+        since: Only recount the summaries with results written since then (default all)
+        
+    Returns:
+        Number of corrected summaries
+    """
+    collection = ComplianceSummary.get_motor_collection()
+    query = {"results_changed_at": {"$gte": since}} if since else {}
+    corrected = 0
+    
+    cursor = collection.find(query, batch_size=1000)
+    async for document in cursor:
+        counts = _summary_counts((await _compute_compliance_summary(document["report_id"])).dict())
+        if counts == _summary_counts(document):
+            continue
+        
+        result = await collection.update_one(
+            {"_id": document["_id"], "updated_at": document["updated_at"]},
+            {"$set": {**counts, "updated_at": datetime.utcnow()}}
+        )
+        if result.modified_count:
+            corrected += 1
+            logger.warning(f"Corrected the drifted compliance summary of report ID {document['report_id']}")
+    
+    return corrected
+
+def _summary_counts(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the counts of a stored summary, without the categories left empty."""
+    return {
+        "total_requirements": document.get("total_requirements", 0),
+        "compliant_count": document.get("compliant_count", 0),
+        "non_compliant_count": document.get("non_compliant_count", 0),
+        "pending_count": document.get("pending_count", 0),
+        "by_category": {
+            category: counts
+            for category, counts in document.get("by_category", {}).items()
+            if any(counts.values())
+        },
+    }
+
+async def aggregate_requirement_results(
+    report_id: PydanticObjectId,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    after: Optional[PydanticObjectId] = None,
+    dashboard: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Get the result of each active requirement for a report in one aggregation.
+    
+    Args:
+        report_id: The ID of the report
+        skip: Number of requirement results to skip
+        limit: Maximum number of requirement results to return (None for all)
+        after: Only return requirements with a greater ID (keyset pagination)
+        dashboard: Read with the dashboard read preference, possibly from a secondary
+        
+    Returns:
+        List of requirement results, ordered by requirement ID
+    """
+    page = []
+    if after is not None:
+        page.append({"$match": {"_id": {"$gt": after}}})
+    if skip:
+        page.append({"$skip": skip})
+    if limit is not None:
+        page.append({"$limit": limit})
+    
+    pipeline = _result_lookup(report_id, {"is_compliant": 1, "confidence_score": 1, "extracted_evidence": 1}, page)
+    pipeline.append({"$project": {
+        "_id": 0,
+        "id": "$_id",
+        "name": 1,
+        "description": 1,
+        "category": 1,
+        "is_compliant": "$result.is_compliant",
+        "confidence_score": "$result.confidence_score",
+        "extracted_evidence": "$result.extracted_evidence",
+    }})
+    
+    collection = dashboard_collection(RegulatoryRequirement) if dashboard else RegulatoryRequirement.get_motor_collection()
+    return await collection.aggregate(pipeline).to_list(length=None)
+
+async def apply_result_changes(
+    report_id: PydanticObjectId,
+    changes: Iterable[Tuple[Optional[str], Optional[bool], Optional[bool]]]
+) -> None:
+    """
+    Update a report's summary for changed verdicts of active requirements.
+    
+    The summary is marked as updated even when no count changes, as its
+    update time versions the report's results (see the summary ETag), and
+    as having its results written, so reconcile_compliance_summaries
+    recounts it in case a concurrent write raced this one.
+    Summaries that have not been built yet are left alone, they are built
+    with the current results on first access (see
+    reconcile_compliance_summaries for changes racing that first build).
+    
+    Args:
+        report_id: The ID of the report
+        changes: Tuples of requirement category, previous verdict and new verdict
+    """
+    inc = Counter()
+    for category, previous, current in changes:
+        old_status, new_status = status_key(previous), status_key(current)
+        if old_status == new_status:
+            continue
+        
+        category_field = f"by_category.{category_key(category)}"
+        inc[f"{old_status}_count"] -= 1
+        inc[f"{category_field}.{old_status}"] -= 1
+        inc[f"{new_status}_count"] += 1
+        inc[f"{category_field}.{new_status}"] += 1
+    
+    now = datetime.utcnow()
+    update = {"$set": {"updated_at": now, "results_changed_at": now}}
+    inc = {field: delta for field, delta in inc.items() if delta}
+    if inc:
+        update["$inc"] = inc
+    
+    await ComplianceSummary.get_motor_collection().update_one({"report_id": report_id}, update)
+
+async def sync_requirement_summaries(
+    requirement_id: PydanticObjectId,
+    was_active: bool,
+    old_category: Optional[str],
+    is_active: bool,
+    new_category: Optional[str]
+) -> None:
+    """
+    Update all summaries after a requirement was added, removed or changed.
+    
+    A requirement counts towards the summaries while it is active, so
+    activating, deactivating or moving it to another category adjusts
+    every report's counts.
+    
+    Args:
+        requirement_id: The ID of the requirement
+        was_active: Whether the requirement was active before the change
+        old_category: Category of the requirement before the change
+        is_active: Whether the requirement is active after the change
+        new_category: Category of the requirement after the change
+    """
+    moved = category_key(old_category) != category_key(new_category)
+    
+    if was_active and (not is_active or moved):
+        await _apply_requirement_count(requirement_id, old_category, -1)
+    
+    if is_active and (not was_active or moved):
+        await _apply_requirement_count(requirement_id, new_category, 1)
+
+async def _apply_requirement_count(
+    requirement_id: PydanticObjectId,
+    category: Optional[str],
+    sign: int
+) -> None:
+    """Add (sign=1) or remove (sign=-1) one requirement from every summary."""
+    category_field = f"by_category.{category_key(category)}"
+    collection = ComplianceSummary.get_motor_collection()
+    now = datetime.utcnow()
+    
+    # Every report counts the requirement as pending...
+    await collection.update_many({}, {
+        "$inc": {
+            "total_requirements": sign,
+            "pending_count": sign,
+            f"{category_field}.total": sign,
+            f"{category_field}.pending": sign,
+        },
+        "$set": {"updated_at": now}
+    })
+    
+    # ...except the reports that already have a verdict for it
+    for is_compliant in (True, False):
+        status = status_key(is_compliant)
+        cursor = ComplianceResult.get_motor_collection().find(
+            {"requirement.$id": requirement_id, "is_compliant": is_compliant},
+            projection={"report": 1},
+            batch_size=1000
+        )
+        while chunk := await cursor.to_list(length=1000):
+            await collection.update_many(
+                {"report_id": {"$in": [doc["report"].id for doc in chunk]}},
+                {
+                    "$inc": {
+                        "pending_count": -sign,
+                        f"{status}_count": sign,
+                        f"{category_field}.pending": -sign,
+                        f"{category_field}.{status}": sign,
+                    },
+                    # Later than the first update, so a summary read in between changes ETag
+                    "$set": {"updated_at": datetime.utcnow()}
+                }
+            )
+    
+    logger.info(f"Updated compliance summaries for requirement ID {requirement_id} ({'added' if sign > 0 else 'removed'})")
+
+async def touch_compliance_summaries() -> None:
+    """
+    Mark all summaries as updated, without changing their counts.
+    
+    Used when a requirement shown with every report's results is renamed
+    or reworded, so clients holding a summary ETag fetch it again.
+    """
+    await ComplianceSummary.get_motor_collection().update_many({}, {"$set": {"updated_at": datetime.utcnow()}})
+
+async def delete_compliance_summary(report_id: PydanticObjectId) -> None:
+    """
+    Delete the compliance summary of a report.
+    
+    Args:
+        report_id: The ID of the report
+    """
+    await ComplianceSummary.find(ComplianceSummary.report_id == report_id).delete()
@@ -0,0 +1,214 @@
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from beanie import PydanticObjectId
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.models.report import Report
+from app.models.report_event import ReportEvent
+
+# Event types
+EVENT_STATUS = "status"
+EVENT_COMPLIANCE_STARTED = "compliance_started"
+EVENT_COMPLIANCE_PROGRESS = "compliance_progress"
+EVENT_COMPLIANCE_COMPLETED = "compliance_completed"
+
+# Error code of change streams on a standalone server
+_CHANGE_STREAM_UNSUPPORTED = 40573
+
+# Events kept per subscriber before the oldest are dropped
+_SUBSCRIBER_QUEUE_SIZE = 100
+
+# Polling looks back this far, as events from other processes may be stored out of order
+_POLL_OVERLAP = timedelta(seconds=5)
+
+class EventBus:
+    """In-process fan-out of report events to the subscribed clients."""
+    
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+    
+    def subscribe(self, report_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(report_id, set()).add(queue)
+        return queue
+    
+    def unsubscribe(self, report_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(report_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[report_id]
+    
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Hand an event to the subscribers of its report, dropping their oldest events if they lag."""
+        for queue in self._subscribers.get(event["report_id"], ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+def _event_message(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a stored event to the message sent to clients."""
+    return {
+        "report_id": str(document["report_id"]),
+        "type": document["type"],
+        "data": document.get("data", {}),
+        "created_at": document["created_at"].isoformat(),
+    }
+
+class MongoEventWatcher:
+    """
+    Relay the events stored by any process to this process's event bus.
+    
+    Uses a change stream on the events collection. On a standalone server,
+    where change streams are unavailable, the collection is polled instead.
+    A single watcher serves all the clients of a process.
+    """
+    
+    def __init__(self, bus: EventBus):
+        self.bus = bus
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        resume_token = None
+        
+        while True:
+            try:
+                async with ReportEvent.get_motor_collection().watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    logger.info("Relaying report events from a change stream")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.bus.dispatch(_event_message(change["fullDocument"]))
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams are unavailable, polling for report events")
+                    await self._poll()
+                    return
+                logger.error(f"Report event change stream failed: {e}")
+            except PyMongoError as e:
+                logger.error(f"Report event change stream failed: {e}")
+            
+            await asyncio.sleep(settings.EVENT_POLL_INTERVAL_SECONDS)
+    
+    async def _poll(self) -> None:
+        """Relay new events by polling the events collection."""
+        since = datetime.utcnow()
+        # Recently relayed event IDs, with when they were seen
+        seen: Dict[Any, float] = {}
+        
+        while True:
+            try:
+                polled_at = datetime.utcnow()
+                async for document in ReportEvent.get_motor_collection().find(
+                    {"created_at": {"$gte": since - _POLL_OVERLAP}}
+                ).sort("created_at", 1):
+                    if document["_id"] not in seen:
+                        seen[document["_id"]] = time.monotonic()
+                        self.bus.dispatch(_event_message(document))
+                since = polled_at
+                
+                expired = time.monotonic() - 2 * _POLL_OVERLAP.total_seconds()
+                seen = {event_id: at for event_id, at in seen.items() if at > expired}
+            except PyMongoError as e:
+                logger.error(f"Polling report events failed: {e}")
+            
+            await asyncio.sleep(settings.EVENT_POLL_INTERVAL_SECONDS)
+
+# Shared bus and watcher, created on first use
+_bus: Optional[EventBus] = None
+_watcher: Optional[MongoEventWatcher] = None
+
+def get_event_bus() -> EventBus:
+    """Get the process-wide event bus."""
+    global _bus
+    if _bus is None:
+        _bus = EventBus()
+    return _bus
+
+async def publish_report_event(report_id: PydanticObjectId, event_type: str, data: Dict[str, Any]) -> None:
+    """
+    Publish a progress event of a report.
+    
+    Events are published by the workers running the jobs, so they are
+    stored in Mongo, from where every API process relays them to its
+    clients. Events are best effort: a failure to publish is logged and
+    does not fail the calling job.
+    
+    Args:
+        report_id: The ID of the report
+        event_type: The event type
+        data: The event payload (JSON serializable)
+    """
+    try:
+        await ReportEvent(report_id=report_id, type=event_type, data=data).insert()
+    except Exception as e:
+        logger.warning(f"Could not publish {event_type} event for report ID {report_id}: {e}")
+
+def _status_data(report: Report) -> Dict[str, Any]:
+    return {"status": report.status.value, "page_count": report.page_count}
+
+async def publish_report_status(report: Report) -> None:
+    """Publish the current status of a report."""
+    await publish_report_event(report.id, EVENT_STATUS, _status_data(report))
+
+def status_message(report: Report) -> Dict[str, Any]:
+    """Build the status event message of a report's current state, sent when a client subscribes."""
+    return {
+        "report_id": str(report.id),
+        "type": EVENT_STATUS,
+        "data": _status_data(report),
+        "created_at": report.updated_at.isoformat(),
+    }
+
+@asynccontextmanager
+async def subscribe_report_events(report_id: PydanticObjectId) -> AsyncIterator[asyncio.Queue]:
+    """
+    Subscribe to the progress events of a report.
+    
+    Yields:
+        Queue receiving the events as messages
+    """
+    global _watcher
+    if _watcher is None:
+        _watcher = MongoEventWatcher(get_event_bus())
+    _watcher.start()
+    
+    bus = get_event_bus()
+    queue = bus.subscribe(str(report_id))
+    try:
+        yield queue
+    finally:
+        bus.unsubscribe(str(report_id), queue)
+
+async def stop_event_watcher() -> None:
+    """Stop relaying stored events, if a watcher was started."""
+    global _watcher
+    if _watcher is not None:
+        await _watcher.stop()
+        _watcher = None
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format an event message as a server-sent event."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
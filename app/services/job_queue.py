@@ -0,0 +1,248 @@
+
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from beanie import PydanticObjectId, UpdateResponse
+from loguru import logger
+from pymongo import ASCENDING
+
+from app.core.config import settings
+from app.models.compliance_batch import ComplianceBatch
+from app.models.job import Job, JobStatus
+
+# Job kinds
+JOB_PROCESS_PDF = "process_pdf_report"
+JOB_CHECK_COMPLIANCE = "check_compliance"
+JOB_RECHECK_REQUIREMENTS = "recheck_requirements"
+JOB_DELETE_BLOB = "delete_blob"
+
+# Number of jobs inserted per insert_many call
+_INSERT_BATCH_SIZE = 1000
+
+async def enqueue_job(kind: str, payload: Dict[str, Any], delay_seconds: float = 0) -> Job:
+    """
+    Add a job to the queue.
+    
+    Args:
+        kind: The kind of job, selecting its handler
+        payload: Keyword arguments passed to the handler
+        delay_seconds: How long to wait before the job is due
+        
+    Returns:
+        The queued job
+    """
+    job = Job(kind=kind, payload=payload, run_after=datetime.utcnow() + timedelta(seconds=delay_seconds))
+    await job.insert()
+    logger.debug(f"Queued {kind} job ID {job.id}")
+    return job
+
+async def enqueue_jobs(
+    kind: str,
+    payloads: List[Dict[str, Any]],
+    batch_id: Optional[PydanticObjectId] = None
+) -> int:
+    """
+    Add many jobs of the same kind to the queue in bulk.
+    
+    Args:
+        kind: The kind of job, selecting its handler
+        payloads: Keyword arguments passed to the handler, one per job
+        batch_id: ID of the batch the jobs belong to (optional)
+        
+    Returns:
+        Number of queued jobs
+    """
+    for start in range(0, len(payloads), _INSERT_BATCH_SIZE):
+        await Job.insert_many([
+            Job(kind=kind, payload=payload, batch_id=batch_id)
+            for payload in payloads[start:start + _INSERT_BATCH_SIZE]
+        ])
+    
+    logger.debug(f"Queued {len(payloads)} {kind} jobs")
+    return len(payloads)
+
+async def claim_job(worker_id: str) -> Optional[Job]:
+    """
+    Atomically claim the next due job and lease it to a worker.
+    
+    Jobs whose lease expired, because their worker crashed or was stopped,
+    are claimed again like queued jobs, unless they have used up their
+    attempts; those are marked as failed.
+    
+    Args:
+        worker_id: Identifier of the claiming worker
+        
+    Returns:
+        The claimed job, or None if no job is due
+    """
+    now = datetime.utcnow()
+    
+    await _fail_exhausted_jobs(now)
+    
+    return await Job.find_one({
+        "$or": [
+            {"status": JobStatus.QUEUED, "run_after": {"$lte": now}},
+            {
+                "status": JobStatus.RUNNING,
+                "lease_expires_at": {"$lt": now},
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+            },
+        ]
+    }).update(
+        {
+            "$set": {
+                "status": JobStatus.RUNNING,
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        response_type=UpdateResponse.NEW_DOCUMENT,
+        sort=[("run_after", ASCENDING)]
+    )
+
+async def _fail_exhausted_jobs(now: datetime) -> None:
+    """Mark as failed the jobs whose lease expired during their last attempt."""
+    query = {
+        "status": JobStatus.RUNNING,
+        "lease_expires_at": {"$lt": now},
+        "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+    }
+    collection = Job.get_motor_collection()
+    
+    # Rare, so they are failed one by one to count each in its batch once
+    failed = 0
+    async for doc in collection.find(query, projection={"batch_id": 1}):
+        result = await collection.update_one({**query, "_id": doc["_id"]}, {"$set": {
+            "status": JobStatus.FAILED,
+            "lease_expires_at": None,
+            "last_error": "Lease expired during the last attempt",
+            "finished_at": now,
+            "updated_at": now
+        }})
+        if result.modified_count:
+            failed += 1
+            await _count_batch_outcome(doc.get("batch_id"), JobStatus.FAILED)
+    
+    if failed:
+        logger.error(f"Marked {failed} jobs as failed after their lease expired during the last attempt")
+
+async def renew_lease(job: Job) -> bool:
+    """
+    Extend the lease of a running job.
+    
+    Args:
+        job: The running job
+        
+    Returns:
+        False if the job is no longer leased to its worker
+    """
+    now = datetime.utcnow()
+    result = await Job.get_motor_collection().update_one(
+        _owned_by_worker(job),
+        {"$set": {"lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS), "updated_at": now}}
+    )
+    return result.matched_count == 1
+
+async def complete_job(job: Job) -> None:
+    """
+    Mark a running job as succeeded.
+    
+    Args:
+        job: The running job
+    """
+    now = datetime.utcnow()
+    result = await Job.get_motor_collection().update_one(
+        _owned_by_worker(job),
+        {"$set": {
+            "status": JobStatus.SUCCEEDED,
+            "lease_expires_at": None,
+            "finished_at": now,
+            "updated_at": now
+        }}
+    )
+    if result.modified_count:
+        await _count_batch_outcome(job.batch_id, JobStatus.SUCCEEDED)
+
+async def fail_job(job: Job, error: str) -> None:
+    """
+    Record a failed attempt of a running job.
+    
+    The job is queued again after a backoff delay, or marked as failed
+    once it has used up its attempts.
+    
+    Args:
+        job: The running job
+        error: Description of the failure
+    """
+    now = datetime.utcnow()
+    update = {
+        "lease_expires_at": None,
+        "last_error": error,
+        "updated_at": now
+    }
+    
+    if job.attempts >= job.max_attempts:
+        logger.error(f"{job.kind} job ID {job.id} failed after {job.attempts} attempts: {error}")
+        update.update(status=JobStatus.FAILED, finished_at=now)
+    else:
+        delay = retry_delay(job.attempts)
+        logger.warning(f"{job.kind} job ID {job.id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+        update.update(status=JobStatus.QUEUED, run_after=now + timedelta(seconds=delay))
+    
+    result = await Job.get_motor_collection().update_one(_owned_by_worker(job), {"$set": update})
+    if result.modified_count and update["status"] == JobStatus.FAILED:
+        await _count_batch_outcome(job.batch_id, JobStatus.FAILED)
+
+def retry_delay(attempts: int) -> float:
+    """
+    Get the backoff delay before retrying a job.
+    
+    The delay doubles with each attempt from JOB_RETRY_BACKOFF_SECONDS, up
+    to JOB_RETRY_BACKOFF_MAX_SECONDS, plus up to one initial delay of
+    random jitter so jobs that failed together are not retried together.
+    
+    Args:
+        attempts: Number of attempts made so far
+        
+    Returns:
+        Delay in seconds
+    """
+    initial = settings.JOB_RETRY_BACKOFF_SECONDS
+    # The exponent is capped against overflow, the maximum is reached long before
+    delay = initial * 2 ** min(max(attempts - 1, 0), 32) + random.uniform(0, initial)
+    return min(delay, settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+
+def _owned_by_worker(job: Job) -> Dict[str, Any]:
+    """Filter matching a job only while it is still leased to the worker that claimed it."""
+    return {
+        "_id": job.id,
+        "status": JobStatus.RUNNING,
+        "worker_id": job.worker_id,
+        "attempts": job.attempts
+    }
+
+async def _count_batch_outcome(batch_id: Optional[PydanticObjectId], status: JobStatus) -> None:
+    """Count a finished job in its batch, which outlives the job."""
+    if batch_id is None:
+        return
+    field = "succeeded_count" if status == JobStatus.SUCCEEDED else "failed_count"
+    await ComplianceBatch.get_motor_collection().update_one({"_id": batch_id}, {"$inc": {field: 1}})
+
+async def get_batch_job_counts(batch_id: PydanticObjectId) -> Dict[str, int]:
+    """
+    Count the jobs of a batch by status.
+    
+    Args:
+        batch_id: ID of the batch
+        
+    Returns:
+        Dict of job status to number of jobs
+    """
+    counts = await Job.get_motor_collection().aggregate([
+        {"$match": {"batch_id": batch_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+    
+    return {row["_id"]: row["count"] for row in counts}
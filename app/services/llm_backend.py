@@ -0,0 +1,377 @@
+
+import asyncio
+import hashlib
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from app.core.config import settings
+from app.services.retrieval import Passage, format_passages
+
+BACKEND_STUB = "stub"
+BACKEND_HTTP = "http"
+
+# Path of the compliance check endpoint, served by app.stub_llm_server for local runs
+CHECK_PATH = "/v1/compliance/check"
+CHECK_BATCH_PATH = "/v1/compliance/check-batch"
+
+class LLMBackendError(Exception):
+    """Raised when the LLM backend cannot produce a verdict."""
+
+class CircuitOpenError(LLMBackendError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+class MalformedResponseError(LLMBackendError):
+    """Raised when the backend answered but its response could not be parsed."""
+
+class CircuitBreaker:
+    """
+    Stop calling a failing backend for a while.
+    
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_seconds``. Then a single trial call is let
+    through: success closes the circuit, failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+    
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+    
+    def before_call(self) -> None:
+        """
+        Check that a call may go through.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if self._opened_at is None:
+            return
+        
+        if self._trial_running or time.monotonic() - self._opened_at < self.reset_seconds:
+            raise CircuitOpenError("LLM backend circuit breaker is open")
+        
+        self._trial_running = True
+    
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("LLM backend recovered, closing circuit breaker")
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_running = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"LLM backend failed {self._failures} times in a row, opening circuit breaker")
+            self._opened_at = time.monotonic()
+    
+    def record_abandoned(self) -> None:
+        """Record a call that ended without telling whether the backend works (e.g. cancelled)."""
+        self._trial_running = False
+
+class ComplianceBackend(ABC):
+    """Interface of the services that decide whether a report meets a requirement."""
+    
+    @abstractmethod
+    async def check(
+        self,
+        passages: List[Passage],
+        requirement_name: str,
+        requirement_description: str
+    ) -> Dict[str, Any]:
+        """
+        Check report passages against a requirement.
+        
+        Args:
+            passages: The report passages retrieved for the requirement
+            requirement_name: The name of the requirement to check
+            requirement_description: The description of the requirement
+            
+        Returns:
+            Dict with is_compliant, confidence_score and evidence
+            
+        Raises:
+            LLMBackendError: If no verdict could be obtained
+        """
+    
+    @abstractmethod
+    async def check_batch(
+        self,
+        passages: List[Passage],
+        requirements: List[Tuple[str, str, str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Check report passages against several requirements in one call.
+        
+        Args:
+            passages: The report passages retrieved for all the requirements
+            requirements: (key, name, description) of each requirement
+            
+        Returns:
+            Verdicts by requirement key. Requirements the backend gave no
+            verdict for are missing.
+            
+        Raises:
+            MalformedResponseError: If the response could not be parsed
+            LLMBackendError: If the call failed
+        """
+    
+    async def close(self) -> None:
+        """Release the resources held by the backend."""
+
+_CITATION_RE = re.compile(r"^\[(page \d+, offset \d+)\]$", re.MULTILINE)
+
+def stub_verdict(document: str, requirement_name: str, requirement_description: str) -> Dict[str, Any]:
+    """
+    Deterministic stand-in for an LLM verdict.
+    
+    The verdict is derived from a hash of the inputs, so the same document
+    and requirement always give the same result. Used by the stub backend
+    and the stub server.
+    
+    Args:
+        document: The document excerpt, as rendered by format_passages
+        requirement_name: The name of the requirement to check
+        requirement_description: The description of the requirement
+        
+    Returns:
+        Dict with is_compliant, confidence_score and evidence
+    """
+    digest = hashlib.sha256(f"{requirement_name}\n{requirement_description}\n{document}".encode("utf-8")).digest()
+    citations = _CITATION_RE.findall(document)
+    is_compliant = bool(citations) and digest[0] % 2 == 0
+    confidence_score = 0.7 + 0.28 * digest[1] / 255
+    
+    if is_compliant:
+        citation = citations[digest[2] % len(citations)]
+        evidence = f"The document appears to comply with the requirement '{requirement_name}'. Evidence found at {citation}."
+    else:
+        searched = "; ".join(citations) or "no text"
+        evidence = f"The document does not appear to comply with the requirement '{requirement_name}'. The relevant passages ({searched}) lack necessary information or disclosures related to this requirement."
+    
+    return {
+        "is_compliant": is_compliant,
+        "confidence_score": round(confidence_score, 4),
+        "evidence": evidence
+    }
+
+class StubComplianceBackend(ComplianceBackend):
+    """
+    Offline backend returning deterministic verdicts after a fixed latency.
+    
+    Lets the whole pipeline be load-tested without an LLM.
+    """
+    
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+    
+    async def check(
+        self,
+        passages: List[Passage],
+        requirement_name: str,
+        requirement_description: str
+    ) -> Dict[str, Any]:
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        return stub_verdict(format_passages(passages), requirement_name, requirement_description)
+    
+    async def check_batch(
+        self,
+        passages: List[Passage],
+        requirements: List[Tuple[str, str, str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        document = format_passages(passages)
+        return {key: stub_verdict(document, name, description) for key, name, description in requirements}
+
+def _is_retryable(error: BaseException) -> bool:
+    """Transport errors, timeouts, throttling and server errors are worth retrying."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+def _parse_verdict(data: Any) -> Dict[str, Any]:
+    """
+    Validate a verdict returned by the backend.
+    
+    Raises:
+        MalformedResponseError: If a field is missing or has the wrong type
+    """
+    try:
+        return {
+            "is_compliant": bool(data["is_compliant"]),
+            "confidence_score": float(data["confidence_score"]),
+            "evidence": str(data["evidence"])
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise MalformedResponseError(f"Malformed response from LLM backend: {e!r}")
+
+class HTTPComplianceBackend(ComplianceBackend):
+    """
+    Backend calling an LLM service over HTTP.
+    
+    One connection-pooled client is shared by all calls for the life of the
+    process. Each call has its own timeout. Transient failures are retried
+    with jittered exponential backoff, and a circuit breaker fails fast
+    while the service is down.
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        timeout_seconds: float,
+        connect_timeout_seconds: float,
+        max_connections: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+        circuit_breaker: CircuitBreaker
+    ):
+        self.model = model
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.circuit_breaker = circuit_breaker
+        
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+    
+    async def check(
+        self,
+        passages: List[Passage],
+        requirement_name: str,
+        requirement_description: str
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "requirement": {"name": requirement_name, "description": requirement_description},
+            "document": format_passages(passages)
+        }
+        return _parse_verdict(await self._post(CHECK_PATH, payload))
+    
+    async def check_batch(
+        self,
+        passages: List[Passage],
+        requirements: List[Tuple[str, str, str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        payload = {
+            "model": self.model,
+            "requirements": [
+                {"id": key, "name": name, "description": description}
+                for key, name, description in requirements
+            ],
+            "document": format_passages(passages)
+        }
+        data = await self._post(CHECK_BATCH_PATH, payload)
+        
+        try:
+            verdicts = {str(item["id"]): _parse_verdict(item) for item in data["verdicts"]}
+        except (KeyError, TypeError) as e:
+            raise MalformedResponseError(f"Malformed batch response from LLM backend: {e!r}")
+        
+        keys = {key for key, _, _ in requirements}
+        return {key: verdict for key, verdict in verdicts.items() if key in keys}
+    
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Any:
+        """
+        POST a request with retries, through the circuit breaker.
+        
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            MalformedResponseError: If the response body is not JSON
+            LLMBackendError: If the request failed after all attempts
+        """
+        self.circuit_breaker.before_call()
+        
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_attempts),
+                wait=wait_exponential_jitter(initial=self.backoff_seconds, max=self.backoff_max_seconds),
+                retry=retry_if_exception(_is_retryable),
+                reraise=True
+            ):
+                with attempt:
+                    response = await self._client.post(path, json=payload)
+                    response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.circuit_breaker.record_failure()
+            raise LLMBackendError(f"LLM backend request failed: {e!r}") from e
+        except BaseException:
+            # Cancelled, or failed before reaching the backend: a trial call
+            # must still free its slot, or the circuit never closes
+            self.circuit_breaker.record_abandoned()
+            raise
+        
+        self.circuit_breaker.record_success()
+        
+        try:
+            return response.json()
+        except ValueError as e:
+            raise MalformedResponseError(f"LLM backend returned invalid JSON: {e}")
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+
+# Shared backend, created on first use
+_backend: Optional[ComplianceBackend] = None
+
+def get_compliance_backend() -> ComplianceBackend:
+    """Get the process-wide compliance backend selected by LLM_BACKEND."""
+    global _backend
+    if _backend is None:
+        if settings.LLM_BACKEND == BACKEND_HTTP:
+            _backend = HTTPComplianceBackend(
+                base_url=settings.LLM_API_URL,
+                api_key=settings.LLM_API_KEY,
+                model=settings.LLM_MODEL_VERSION,
+                timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+                connect_timeout_seconds=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_attempts=settings.LLM_MAX_ATTEMPTS,
+                backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+                backoff_max_seconds=settings.LLM_RETRY_BACKOFF_MAX_SECONDS,
+                circuit_breaker=CircuitBreaker(
+                    settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                    settings.LLM_CIRCUIT_RESET_SECONDS
+                )
+            )
+        elif settings.LLM_BACKEND == BACKEND_STUB:
+            _backend = StubComplianceBackend(settings.LLM_STUB_LATENCY_SECONDS)
+        else:
+            raise ValueError(f"Unknown LLM_BACKEND {settings.LLM_BACKEND!r}")
+        logger.info(f"Using {settings.LLM_BACKEND} compliance backend")
+    return _backend
+
+async def close_compliance_backend() -> None:
+    """Close the shared compliance backend, if it was created."""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,132 @@
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+
+class PageTextCache:
+    """
+    Persistent on-disk cache of extracted page text.
+    
+    Entries are keyed by a hash of the page content and the extractor
+    configuration, and the total size of the cached text is bounded by
+    evicting the least recently used entries. The cache is an SQLite file,
+    so it is shared by every process on the host (API and workers).
+    
+    All methods block and should be called from a worker thread.
+    """
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Look up the cached text of several pages.
+        
+        Args:
+            keys: Cache keys of the pages
+            
+        Returns:
+            Dict of the keys found in the cache to their text
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, text FROM pages WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+                
+                if rows:
+                    conn.execute(
+                        f"UPDATE pages SET last_access = ? WHERE key IN ({placeholders})",
+                        [time.time(), *chunk]
+                    )
+            
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (len(found),))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'misses'", (len(keys) - len(found),))
+        
+        return found
+    
+    def put_many(self, entries: Dict[str, str]) -> None:
+        """
+        Store the text of several pages and evict old entries if needed.
+        
+        Args:
+            entries: Dict of cache keys to page text
+        """
+        if not entries:
+            return
+        
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                [(key, text, len(text.encode("utf-8")), now) for key, text in entries.items()]
+            )
+            # Keep the most recently used entries that fit in max_bytes
+            conn.execute(
+                "DELETE FROM pages WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running "
+                "FROM pages) WHERE running > ?)",
+                (self.max_bytes,)
+            )
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache usage statistics.
+        
+        Returns:
+            Dict with cumulative hits and misses, entry count and stored bytes
+        """
+        with closing(self._connect()) as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes
+        }
+
+# Shared cache instance, created on first use
+_page_cache: Optional[PageTextCache] = None
+
+def get_page_cache() -> Optional[PageTextCache]:
+    """Get the shared page text cache, or None if caching is disabled."""
+    global _page_cache
+    if not settings.PAGE_CACHE_ENABLED:
+        return None
+    if _page_cache is None:
+        _page_cache = PageTextCache(settings.PAGE_CACHE_PATH, settings.PAGE_CACHE_MAX_BYTES)
+    return _page_cache
@@ -0,0 +1,162 @@
+
+import hashlib
+from typing import List, Optional, Tuple
+
+import pytesseract
+from pdf2image import convert_from_path
+from pypdf import PdfReader
+
+# Bump whenever a change to this module alters the extracted text, so that
+# cached page text from older versions is no longer used
+EXTRACTOR_VERSION = "1"
+
+# How the text of a page was obtained
+METHOD_TEXT_LAYER = "text"
+METHOD_OCR = "ocr"
+METHOD_FAILED = "failed"
+
+# The functions in this module are CPU-bound and run in worker processes of
+# the extraction pool, so they are kept free of application state and only
+# take and return picklable values.
+
+def count_pages(file_path: str) -> int:
+    """
+    Count the pages of a PDF file.
+    
+    Args:
+        file_path: Path to the PDF file
+        
+    Returns:
+        Number of pages in the document
+    """
+    return len(PdfReader(file_path).pages)
+
+def page_fingerprints(file_path: str) -> List[Optional[str]]:
+    """
+    Hash the content of every page of a PDF file.
+    
+    A page's fingerprint covers its raw content stream together with the
+    images, form XObjects and fonts it draws, so it changes whenever the
+    rendered page could change (scanned pages typically share an identical
+    content stream and only differ in their image data).
+    
+    Args:
+        file_path: Path to the PDF file
+        
+    Returns:
+        List of SHA-256 hex digests in page order, None for pages that
+        could not be fingerprinted
+    """
+    return [_page_fingerprint(page) for page in PdfReader(file_path).pages]
+
+def extract_pages(
+    file_path: str,
+    page_numbers: List[int],
+    min_text_chars: int,
+    ocr_dpi: int,
+    ocr_language: str
+) -> List[Tuple[str, str]]:
+    """
+    Extract the text of selected pages of a PDF file.
+    
+    The embedded text layer is used where it holds at least ``min_text_chars``
+    characters. Other pages are rasterised and OCR'd one at a time.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_numbers: 1-based numbers of the pages to extract
+        min_text_chars: Minimum text layer length for a page to skip OCR
+        ocr_dpi: Resolution used to rasterise pages for OCR
+        ocr_language: Tesseract language code(s)
+        
+    Returns:
+        List of (text, method) tuples, one per requested page
+    """
+    reader = PdfReader(file_path)
+    
+    return [
+        _extract_page(reader, file_path, page_number, min_text_chars, ocr_dpi, ocr_language)
+        for page_number in page_numbers
+    ]
+
+def ocr_page(file_path: str, page_number: int, dpi: int, language: str) -> str:
+    """
+    Rasterise a single page and run OCR on it.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_number: 1-based number of the page
+        dpi: Rasterisation resolution
+        language: Tesseract language code(s)
+        
+    Returns:
+        The recognised text
+    """
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return "\n".join(pytesseract.image_to_string(image, lang=language) for image in images)
+
+def _extract_page(
+    reader: PdfReader,
+    file_path: str,
+    page_number: int,
+    min_text_chars: int,
+    ocr_dpi: int,
+    ocr_language: str
+) -> Tuple[str, str]:
+    """Extract one page, falling back to OCR when the text layer is missing."""
+    try:
+        text = reader.pages[page_number - 1].extract_text() or ""
+    except Exception:
+        text = ""
+    
+    if len(text.strip()) >= min_text_chars:
+        return text, METHOD_TEXT_LAYER
+    
+    try:
+        return ocr_page(file_path, page_number, ocr_dpi, ocr_language), METHOD_OCR
+    except Exception:
+        # Keep whatever the text layer had rather than failing the document
+        return text, METHOD_FAILED
+
+def _page_fingerprint(page) -> Optional[str]:
+    """Hash a page's content stream and the resources it uses."""
+    try:
+        digest = hashlib.sha256()
+        digest.update(str(page.get("/Rotate", 0)).encode())
+        digest.update(str(list(page.mediabox)).encode())
+        
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        
+        _hash_resources(digest, page.get("/Resources"), depth=0)
+        return digest.hexdigest()
+    except Exception:
+        return None
+
+def _hash_resources(digest, resources, depth: int) -> None:
+    """Feed the XObjects and fonts of a resource dictionary into a digest."""
+    if resources is None or depth > 5:
+        return
+    resources = resources.get_object()
+    
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(name.encode())
+            digest.update(xobject.get_data())
+            # Form XObjects carry their own resources
+            _hash_resources(digest, xobject.get("/Resources"), depth + 1)
+    
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(name.encode())
+            digest.update(str(font.get("/BaseFont", "")).encode())
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
@@ -1,111 +1,236 @@
 
 import os
-import tempfile
 import asyncio
+import functools
+import hashlib
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from loguru import logger
-from typing import Optional
-import subprocess
-from sqlalchemy import update
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from typing import Dict, List, Optional
 
-from app.db.session import async_session
+from app.core.config import settings
 from app.models.report import Report, ReportStatus
+from app.services import pdf_extraction
+from app.services.events import publish_report_status
+from app.services.page_cache import get_page_cache
+from app.services.report_text import save_report_pages
+from app.services.storage import StoredObjectNotFoundError, get_storage
+from app.services.upload_store import report_blob_key
 
-async def process_pdf_report(report_id: int, file_path: str) -> None:
+# Process pool for CPU-bound extraction work, created on first use
+_executor: Optional[ProcessPoolExecutor] = None
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    """Get the shared process pool used for PDF extraction."""
+    global _executor
+    if _executor is None:
+        workers = settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+        # Spawn rather than fork, the parent process runs threads (Motor, asyncio)
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Started PDF extraction pool with {workers} workers")
+    return _executor
+
+def shutdown_extraction_executor() -> None:
+    """Shut down the PDF extraction pool if it was started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        logger.info("PDF extraction pool shut down")
+
+async def process_pdf_report(report_id: str, file_path: Optional[str] = None) -> None:
     """
     Process a PDF report file and extract text content.
     
-    This is run as a background task.
+    This is run as a background job. The file is read through the storage
+    backend, so any worker can process any report. Errors are re-raised
+    after the report is marked as failed, so the job queue can retry it.
     
     Args:
         report_id: The ID of the report in the database
-        file_path: Path to the PDF file
+        file_path: Unused, set by jobs queued before files were stored by key
     """
     logger.info(f"Starting to process report ID {report_id}")
     
-    # Create an async session for database operations
-    async with async_session() as db:
+    try:
+        report = await Report.get(report_id)
+        
+        if not report:
+            logger.error(f"Report ID {report_id} not found")
+            return
+        
+        # Update report status to processing
+        report.status = ReportStatus.PROCESSING
+        await report.save_with_timestamp()
+        await publish_report_status(report)
+        
+        # Extract text from a local copy of the PDF
+        pages = None
+        key = report_blob_key(report)
+        try:
+            if key:
+                async with get_storage().local_copy(key) as local_path:
+                    pages = await extract_pages_from_pdf(local_path)
+        except StoredObjectNotFoundError as e:
+            logger.error(f"PDF file of report ID {report_id} not found: {e}")
+        
+        if not pages or not any(page.strip() for page in pages):
+            logger.error(f"Failed to extract text from report ID {report_id}")
+            report.status = ReportStatus.FAILED
+            await report.save_with_timestamp()
+            await publish_report_status(report)
+            return
+        
+        # Store the extracted text page by page, outside the report document
+        await save_report_pages(report, pages)
+        
+        report.page_count = len(pages)
+        report.status = ReportStatus.COMPLETED
+        await report.save_with_timestamp()
+        await publish_report_status(report)
+        
+        logger.info(f"Successfully processed report ID {report_id}")
+        
+    except Exception as e:
+        logger.error(f"Error processing report ID {report_id}: {e}")
+        
         try:
-            # Update report status to processing
-            await db.execute(
-                update(Report)
-                .where(Report.id == report_id)
-                .values(status=ReportStatus.PROCESSING)
-            )
-            await db.commit()
-            
-            # Extract text from PDF
-            extracted_text = await extract_text_from_pdf(file_path)
-            
-            if not extracted_text:
-                logger.error(f"Failed to extract text from report ID {report_id}")
-                await db.execute(
-                    update(Report)
-                    .where(Report.id == report_id)
-                    .values(status=ReportStatus.FAILED)
-                )
-                await db.commit()
-                return
-            
-            # Update the report with the extracted text
-            await db.execute(
-                update(Report)
-                .where(Report.id == report_id)
-                .values(
-                    processed_text=extracted_text,
-                    status=ReportStatus.COMPLETED
-                )
-            )
-            await db.commit()
-            
-            logger.info(f"Successfully processed report ID {report_id}")
-            
-        except Exception as e:
-            logger.error(f"Error processing report ID {report_id}: {e}")
-            
             # Update report status to failed
-            await db.execute(
-                update(Report)
-                .where(Report.id == report_id)
-                .values(status=ReportStatus.FAILED)
-            )
-            await db.commit()
+            report = await Report.get(report_id)
+            if report:
+                report.status = ReportStatus.FAILED
+                await report.save_with_timestamp()
+                await publish_report_status(report)
+        except Exception as update_error:
+            logger.error(f"Error updating report status: {update_error}")
+        
+        raise
 
 async def extract_text_from_pdf(file_path: str) -> Optional[str]:
     """
     Extract text content from a PDF file.
     
-    In a real implementation, this would use a proper PDF text extraction library.
-    For demonstration purposes, we're using a simplistic approach.
-    
     Args:
         file_path: Path to the PDF file
         
     Returns:
         Extracted text or None if extraction failed
     """
+    pages = await extract_pages_from_pdf(file_path)
+    
+    if not pages or not any(page.strip() for page in pages):
+        return None
+    
+    return "\n\n".join(pages)
+
+async def extract_pages_from_pdf(file_path: str) -> Optional[List[str]]:
+    """
+    Extract the text of every page of a PDF file.
+    
+    Pages whose content is already in the page cache are taken from it.
+    The remaining pages are split into batches that are extracted in
+    parallel in the extraction process pool, so the event loop is never
+    blocked. Each page uses its text layer when present and is OCR'd
+    otherwise.
+    
+    Args:
+        file_path: Path to the PDF file
+        
+    Returns:
+        List of page texts in page order, or None if extraction failed
+    """
     if not os.path.exists(file_path):
         logger.error(f"PDF file not found: {file_path}")
         return None
     
+    loop = asyncio.get_running_loop()
+    executor = get_extraction_executor()
+    
     try:
-        # In a real implementation, we would use a proper PDF extraction library
-        # For this demo, we'll simulate extraction by creating a mock output
-        # This is where you would integrate with tools like pdfminer, PyPDF2, etc.
-        
-        # For demo purposes, return some mock extracted text
-        return f"""
-        This is simulated text extracted from the PDF file.
+        cache = await asyncio.to_thread(get_page_cache)
+    except Exception as e:
+        # A corrupt or unwritable cache file only costs extracting every page
+        logger.warning(f"Could not open page cache: {e}")
+        cache = None
+    
+    try:
+        # Look up pages that were already extracted, e.g. in an earlier version of the report
+        keys: List[Optional[str]] = []
+        cached: Dict[str, str] = {}
+        if cache:
+            fingerprints = await loop.run_in_executor(executor, pdf_extraction.page_fingerprints, file_path)
+            keys = [_page_cache_key(fingerprint) if fingerprint else None for fingerprint in fingerprints]
+            page_count = len(fingerprints)
+            try:
+                cached = await asyncio.to_thread(cache.get_many, [key for key in keys if key])
+            except Exception as e:
+                # A locked or corrupt cache only costs re-extracting the pages
+                logger.warning(f"Could not read page cache: {e}")
+        else:
+            page_count = await loop.run_in_executor(executor, pdf_extraction.count_pages, file_path)
+            keys = [None] * page_count
         
-        In a real implementation, this would contain the actual text content
-        extracted from the PDF document using a proper extraction library.
+        missing = [number for number, key in enumerate(keys, start=1) if key not in cached]
         
-        The extracted text would then be analyzed for regulatory compliance.
+        batch_size = settings.PDF_PAGES_PER_TASK
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
         
-        File path: {file_path}
-        File size: {os.path.getsize(file_path)} bytes
-        """
+        extract = functools.partial(
+            pdf_extraction.extract_pages,
+            file_path,
+            min_text_chars=settings.OCR_MIN_TEXT_CHARS,
+            ocr_dpi=settings.OCR_DPI,
+            ocr_language=settings.OCR_LANGUAGE
+        )
+        batch_results = await asyncio.gather(
+            *(loop.run_in_executor(executor, extract, pages) for pages in batches)
+        )
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory), start a fresh pool next time
+        logger.error(f"PDF extraction pool broke while processing {file_path}: {e}")
+        shutdown_extraction_executor()
+        return None
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
         return None
+    
+    extracted = dict(zip(missing, (result for batch in batch_results for result in batch)))
+    
+    if cache:
+        # Failed pages are left out so they are retried next time
+        new_entries = {
+            keys[number - 1]: text
+            for number, (text, method) in extracted.items()
+            if keys[number - 1] and method != pdf_extraction.METHOD_FAILED
+        }
+        try:
+            await asyncio.to_thread(cache.put_many, new_entries)
+        except Exception as e:
+            logger.warning(f"Could not update page cache: {e}")
+    
+    methods = Counter(method for _, method in extracted.values())
+    logger.info(
+        f"Extracted {page_count} pages from {file_path} "
+        f"(cached: {page_count - len(missing)}, "
+        f"text layer: {methods[pdf_extraction.METHOD_TEXT_LAYER]}, "
+        f"OCR: {methods[pdf_extraction.METHOD_OCR]}, "
+        f"failed: {methods[pdf_extraction.METHOD_FAILED]})"
+    )
+    
+    return [
+        extracted[number][0] if number in extracted else cached[keys[number - 1]]
+        for number in range(1, page_count + 1)
+    ]
+
+def _page_cache_key(fingerprint: str) -> str:
+    """Build the page cache key for a page fingerprint and the current extractor settings."""
+    config = (
+        f"{pdf_extraction.EXTRACTOR_VERSION}|{settings.OCR_MIN_TEXT_CHARS}|"
+        f"{settings.OCR_DPI}|{settings.OCR_LANGUAGE}|{fingerprint}"
+    )
+    return hashlib.sha256(config.encode()).hexdigest()
@@ -0,0 +1,54 @@
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+class TokenBucket:
+    """
+    Asynchronous token bucket rate limiter.
+    
+    Tokens are added continuously at ``rate`` per second up to ``capacity``,
+    which allows short bursts while bounding the sustained rate. Waiters are
+    served in arrival order.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Wait until the given number of tokens is available and take them.
+        
+        Args:
+            tokens: Number of tokens to take
+        """
+        if self.rate <= 0:
+            return
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+# Shared limiter for calls to the LLM backend, created on first use
+_llm_rate_limiter: Optional[TokenBucket] = None
+
+def get_llm_rate_limiter() -> TokenBucket:
+    """Get the process-wide rate limiter for LLM backend calls."""
+    global _llm_rate_limiter
+    if _llm_rate_limiter is None:
+        _llm_rate_limiter = TokenBucket(settings.LLM_RATE_LIMIT_PER_SECOND, settings.LLM_RATE_LIMIT_BURST)
+    return _llm_rate_limiter
@@ -0,0 +1,173 @@
+
+import asyncio
+import re
+from typing import Any, Dict, List, Optional, Pattern
+
+from app.core.config import settings
+from app.db.session import dashboard_collection
+from app.models.report import Report
+from app.models.report_page import ReportPage
+
+# Report fields returned with each search result
+_REPORT_FIELDS = {"file_name": 1, "company_name": 1, "fiscal_year": 1, "upload_date": 1}
+
+def snippet_patterns(query: str) -> List[Pattern]:
+    """
+    Build the patterns locating the hit of a search query in a page.
+    
+    Quoted phrases are looked for first, then the single terms. Negated
+    terms (``-term``) are left out. Terms match as word prefixes, so a
+    search for "risk" finds "risks", close to the stemming of the text
+    index.
+    
+    Args:
+        query: The search query
+        
+    Returns:
+        Patterns in order of preference
+    """
+    phrases = [phrase.split() for phrase in re.findall(r'"([^"]+)"', query)]
+    terms = {
+        word
+        for token in re.sub(r'"[^"]*"', " ", query).split()
+        if not token.startswith("-")
+        for word in re.findall(r"\w+", token)
+    }
+    
+    patterns = []
+    if any(phrases):
+        patterns.append(re.compile(
+            r"\b(?:" + "|".join(r"\s+".join(map(re.escape, phrase)) for phrase in phrases if phrase) + ")",
+            re.IGNORECASE
+        ))
+    if terms:
+        patterns.append(re.compile(
+            r"\b(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True))) + ")",
+            re.IGNORECASE
+        ))
+    return patterns
+
+def make_snippet(text: str, patterns: List[Pattern], width: int) -> str:
+    """
+    Cut the part of a page around its first hit.
+    
+    Args:
+        text: The page text
+        patterns: Patterns of the hit, in order of preference (see snippet_patterns)
+        width: Length of the snippet in characters
+        
+    Returns:
+        The snippet, with whitespace collapsed and ellipses where the text was cut
+    """
+    match = next((match for pattern in patterns if (match := pattern.search(text))), None)
+    
+    # Put the hit a third of the way into the snippet
+    start = max(match.start() - width // 3, 0) if match else 0
+    end = min(start + width, len(text))
+    
+    snippet = " ".join(text[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+async def search_report_text(
+    query: str,
+    company_name: Optional[str] = None,
+    fiscal_year: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Search the extracted text of all reports.
+    
+    Pages are matched with the text index of the report pages and ranked
+    by text score. Only the SEARCH_MAX_PAGE_HITS best pages are grouped
+    into reports, which bounds the work of a search however common its
+    terms are. Reports are ranked by their best page, then by how many of
+    those pages they have. Page texts are only read for the snippets of
+    the returned reports.
+    
+    Args:
+        query: The search query, in MongoDB text search syntax ("phrases", -negations)
+        company_name: Only search the reports of this company
+        fiscal_year: Only search the reports of this fiscal year
+        skip: Number of ranked reports to skip
+        limit: Maximum number of reports to return
+        
+    Returns:
+        The matching reports, best first, with their best pages and snippets
+    """
+    match: Dict[str, Any] = {"$text": {"$search": query}}
+    if company_name is not None:
+        match["company_name"] = company_name
+    if fiscal_year is not None:
+        match["fiscal_year"] = fiscal_year
+    
+    pages = dashboard_collection(ReportPage)
+    hits = await pages.aggregate([
+        {"$match": match},
+        {"$sort": {"score": {"$meta": "textScore"}}},
+        {"$limit": settings.SEARCH_MAX_PAGE_HITS},
+        {"$project": {"report_id": 1, "page_number": 1, "score": {"$meta": "textScore"}}},
+        # Pages arrive best first, so each report's list is in score order
+        {"$group": {
+            "_id": "$report_id",
+            "score": {"$max": "$score"},
+            "page_hits": {"$sum": 1},
+            "pages": {"$push": {"page_number": "$page_number", "score": "$score"}},
+        }},
+        {"$sort": {"score": -1, "page_hits": -1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$set": {"pages": {"$slice": ["$pages", settings.SEARCH_SNIPPET_PAGES]}}},
+    ]).to_list(length=limit)
+    
+    if not hits:
+        return []
+    
+    reports, texts = await asyncio.gather(
+        dashboard_collection(Report).find(
+            {"_id": {"$in": [hit["_id"] for hit in hits]}},
+            projection=_REPORT_FIELDS
+        ).to_list(length=None),
+        pages.find(
+            {"$or": [
+                {"report_id": hit["_id"], "page_number": {"$in": [page["page_number"] for page in hit["pages"]]}}
+                for hit in hits
+            ]},
+            projection={"report_id": 1, "page_number": 1, "text": 1}
+        ).to_list(length=None)
+    )
+    
+    reports_by_id = {report["_id"]: report for report in reports}
+    text_by_page = {(page["report_id"], page["page_number"]): page["text"] for page in texts}
+    patterns = snippet_patterns(query)
+    
+    results = []
+    for hit in hits:
+        report = reports_by_id.get(hit["_id"])
+        if report is None:
+            # Deleted since its pages matched
+            continue
+        
+        results.append({
+            "report_id": hit["_id"],
+            "file_name": report["file_name"],
+            "company_name": report.get("company_name"),
+            "fiscal_year": report.get("fiscal_year"),
+            "upload_date": report["upload_date"],
+            "score": hit["score"],
+            "page_hits": hit["page_hits"],
+            "pages": [
+                {
+                    "page_number": page["page_number"],
+                    "score": page["score"],
+                    "snippet": make_snippet(
+                        text_by_page.get((hit["_id"], page["page_number"]), ""),
+                        patterns,
+                        settings.SEARCH_SNIPPET_CHARS
+                    ),
+                }
+                for page in hit["pages"]
+            ],
+        })
+    
+    return results
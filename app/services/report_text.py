@@ -0,0 +1,165 @@
+
+from typing import AsyncIterator, List
+from beanie import PydanticObjectId
+from loguru import logger
+from pymongo import UpdateMany
+
+from app.models.report import Report
+from app.models.report_page import ReportPage
+
+# Number of pages inserted per insert_many call
+_INSERT_BATCH_SIZE = 100
+
+async def save_report_pages(report: Report, pages: List[str]) -> None:
+    """
+    Store the extracted text of a report, one document per page.
+    
+    Any previously stored pages of the report are replaced.
+    
+    The report may be edited while its text is extracted, so its company
+    name and fiscal year are read again once the pages are stored, then
+    copied onto the pages and the given report.
+    
+    Args:
+        report: The report
+        pages: Page texts in page order
+    """
+    await delete_report_pages(report.id)
+    
+    for start in range(0, len(pages), _INSERT_BATCH_SIZE):
+        await ReportPage.insert_many([
+            ReportPage(
+                report_id=report.id,
+                page_number=number,
+                text=text,
+                company_name=report.company_name,
+                fiscal_year=report.fiscal_year
+            )
+            for number, text in enumerate(pages[start:start + _INSERT_BATCH_SIZE], start=start + 1)
+        ])
+    
+    current = await Report.get_motor_collection().find_one(
+        {"_id": report.id},
+        projection={"company_name": 1, "fiscal_year": 1}
+    )
+    if current and (current.get("company_name"), current.get("fiscal_year")) != (report.company_name, report.fiscal_year):
+        report.company_name = current.get("company_name")
+        report.fiscal_year = current.get("fiscal_year")
+        await update_report_page_metadata(report)
+
+async def update_report_page_metadata(report: Report) -> None:
+    """
+    Copy a report's company name and fiscal year onto its stored pages.
+    
+    Args:
+        report: The report
+    """
+    await ReportPage.get_motor_collection().update_many(
+        {"report_id": report.id},
+        {"$set": {"company_name": report.company_name, "fiscal_year": report.fiscal_year}}
+    )
+
+async def backfill_report_page_metadata() -> int:
+    """
+    Copy the company name and fiscal year of every processed report onto its pages.
+    
+    Pages extracted before search existed lack them, so filtered searches
+    would not find them.
+    
+    Returns:
+        Number of reports updated
+    """
+    cursor = Report.get_motor_collection().find(
+        {"page_count": {"$gt": 0}},
+        projection={"company_name": 1, "fiscal_year": 1},
+        batch_size=_INSERT_BATCH_SIZE * 10
+    )
+    
+    updated = 0
+    while chunk := await cursor.to_list(length=_INSERT_BATCH_SIZE * 10):
+        await ReportPage.get_motor_collection().bulk_write([
+            UpdateMany(
+                {"report_id": doc["_id"]},
+                {"$set": {"company_name": doc.get("company_name"), "fiscal_year": doc.get("fiscal_year")}}
+            )
+            for doc in chunk
+        ], ordered=False)
+        updated += len(chunk)
+    
+    logger.info(f"Copied report metadata onto the pages of {updated} reports")
+    return updated
+
+async def delete_report_pages(report_id: PydanticObjectId) -> None:
+    """
+    Delete the stored page texts of a report.
+    
+    Args:
+        report_id: The ID of the report
+    """
+    await ReportPage.find(ReportPage.report_id == report_id).delete()
+
+async def copy_report_pages(source_id: PydanticObjectId, target: Report) -> None:
+    """
+    Copy the stored page texts of one report onto another.
+    
+    The copy runs entirely on the server, the text is never loaded into
+    the application.
+    
+    Args:
+        source_id: The ID of the report whose pages are copied
+        target: The report receiving the copies
+    """
+    await ReportPage.get_motor_collection().aggregate([
+        {"$match": {"report_id": source_id}},
+        {"$project": {
+            "_id": 0,
+            "page_number": 1,
+            "text": 1,
+            "created_at": "$$NOW",
+            "report_id": {"$literal": target.id},
+            "company_name": {"$literal": target.company_name},
+            "fiscal_year": {"$literal": target.fiscal_year},
+        }},
+        {"$merge": {"into": ReportPage.Settings.name, "on": ["report_id", "page_number"], "whenMatched": "replace"}},
+    ]).to_list(length=None)
+    
+    logger.info(f"Copied page text from report ID {source_id} to report ID {target.id}")
+
+async def iter_report_pages(
+    report_id: PydanticObjectId,
+    first_page: int = 1,
+    limit: int = 0
+) -> AsyncIterator[ReportPage]:
+    """
+    Iterate over the stored pages of a report in page order.
+    
+    Args:
+        report_id: The ID of the report
+        first_page: 1-based number of the first page to return
+        limit: Maximum number of pages to return (0 for all)
+        
+    Yields:
+        The report pages
+    """
+    query = ReportPage.find(
+        ReportPage.report_id == report_id,
+        ReportPage.page_number >= first_page
+    ).sort(+ReportPage.page_number)
+    
+    if limit:
+        query = query.limit(limit)
+    
+    async for page in query:
+        yield page
+
+async def load_report_text(report_id: PydanticObjectId) -> str:
+    """
+    Load the full extracted text of a report.
+    
+    Args:
+        report_id: The ID of the report
+        
+    Returns:
+        The text of all pages joined in page order
+    """
+    return "\n\n".join([page.text async for page in iter_report_pages(report_id)])
@@ -0,0 +1,139 @@
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+# Words too common to help rank passages
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being by can could did do does
+for from had has have if in into is it its may might must no not of on or other our shall
+should such than that the their them there these they this those to under was we were what
+when which while who will with within would you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased terms, dropping stopwords and single characters."""
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+@dataclass(frozen=True)
+class Passage:
+    """A chunk of report text, located by page number and character offset in the page."""
+    page_number: int
+    offset: int
+    text: str
+    
+    def citation(self) -> str:
+        """Human readable location of the passage."""
+        return f"page {self.page_number}, offset {self.offset}"
+
+def format_passages(passages: List[Passage]) -> str:
+    """
+    Render retrieved passages as the document excerpt sent to the LLM.
+    
+    Each passage is headed by its location so the model can cite it.
+    """
+    return "\n\n".join(f"[{passage.citation()}]\n{passage.text}" for passage in passages)
+
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    passage_chars: int,
+    overlap_chars: int
+) -> List[Passage]:
+    """
+    Split page texts into overlapping passages.
+    
+    Passages never span pages, so each one can be cited by page and offset.
+    Boundaries are moved back to the last whitespace so words are not cut.
+    
+    Args:
+        pages: (page number, text) pairs
+        passage_chars: Maximum length of a passage
+        overlap_chars: Characters shared by consecutive passages of a page
+        
+    Returns:
+        The passages in page order
+    """
+    step = max(passage_chars - overlap_chars, 1)
+    passages = []
+    
+    for page_number, text in pages:
+        start = 0
+        while start < len(text):
+            end = min(start + passage_chars, len(text))
+            if end < len(text):
+                space = text.rfind(" ", start + step, end)
+                if space > start:
+                    end = space
+            
+            chunk = text[start:end].strip()
+            if chunk:
+                passages.append(Passage(page_number, start, chunk))
+            
+            if end >= len(text):
+                break
+            start = max(end - overlap_chars, start + 1)
+    
+    return passages
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over the passages of one report.
+    
+    Built once per compliance check and queried once per requirement.
+    """
+    
+    def __init__(self, passages: List[Passage], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        
+        self._term_freqs: List[Counter] = [Counter(tokenize(passage.text)) for passage in passages]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if passages else 0.0
+        
+        doc_freqs: Counter = Counter()
+        for freqs in self._term_freqs:
+            doc_freqs.update(freqs.keys())
+        count = len(passages)
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+    
+    def search(self, query: str, top_k: int) -> List[Passage]:
+        """
+        Return the passages that best match a query.
+        
+        Args:
+            query: The query text
+            top_k: Maximum number of passages to return
+            
+        Returns:
+            The best scoring passages, in page order. Falls back to the first
+            passages of the report when no query term occurs in it.
+        """
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        
+        if not terms:
+            return self.passages[:top_k]
+        
+        scores = []
+        for index, freqs in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / (self._avg_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = freqs.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((score, index))
+        
+        best = sorted(scores, key=lambda item: (-item[0], item[1]))[:top_k]
+        return [self.passages[index] for _, index in sorted(best, key=lambda item: item[1])]
@@ -0,0 +1,228 @@
+
+import re
+import warnings
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from beanie import PydanticObjectId
+from loguru import logger
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from app.models.regulatory_requirement import RegulatoryRequirement, RequirementRules
+
+# Characters of context kept on each side of a match in the evidence
+_SNIPPET_CONTEXT = 80
+
+@dataclass(frozen=True)
+class RuleMatch:
+    """Where a requirement's rules first matched the report text."""
+    page_number: int
+    offset: int
+    snippet: str
+
+def rule_sources(rules: RequirementRules) -> List[str]:
+    """Regular expressions of a requirement's patterns and keywords."""
+    return list(rules.patterns) + [rf"\b{re.escape(keyword)}\b" for keyword in rules.keywords]
+
+def validate_rules(rules: RequirementRules) -> None:
+    """
+    Check that the rules of a requirement can be used in the combined expression.
+    
+    Each pattern is checked in the wrapped form the scan compiles it in, as
+    one alternative among those of the other requirements.
+    
+    Raises:
+        ValueError: If a pattern is not a valid regular expression, uses
+            inline global flags, named groups or backreferences, which do not
+            survive the combination, or can match the empty string
+    """
+    for source in rule_sources(rules):
+        _check_source(source)
+
+@lru_cache(maxsize=1024)
+def _check_source(source: str) -> None:
+    """Raise ValueError if a pattern cannot be an alternative of the combined expression."""
+    alternative = _alternative(source)
+    try:
+        # Global flags past the start only warn before Python 3.11
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            parsed = sre_parse.parse(f"(?P<r0>{alternative})", re.IGNORECASE)
+        compiled = _combined_regex((("r0", alternative),))
+    except (re.error, DeprecationWarning) as e:
+        raise ValueError(f"Invalid pattern {source!r}: {e}")
+    
+    if list(compiled.groupindex) != ["r0"]:
+        raise ValueError(f"Pattern {source!r} must not use named groups")
+    if _uses_backreferences(parsed):
+        raise ValueError(f"Pattern {source!r} must not use backreferences")
+    if parsed.getwidth()[0] == 0:
+        raise ValueError(f"Pattern {source!r} must not match the empty string")
+
+def _uses_backreferences(node: Any) -> bool:
+    """Check whether a parsed expression refers to a group by number or name."""
+    if isinstance(node, sre_parse.SubPattern):
+        return _uses_backreferences(node.data)
+    if isinstance(node, (list, tuple)):
+        return any(_uses_backreferences(item) for item in node)
+    return str(node).startswith("GROUPREF")
+
+def _alternative(source: str) -> str:
+    return f"(?:{source})"
+
+@lru_cache(maxsize=256)
+def _combined_regex(alternatives: Tuple[Tuple[str, str], ...]) -> "re.Pattern[str]":
+    """
+    Compile (group name, source) pairs into one expression.
+    
+    The expression matches, without consuming text, at each position where
+    any of the sources matches, and captures in its group every source that
+    matches there, so sources matching overlapping text are all reported.
+    """
+    return re.compile(
+        "(?=" + "|".join(source for _, source in alternatives) + ")"
+        + "".join(f"(?:(?=(?P<{group}>{source})))?" for group, source in alternatives),
+        re.IGNORECASE
+    )
+
+class RuleMatcher:
+    """
+    Deterministic fast path of the compliance check.
+    
+    The rules of all the checked requirements are combined into a single
+    regular expression, compiled once per catalogue, so the report text is
+    scanned once for the whole catalogue rather than once per requirement.
+    Compiled expressions are cached, so checks against the same catalogue
+    reuse them.
+    
+    Requirements whose rules cannot be used, such as rules stored before
+    validation was tightened, are left to the LLM.
+    """
+    
+    def __init__(self, requirements: Iterable[RegulatoryRequirement]):
+        self._requirements: Dict[str, RegulatoryRequirement] = {}
+        self._sources: Dict[str, str] = {}
+        # Requirements the scan can settle
+        self._usable: Set[PydanticObjectId] = set()
+        
+        for index, requirement in enumerate(requirements):
+            if not requirement.rules:
+                continue
+            try:
+                validate_rules(requirement.rules)
+            except ValueError as e:
+                logger.warning(f"Ignoring the rules of requirement ID {requirement.id}: {e}")
+                continue
+            sources = rule_sources(requirement.rules)
+            group = f"r{index}"
+            self._requirements[group] = requirement
+            self._usable.add(requirement.id)
+            if sources:
+                self._sources[group] = "|".join(_alternative(source) for source in sources)
+        
+        self._regex = self._compile()
+    
+    def __bool__(self) -> bool:
+        return bool(self._requirements)
+    
+    def _drop_unusable(self, groups: List[str]) -> None:
+        """Leave to the LLM the requirements whose expression does not compile in the combination."""
+        unusable = []
+        for group in groups:
+            try:
+                _combined_regex(((group, self._sources[group]),))
+            except re.error:
+                unusable.append(group)
+        
+        # Only the combination fails, none can be trusted
+        for group in unusable or list(groups):
+            logger.warning(f"Ignoring the rules of requirement ID {self._requirements[group].id}: they do not compile")
+            groups.remove(group)
+            del self._sources[group]
+            self._usable.discard(self._requirements.pop(group).id)
+    
+    def _compile(self) -> "re.Pattern[str]":
+        """Compile the rules of the catalogue into one expression."""
+        while True:
+            groups = list(self._sources)
+            try:
+                return _combined_regex(tuple((group, self._sources[group]) for group in groups))
+            except re.error:
+                self._drop_unusable(groups)
+    
+    def scan(self, pages: Iterable[Tuple[int, str]]) -> Dict[PydanticObjectId, RuleMatch]:
+        """
+        Find the first match of each requirement's rules in the report.
+        
+        Each page is searched once with the catalogue's expression, which
+        reports every requirement matching at a position, so requirements
+        whose rules match overlapping text are all found.
+        
+        Args:
+            pages: (page number, text) pairs in page order
+            
+        Returns:
+            The first match of each requirement that matched, by requirement ID
+        """
+        matches: Dict[PydanticObjectId, RuleMatch] = {}
+        remaining = set(self._sources)
+        
+        for page_number, text in pages:
+            for match in self._regex.finditer(text):
+                for group, value in match.groupdict().items():
+                    if value is None or group not in remaining:
+                        continue
+                    start, end = match.span(group)
+                    snippet = text[max(start - _SNIPPET_CONTEXT, 0):end + _SNIPPET_CONTEXT]
+                    matches[self._requirements[group].id] = RuleMatch(page_number, start, " ".join(snippet.split()))
+                    remaining.remove(group)
+                
+                if not remaining:
+                    break
+            
+            if not remaining:
+                break
+        
+        return matches
+    
+    def decide(
+        self,
+        requirement: RegulatoryRequirement,
+        match: Optional[RuleMatch]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Settle a requirement from the scan result, if its rules are conclusive.
+        
+        Requirements whose rules were left out of the scan are never settled.
+        
+        Args:
+            requirement: The checked requirement
+            match: The match of its rules, if any
+            
+        Returns:
+            The verdict, or None when the LLM has to decide
+        """
+        rules = requirement.rules
+        
+        if not rules or requirement.id not in self._usable:
+            return None
+        
+        if match:
+            return {
+                "is_compliant": True,
+                "confidence_score": rules.confidence,
+                "evidence": f"The document matches the rules of the requirement '{requirement.name}' at page {match.page_number}, offset {match.offset}: \"{match.snippet}\""
+            }
+        
+        if rules.non_compliant_if_absent:
+            return {
+                "is_compliant": False,
+                "confidence_score": rules.confidence,
+                "evidence": f"No text in the document matches the rules of the requirement '{requirement.name}'."
+            }
+        
+        return None
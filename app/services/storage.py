@@ -0,0 +1,269 @@
+
+import asyncio
+import mimetypes
+import os
+import posixpath
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from app.core.config import settings
+
+STORAGE_LOCAL = "local"
+STORAGE_S3 = "s3"
+
+class StoredObjectNotFoundError(Exception):
+    """Raised when no object is stored under a key."""
+    
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"No stored object with key {key}")
+
+class StorageBackend(ABC):
+    """
+    Store of uploaded files, addressed by key.
+    
+    Keys are relative, '/'-separated paths. A backend shared by all nodes
+    (S3) lets any API node serve and any worker process any report.
+    """
+    
+    @abstractmethod
+    async def put_file(self, key: str, local_path: str) -> None:
+        """
+        Store a local file under a key.
+        
+        The local file may be moved rather than copied, the caller must not
+        use it afterwards.
+        """
+    
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """Get the size in bytes of a stored object, or None if there is none."""
+    
+    @abstractmethod
+    def read_range(self, key: str, start: int, length: int, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Read a byte range of a stored object in chunks.
+        
+        Raises:
+            StoredObjectNotFoundError: If there is no object under the key
+        """
+    
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a stored object, if it exists."""
+    
+    @abstractmethod
+    def local_copy(self, key: str):
+        """
+        Async context manager giving the path of a local copy of an object.
+        
+        The copy is removed on exit, for the tools that need a file path.
+        
+        Raises:
+            StoredObjectNotFoundError: If there is no object under the key
+        """
+    
+    def local_path(self, key: str) -> Optional[str]:
+        """Get the local path an object is stored at, if the backend stores objects locally."""
+        return None
+
+class LocalStorageBackend(StorageBackend):
+    """Objects stored as files under a local directory."""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def local_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.root, *key.split("/"))
+    
+    async def put_file(self, key: str, local_path: str) -> None:
+        destination = self.local_path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(local_path, destination)
+    
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.local_path(key))
+        except OSError:
+            return None
+    
+    async def read_range(self, key: str, start: int, length: int, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        chunk_size = chunk_size or settings.DOWNLOAD_CHUNK_SIZE
+        
+        try:
+            file = await asyncio.to_thread(open, self.local_path(key), "rb")
+        except FileNotFoundError:
+            raise StoredObjectNotFoundError(key)
+        
+        try:
+            await asyncio.to_thread(file.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            file.close()
+    
+    async def delete(self, key: str) -> None:
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+    
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            raise StoredObjectNotFoundError(key)
+        yield path
+
+class S3StorageBackend(StorageBackend):
+    """
+    Objects stored in an S3-compatible bucket (AWS, MinIO, moto).
+    
+    Files are uploaded and downloaded with boto3's managed transfers,
+    which split them into parts sent in parallel above the part size.
+    Ranged reads stream the object body without buffering it. boto3 is
+    blocking, so every call runs in a worker thread.
+    """
+    
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(max_pool_connections=max(max_concurrency * 2, 10))
+        )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency
+        )
+    
+    def _object_key(self, key: str) -> str:
+        return posixpath.join(self.prefix, key) if self.prefix else key
+    
+    async def put_file(self, key: str, local_path: str) -> None:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        await asyncio.to_thread(
+            self._client.upload_file,
+            local_path,
+            self.bucket,
+            self._object_key(key),
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer_config
+        )
+    
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            response = await asyncio.to_thread(self._client.head_object, Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return response["ContentLength"]
+    
+    async def read_range(self, key: str, start: int, length: int, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        if length <= 0:
+            return
+        
+        chunk_size = chunk_size or settings.DOWNLOAD_CHUNK_SIZE
+        
+        try:
+            response = await asyncio.to_thread(
+                self._client.get_object,
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Range=f"bytes={start}-{start + length - 1}"
+            )
+        except ClientError as e:
+            if _is_not_found(e):
+                raise StoredObjectNotFoundError(key)
+            raise
+        
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+    
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+    
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=settings.TEMP_UPLOAD_DIR, prefix=".download-", suffix=posixpath.splitext(key)[1])
+        os.close(fd)
+        
+        try:
+            try:
+                await asyncio.to_thread(
+                    self._client.download_file,
+                    self.bucket,
+                    self._object_key(key),
+                    path,
+                    Config=self._transfer_config
+                )
+            except ClientError as e:
+                if _is_not_found(e):
+                    raise StoredObjectNotFoundError(key)
+                raise
+            yield path
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _is_not_found(error: ClientError) -> bool:
+    return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+# Shared backend, created on first use
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Get the process-wide storage backend selected by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == STORAGE_S3:
+            _storage = S3StorageBackend(
+                bucket=settings.S3_BUCKET,
+                prefix=settings.S3_PREFIX,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+                access_key_id=settings.S3_ACCESS_KEY_ID,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                part_size=settings.S3_PART_SIZE,
+                max_concurrency=settings.S3_MAX_CONCURRENCY
+            )
+            logger.info(f"Storing uploads in S3 bucket {settings.S3_BUCKET}")
+        else:
+            _storage = LocalStorageBackend(settings.TEMP_UPLOAD_DIR)
+    return _storage
@@ -0,0 +1,256 @@
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterable, Optional, Tuple
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.report import Report
+from app.services.storage import LocalStorageBackend, get_storage
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"Upload exceeds the maximum allowed size of {max_size} bytes")
+
+@dataclass
+class StoredUpload:
+    """An upload that has been fully written to the blob store."""
+    key: str
+    size: int
+    sha256: str
+    deduplicated: bool = False
+
+def blob_key(sha256: str) -> str:
+    """
+    Get the content-addressed storage key of a blob.
+    
+    Blobs are fanned out over two directory levels so that no single
+    directory grows too large.
+    
+    Args:
+        sha256: SHA-256 hex digest of the blob content
+        
+    Returns:
+        Key of the blob in the storage backend
+    """
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+
+def report_blob_key(report: Report) -> Optional[str]:
+    """
+    Get the storage key of a report's file.
+    
+    Reports uploaded before storage keys were recorded are found by their
+    content hash, as the local backend keeps the same blob layout. Reports
+    uploaded before content hashing only have the path of their file in
+    the upload directory. Both only resolve with the local backend until
+    migrate_local_uploads has moved them to the configured backend.
+    
+    Args:
+        report: The report
+        
+    Returns:
+        The storage key, or None for a report without a stored file
+    """
+    if report.storage_key:
+        return report.storage_key
+    if report.content_hash:
+        return blob_key(report.content_hash)
+    if report.file_path:
+        return _upload_dir_key(report.file_path)
+    return None
+
+def _upload_dir_key(path: str) -> Optional[str]:
+    """Get the key of a file under the upload directory, or None if it lies outside it."""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.TEMP_UPLOAD_DIR))
+    if relative == os.curdir or relative.startswith(os.pardir):
+        return None
+    return relative.replace(os.sep, "/")
+
+async def delete_unreferenced_blob(key: str, content_hash: Optional[str] = None) -> bool:
+    """
+    Delete the stored file of a deleted report, unless a report refers to it again.
+    
+    This is run as a background job, queued BLOB_DELETE_DELAY_SECONDS after
+    the report was deleted, so an upload of the same content that found
+    the blob in the meantime has recorded its report by then and keeps it.
+    
+    Args:
+        key: Storage key of the file
+        content_hash: SHA-256 of the file content, shared by its duplicates
+        
+    Returns:
+        True if the file was deleted
+    """
+    if content_hash and await Report.find_one({"content_hash": content_hash}) is not None:
+        logger.info(f"Keeping stored file {key}, another report refers to it")
+        return False
+    
+    await get_storage().delete(key)
+    logger.info(f"Deleted stored file {key}")
+    return True
+
+async def migrate_local_uploads() -> int:
+    """
+    Move the files of reports stored before storage keys to the storage backend.
+    
+    Each file found in the upload directory is stored under its blob key,
+    hashed first if the report has no content hash, and the key is
+    recorded on the report. The local files are left in place, to be
+    removed once the migration has been checked. Running it again only
+    handles the reports it could not migrate.
+    
+    Returns:
+        Number of migrated reports
+    """
+    local = LocalStorageBackend(settings.TEMP_UPLOAD_DIR)
+    storage = get_storage()
+    migrated = 0
+    os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)
+    
+    async for report in Report.find({"storage_key": None}):
+        key = report_blob_key(report)
+        path = local.local_path(key) if key else report.file_path
+        if not path or not os.path.isfile(path):
+            logger.warning(f"No local file for report ID {report.id}, not migrated")
+            continue
+        
+        sha256 = report.content_hash or await asyncio.to_thread(_hash_file, path)
+        key = blob_key(sha256)
+        
+        if await storage.size(key) is None:
+            # The backend may move the file it stores, so it gets a copy
+            fd, tmp_path = tempfile.mkstemp(dir=settings.TEMP_UPLOAD_DIR, prefix=".migrate-", suffix=".part")
+            os.close(fd)
+            try:
+                await asyncio.to_thread(shutil.copyfile, path, tmp_path)
+                await storage.put_file(key, tmp_path)
+            finally:
+                _discard(tmp_path)
+        
+        await Report.get_motor_collection().update_one(
+            {"_id": report.id},
+            {"$set": {"storage_key": key, "content_hash": sha256}}
+        )
+        migrated += 1
+    
+    logger.info(f"Migrated the files of {migrated} reports to the storage backend")
+    return migrated
+
+def _hash_file(path: str) -> str:
+    """Get the SHA-256 hex digest of a file's content (runs in a worker thread)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(settings.UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def store_upload_blob(
+    chunks: AsyncIterable[bytes],
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> StoredUpload:
+    """
+    Stream an uploaded file into the content-addressed blob store.
+    
+    The content is written to a temporary file in the upload directory and
+    hashed while it streams, so at most one chunk is held in memory. Once
+    complete, the temporary file is handed to the storage backend under
+    its blob key, or discarded if a blob with the same content is already
+    stored.
+    
+    Args:
+        chunks: The content of the file, as it is received
+        max_size: Maximum number of bytes accepted (defaults to MAX_UPLOAD_SIZE)
+        chunk_size: Number of bytes written per chunk (defaults to UPLOAD_CHUNK_SIZE)
+        
+    Returns:
+        The stored blob with its size and SHA-256 hex digest
+        
+    Raises:
+        UploadTooLargeError: If the upload exceeds ``max_size``, raised as soon as it does
+    """
+    tmp_path, size, sha256 = await _stream_to_tempfile(chunks, max_size, chunk_size)
+    key = blob_key(sha256)
+    storage = get_storage()
+    
+    try:
+        if await storage.size(key) is not None:
+            return StoredUpload(key=key, size=size, sha256=sha256, deduplicated=True)
+        
+        await storage.put_file(key, tmp_path)
+    finally:
+        # Already gone if the backend moved the file into place
+        _discard(tmp_path)
+    
+    return StoredUpload(key=key, size=size, sha256=sha256)
+
+async def _stream_to_tempfile(
+    chunks: AsyncIterable[bytes],
+    max_size: Optional[int],
+    chunk_size: Optional[int]
+) -> Tuple[str, int, str]:
+    """
+    Stream an upload into a temporary file, hashing it along the way.
+    
+    The received pieces are gathered into chunks of ``chunk_size`` bytes,
+    so the file is written in a few large writes.
+    
+    Returns:
+        Tuple of the temporary file path, the size in bytes and the SHA-256 hex digest
+    """
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    
+    os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.TEMP_UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    
+    digest = hashlib.sha256()
+    size = 0
+    pending = bytearray()
+    
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for piece in chunks:
+                size += len(piece)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                
+                pending += piece
+                if len(pending) >= chunk_size:
+                    await run_in_threadpool(_write_chunk, out, digest, bytes(pending))
+                    pending.clear()
+            
+            if pending:
+                await run_in_threadpool(_write_chunk, out, digest, bytes(pending))
+            await run_in_threadpool(_sync, out)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    
+    return tmp_path, size, digest.hexdigest()
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    """Hash and write a chunk (runs in a worker thread)."""
+    digest.update(chunk)
+    out.write(chunk)
+
+def _sync(out) -> None:
+    """Flush a file to stable storage before it is renamed into place."""
+    out.flush()
+    os.fsync(out.fileno())
+
+def _discard(path: str) -> None:
+    """Remove a partially written file, ignoring errors."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
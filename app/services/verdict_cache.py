@@ -0,0 +1,202 @@
+
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.models.verdict_cache_entry import VerdictCacheEntry, VerdictCacheInvalidation
+
+# Invalidations are read back this far, as other processes may record them out of order
+_SYNC_OVERLAP = timedelta(seconds=5)
+
+def hash_text(text: str) -> str:
+    """Hash the text sent to the LLM for a compliance check."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_requirement(name: str, description: str) -> str:
+    """Hash the parts of a requirement that are sent to the LLM."""
+    return hashlib.sha256(f"{name}\n{description}".encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """
+    Two-level cache of LLM compliance verdicts.
+    
+    Verdicts are keyed by the hashes of the checked text and requirement and
+    by the model/prompt version. They are persisted in Mongo, where a TTL
+    index expires them, with a bounded in-process LRU in front so repeated
+    lookups do not hit the database.
+    
+    Invalidations are recorded in Mongo too. Each process applies those
+    recorded since its last look to its LRU, at most every ``sync_seconds``,
+    so an invalidation reaches every process within that delay.
+    """
+    
+    def __init__(self, lru_size: int, ttl_seconds: int, sync_seconds: float = 5):
+        self.lru_size = lru_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.sync_seconds = sync_seconds
+        # key -> (created_at, text_hash, requirement_hash, model_version, verdict)
+        self._lru: "OrderedDict[str, Tuple[datetime, str, str, str, Dict[str, Any]]]" = OrderedDict()
+        # When invalidations were last read, by the database and the monotonic clock
+        self._synced_at = datetime.utcnow()
+        self._synced_monotonic = time.monotonic()
+    
+    @staticmethod
+    def make_key(text_hash: str, requirement_hash: str, model_version: str) -> str:
+        """Build the cache key of a verdict."""
+        return hashlib.sha256(f"{text_hash}|{requirement_hash}|{model_version}".encode()).hexdigest()
+    
+    async def get(self, text_hash: str, requirement_hash: str, model_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached verdict.
+        
+        Args:
+            text_hash: Hash of the checked text
+            requirement_hash: Hash of the requirement
+            model_version: Model and prompt version
+            
+        Returns:
+            The cached verdict, or None on a miss
+        """
+        key = self.make_key(text_hash, requirement_hash, model_version)
+        now = datetime.utcnow()
+        
+        await self._sync_invalidations()
+        
+        entry = self._lru.get(key)
+        if entry is not None:
+            if now - entry[0] < self.ttl:
+                self._lru.move_to_end(key)
+                return entry[4]
+            del self._lru[key]
+        
+        # TTL deletion runs periodically, so expired entries may still be present
+        document = await VerdictCacheEntry.find_one(
+            VerdictCacheEntry.key == key,
+            VerdictCacheEntry.created_at > now - self.ttl
+        )
+        if document is None:
+            return None
+        
+        self._remember(key, document.created_at, text_hash, requirement_hash, model_version, document.verdict)
+        return document.verdict
+    
+    async def set(
+        self,
+        text_hash: str,
+        requirement_hash: str,
+        model_version: str,
+        verdict: Dict[str, Any]
+    ) -> None:
+        """
+        Store a verdict in the cache.
+        
+        Args:
+            text_hash: Hash of the checked text
+            requirement_hash: Hash of the requirement
+            model_version: Model and prompt version
+            verdict: The verdict returned by the LLM
+        """
+        key = self.make_key(text_hash, requirement_hash, model_version)
+        now = datetime.utcnow()
+        
+        await VerdictCacheEntry.get_motor_collection().replace_one(
+            {"key": key},
+            {
+                "key": key,
+                "text_hash": text_hash,
+                "requirement_hash": requirement_hash,
+                "model_version": model_version,
+                "verdict": verdict,
+                "created_at": now,
+            },
+            upsert=True
+        )
+        self._remember(key, now, text_hash, requirement_hash, model_version, verdict)
+    
+    async def invalidate(
+        self,
+        requirement_hash: Optional[str] = None,
+        model_version: Optional[str] = None
+    ) -> int:
+        """
+        Remove cached verdicts.
+        
+        Without arguments the whole cache is cleared. The invalidation is
+        recorded for the other processes to apply to their LRU.
+        
+        Args:
+            requirement_hash: Only remove verdicts for this requirement
+            model_version: Only remove verdicts of this model version
+            
+        Returns:
+            Number of removed entries
+        """
+        query = {}
+        if requirement_hash:
+            query["requirement_hash"] = requirement_hash
+        if model_version:
+            query["model_version"] = model_version
+        
+        result = await VerdictCacheEntry.get_motor_collection().delete_many(query)
+        await VerdictCacheInvalidation(requirement_hash=requirement_hash or None, model_version=model_version or None).insert()
+        self._forget(requirement_hash, model_version)
+        
+        logger.info(f"Invalidated {result.deleted_count} cached LLM verdicts")
+        return result.deleted_count
+    
+    async def _sync_invalidations(self) -> None:
+        """Apply the invalidations recorded since the last look, if it is due."""
+        if time.monotonic() - self._synced_monotonic < self.sync_seconds:
+            return
+        
+        synced_at = datetime.utcnow()
+        self._synced_monotonic = time.monotonic()
+        
+        try:
+            invalidations = await VerdictCacheInvalidation.get_motor_collection().find(
+                {"created_at": {"$gte": self._synced_at - _SYNC_OVERLAP}},
+                projection={"requirement_hash": 1, "model_version": 1}
+            ).to_list(length=None)
+        except Exception as e:
+            # Tried again at the next sync, the LRU is kept meanwhile
+            logger.warning(f"Could not read verdict cache invalidations: {e}")
+            return
+        
+        # Invalidations within the overlap are applied again, which only
+        # drops entries that are read back from Mongo
+        for invalidation in invalidations:
+            self._forget(invalidation.get("requirement_hash"), invalidation.get("model_version"))
+        self._synced_at = synced_at
+    
+    def _forget(self, requirement_hash: Optional[str], model_version: Optional[str]) -> None:
+        """Drop the LRU entries of an invalidation."""
+        for key, entry in list(self._lru.items()):
+            if (not requirement_hash or entry[2] == requirement_hash) and \
+                    (not model_version or entry[3] == model_version):
+                del self._lru[key]
+    
+    def _remember(self, key: str, created_at: datetime, text_hash: str, requirement_hash: str, model_version: str, verdict: Dict[str, Any]) -> None:
+        self._lru[key] = (created_at, text_hash, requirement_hash, model_version, verdict)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+# Shared cache instance, created on first use
+_verdict_cache: Optional[VerdictCache] = None
+
+def get_verdict_cache() -> Optional[VerdictCache]:
+    """Get the shared verdict cache, or None if caching is disabled."""
+    global _verdict_cache
+    if not settings.VERDICT_CACHE_ENABLED:
+        return None
+    if _verdict_cache is None:
+        _verdict_cache = VerdictCache(
+            settings.VERDICT_CACHE_LRU_SIZE,
+            settings.VERDICT_CACHE_TTL_SECONDS,
+            settings.VERDICT_CACHE_SYNC_SECONDS
+        )
+    return _verdict_cache
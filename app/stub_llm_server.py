@@ -0,0 +1,105 @@
+
+import argparse
+import asyncio
+import random
+import uvicorn
+from typing import List
+from fastapi import FastAPI, HTTPException, status
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.logging import configure_logging
+from app.services.llm_backend import CHECK_BATCH_PATH, CHECK_PATH, stub_verdict
+
+class StubRequirement(BaseModel):
+    name: str
+    description: str
+
+class StubBatchRequirement(StubRequirement):
+    id: str
+
+class StubCheckRequest(BaseModel):
+    model: str
+    requirement: StubRequirement
+    document: str
+
+class StubCheckBatchRequest(BaseModel):
+    model: str
+    requirements: List[StubBatchRequirement]
+    document: str
+
+app = FastAPI(title="Stub LLM compliance backend")
+
+# Set from the command line
+app.state.latency_seconds = settings.LLM_STUB_LATENCY_SECONDS
+app.state.error_rate = 0.0
+app.state.malformed_rate = 0.0
+
+async def _simulate_call() -> None:
+    """Wait for the configured latency and fail some of the calls."""
+    await asyncio.sleep(app.state.latency_seconds)
+    
+    if app.state.error_rate and random.random() < app.state.error_rate:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Simulated backend failure")
+
+@app.post(CHECK_PATH)
+async def check(request: StubCheckRequest):
+    """
+    Return a deterministic verdict after the configured latency.
+    
+    A share of the requests fail with 503, as set by --error-rate, to
+    exercise the client's retries and circuit breaker.
+    """
+    await _simulate_call()
+    return stub_verdict(request.document, request.requirement.name, request.requirement.description)
+
+@app.post(CHECK_BATCH_PATH)
+async def check_batch(request: StubCheckBatchRequest):
+    """
+    Return deterministic verdicts for several requirements at once.
+    
+    A share of the responses is malformed, as set by --malformed-rate, to
+    exercise the client's fallback to one call per requirement.
+    """
+    await _simulate_call()
+    
+    if app.state.malformed_rate and random.random() < app.state.malformed_rate:
+        return {"text": "Sorry, I could not produce structured verdicts."}
+    
+    return {"verdicts": [
+        {"id": requirement.id, **stub_verdict(request.document, requirement.name, requirement.description)}
+        for requirement in request.requirements
+    ]}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stub LLM compliance backend for offline load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=settings.LLM_STUB_LATENCY_SECONDS,
+        help="Seconds taken by each check"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of checks failing with 503"
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="Share of batched checks returning an unparseable response"
+    )
+    args = parser.parse_args()
+    
+    configure_logging()
+    app.state.latency_seconds = args.latency
+    app.state.error_rate = args.error_rate
+    app.state.malformed_rate = args.malformed_rate
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+from loguru import logger
+
+from app.core.config import settings
+from app.core.logging import configure_logging
+from app.db.session import connect_to_mongo, close_mongo_connection
+from app.models.job import Job
+from app.services.compliance_checker import check_compliance_for_report, enqueue_requirement_rechecks
+from app.services.compliance_summary import reconcile_compliance_summaries
+from app.services.job_queue import (
+    JOB_CHECK_COMPLIANCE,
+    JOB_DELETE_BLOB,
+    JOB_PROCESS_PDF,
+    JOB_RECHECK_REQUIREMENTS,
+    claim_job,
+    complete_job,
+    fail_job,
+    renew_lease
+)
+from app.services.llm_backend import close_compliance_backend
+from app.services.pdf_processor import process_pdf_report, shutdown_extraction_executor
+from app.services.report_text import backfill_report_page_metadata
+from app.services.upload_store import delete_unreferenced_blob, migrate_local_uploads
+
+# Handler for each job kind, called with the job payload as keyword arguments
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    JOB_PROCESS_PDF: process_pdf_report,
+    JOB_CHECK_COMPLIANCE: check_compliance_for_report,
+    JOB_RECHECK_REQUIREMENTS: enqueue_requirement_rechecks,
+    JOB_DELETE_BLOB: delete_unreferenced_blob,
+}
+
+async def run_job(job: Job) -> None:
+    """
+    Run a claimed job and record its outcome.
+    
+    The job's lease is renewed in the background for as long as the
+    handler runs.
+    
+    Args:
+        job: The claimed job
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    
+    if handler is None:
+        await fail_job(job, f"No handler for job kind '{job.kind}'")
+        return
+    
+    async def keep_lease() -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            if not await renew_lease(job):
+                logger.warning(f"Lost the lease on job ID {job.id}")
+                return
+    
+    heartbeat = asyncio.create_task(keep_lease())
+    try:
+        await handler(**job.payload)
+    except Exception as e:
+        await fail_job(job, f"{type(e).__name__}: {e}")
+    else:
+        await complete_job(job)
+    finally:
+        heartbeat.cancel()
+
+async def _worker_loop(worker_id: str, stop: asyncio.Event) -> None:
+    """Claim and run jobs one at a time until asked to stop."""
+    while not stop.is_set():
+        try:
+            job = await claim_job(worker_id)
+        except Exception as e:
+            logger.error(f"Error claiming job: {e}")
+            job = None
+        
+        if job is None:
+            # Nothing due, wait for the next poll or for shutdown
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        logger.info(f"Running {job.kind} job ID {job.id} (attempt {job.attempts})")
+        await run_job(job)
+
+async def _maintenance_loop(
+    name: str,
+    interval: float,
+    task: Callable[[], Awaitable[Any]],
+    stop: asyncio.Event
+) -> None:
+    """Run a maintenance task about every interval seconds until asked to stop."""
+    while not stop.is_set():
+        # Jittered, so the workers do not all run the task at once
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval * random.uniform(0.5, 1.5))
+        except asyncio.TimeoutError:
+            pass
+        else:
+            return
+        
+        try:
+            await task()
+        except Exception as e:
+            logger.error(f"Error running {name}: {e}")
+
+async def _reconcile_recent_summaries() -> None:
+    """Correct the compliance summaries with results written since about the previous run."""
+    since = datetime.utcnow() - timedelta(seconds=2 * settings.SUMMARY_RECONCILE_INTERVAL_SECONDS)
+    corrected = await reconcile_compliance_summaries(since)
+    if corrected:
+        logger.info(f"Corrected {corrected} compliance summaries")
+
+def _maintenance_tasks(stop: asyncio.Event) -> List[Awaitable[None]]:
+    """Periodic maintenance run by every worker, as enabled in the settings."""
+    tasks = []
+    if settings.SUMMARY_RECONCILE_INTERVAL_SECONDS > 0:
+        tasks.append(_maintenance_loop(
+            "compliance summary reconciliation",
+            settings.SUMMARY_RECONCILE_INTERVAL_SECONDS,
+            _reconcile_recent_summaries,
+            stop
+        ))
+    return tasks
+
+async def run_worker(concurrency: int) -> None:
+    """
+    Run the job worker until SIGINT or SIGTERM is received.
+    
+    Running jobs are allowed to finish before the worker exits. The
+    worker also runs the periodic maintenance tasks.
+    
+    Args:
+        concurrency: Number of jobs run at once
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    await connect_to_mongo()
+    logger.info(f"Worker {worker_id} started with concurrency {concurrency}")
+    
+    try:
+        await asyncio.gather(
+            *(_worker_loop(worker_id, stop) for _ in range(concurrency)),
+            *_maintenance_tasks(stop)
+        )
+    finally:
+        shutdown_extraction_executor()
+        await close_compliance_backend()
+        await close_mongo_connection()
+        logger.info(f"Worker {worker_id} stopped")
+
+async def run_maintenance(task: Callable[[], Awaitable[Any]]) -> None:
+    """Run a one-off maintenance task against the database, then exit."""
+    await connect_to_mongo()
+    try:
+        await task()
+    finally:
+        await close_mongo_connection()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the background job worker.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.JOB_WORKER_CONCURRENCY,
+        help="Number of jobs run at once"
+    )
+    parser.add_argument(
+        "--backfill-page-metadata",
+        action="store_true",
+        help="Copy company names and fiscal years onto pages extracted before search existed, then exit"
+    )
+    parser.add_argument(
+        "--migrate-local-uploads",
+        action="store_true",
+        help="Move the files of reports uploaded before storage keys to the storage backend, then exit"
+    )
+    args = parser.parse_args()
+    
+    configure_logging()
+    if args.backfill_page_metadata:
+        asyncio.run(run_maintenance(backfill_report_page_metadata))
+    elif args.migrate_local_uploads:
+        asyncio.run(run_maintenance(migrate_local_uploads))
+    else:
+        asyncio.run(run_worker(args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+
+from types import SimpleNamespace
+
+from app.services.compliance_checker import _batch_requirements
+
+def make_requirements(*categories):
+    return [SimpleNamespace(name=f"Requirement {index}", category=category) for index, category in enumerate(categories)]
+
+def test_batch_requirements_groups_by_category():
+    """Test that batches hold requirements of one category, in order, up to the batch size."""
+    requirements = make_requirements("Governance", "Risk", "Governance", None, "Governance", "Risk", None)
+    
+    batches = _batch_requirements(requirements, 2)
+    
+    assert [[req.name for req in batch] for batch in batches] == [
+        ["Requirement 0", "Requirement 2"],
+        ["Requirement 4"],
+        ["Requirement 1", "Requirement 5"],
+        ["Requirement 3", "Requirement 6"],
+    ]
+
+def test_batch_size_one_disables_batching():
+    """Test that a batch size of one, or less, checks each requirement on its own."""
+    requirements = make_requirements("Governance", "Governance", "Risk")
+    
+    assert _batch_requirements(requirements, 1) == [[req] for req in requirements]
+    assert _batch_requirements(requirements, 0) == [[req] for req in requirements]
+
+def test_batch_requirements_empty():
+    """Test that no requirements give no batches."""
+    assert _batch_requirements([], 5) == []
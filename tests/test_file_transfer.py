@@ -0,0 +1,38 @@
+
+import pytest
+
+from app.api.file_transfer import RangeNotSatisfiableError, parse_range
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-2000", (900, 999)),  # End past the file is clamped
+    ("bytes=-100", (900, 999)),  # Last 100 bytes
+    ("bytes=-5000", (0, 999)),  # Suffix longer than the file
+    ("BYTES = 5-5", (5, 5)),
+])
+def test_parse_range(header, expected):
+    """Test the byte ranges of valid single-range headers."""
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", [
+    "items=0-99",  # Unknown unit
+    "bytes=0-99,200-299",  # Several ranges
+    "bytes=abc-",
+    "bytes=5",
+    "bytes=50-10",  # Last before first
+])
+def test_parse_range_ignores_malformed_headers(header):
+    """Test that malformed and multi-range headers are answered with the whole file."""
+    assert parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-1200", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    """Test that ranges which do not overlap the file are rejected."""
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range(header, size)
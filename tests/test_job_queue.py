@@ -0,0 +1,161 @@
+
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.models.compliance_batch import ComplianceBatch
+from app.models.job import Job, JobStatus
+from app.services.job_queue import (
+    JOB_CHECK_COMPLIANCE,
+    claim_job,
+    complete_job,
+    enqueue_job,
+    enqueue_jobs,
+    fail_job,
+    retry_delay,
+)
+
+@pytest.fixture
+def backoff(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 10)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_MAX_SECONDS", 600)
+
+@pytest_asyncio.fixture
+async def queue(backoff):
+    """Initialise the job models on an in-memory Mongo stand-in."""
+    await init_beanie(database=AsyncMongoMockClient()["test"], document_models=[Job, ComplianceBatch])
+
+async def expire_lease(job):
+    """Let the lease of a claimed job run out, as when its worker dies."""
+    await Job.get_motor_collection().update_one(
+        {"_id": job.id},
+        {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+@pytest.mark.parametrize("attempts", [1, 2, 3, 5, 10, 1000])
+def test_retry_delay_bounds(backoff, attempts):
+    """Test that the delay doubles per attempt, with at most one initial delay of jitter, up to the maximum."""
+    base = 10 * 2 ** (attempts - 1) if attempts < 64 else float("inf")
+    
+    for _ in range(20):
+        delay = retry_delay(attempts)
+        assert min(base, 600) <= delay <= min(base + 10, 600)
+
+@pytest.mark.asyncio
+async def test_claim_leases_due_jobs_in_order(queue):
+    """Test that due jobs are claimed oldest first, once, and delayed jobs are not claimed early."""
+    first = await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "2"}, delay_seconds=3600)
+    
+    claimed = await claim_job("worker-1")
+    
+    assert claimed.id == first.id
+    assert claimed.status == JobStatus.RUNNING
+    assert claimed.worker_id == "worker-1"
+    assert claimed.attempts == 1
+    assert claimed.lease_expires_at > datetime.utcnow()
+    assert await claim_job("worker-2") is None
+
+@pytest.mark.asyncio
+async def test_complete_job(queue):
+    """Test that a completed job is never claimed again."""
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    job = await claim_job("worker-1")
+    
+    await complete_job(job)
+    
+    stored = await Job.get(job.id)
+    assert stored.status == JobStatus.SUCCEEDED
+    assert stored.finished_at is not None
+    assert await claim_job("worker-1") is None
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_after_backoff(queue):
+    """Test that a failed attempt queues the job again after the retry delay."""
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    job = await claim_job("worker-1")
+    
+    await fail_job(job, "boom")
+    
+    stored = await Job.get(job.id)
+    assert stored.status == JobStatus.QUEUED
+    assert stored.last_error == "boom"
+    assert stored.run_after >= datetime.utcnow() + timedelta(seconds=9)
+    assert await claim_job("worker-1") is None
+
+@pytest.mark.asyncio
+async def test_job_fails_after_last_attempt(queue, monkeypatch):
+    """Test that a job that used up its attempts is marked as failed."""
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    job = await claim_job("worker-1")
+    
+    await fail_job(job, "boom")
+    
+    stored = await Job.get(job.id)
+    assert stored.status == JobStatus.FAILED
+    assert stored.finished_at is not None
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_again(queue):
+    """Test that a job whose worker died is claimed by another worker, and the old worker can no longer finish it."""
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    lost = await claim_job("worker-1")
+    await expire_lease(lost)
+    
+    reclaimed = await claim_job("worker-2")
+    
+    assert reclaimed.id == lost.id
+    assert reclaimed.worker_id == "worker-2"
+    assert reclaimed.attempts == 2
+    
+    # The first worker's lease is gone, its outcome is ignored
+    await complete_job(lost)
+    assert (await Job.get(lost.id)).status == JobStatus.RUNNING
+
+@pytest.mark.asyncio
+async def test_expired_last_attempt_fails_job(queue, monkeypatch):
+    """Test that a job whose lease expired during its last attempt is failed instead of claimed."""
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    await enqueue_job(JOB_CHECK_COMPLIANCE, {"report_id": "1"})
+    job = await claim_job("worker-1")
+    await expire_lease(job)
+    
+    assert await claim_job("worker-2") is None
+    
+    stored = await Job.get(job.id)
+    assert stored.status == JobStatus.FAILED
+    assert stored.last_error == "Lease expired during the last attempt"
+
+@pytest.mark.asyncio
+async def test_batch_counts_expired_last_attempt(queue, monkeypatch):
+    """Test that a batch job failed after its lease expired is counted on the batch."""
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    batch = ComplianceBatch(report_count=1)
+    await batch.insert()
+    await enqueue_jobs(JOB_CHECK_COMPLIANCE, [{"report_id": "1"}], batch_id=batch.id)
+    await expire_lease(await claim_job("worker-1"))
+    
+    assert await claim_job("worker-2") is None
+    
+    assert (await ComplianceBatch.get(batch.id)).failed_count == 1
+
+@pytest.mark.asyncio
+async def test_batch_counts_finished_jobs(queue, monkeypatch):
+    """Test that the jobs of a batch are counted on it once, when they finish."""
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    batch = ComplianceBatch(report_count=2)
+    await batch.insert()
+    await enqueue_jobs(JOB_CHECK_COMPLIANCE, [{"report_id": "1"}, {"report_id": "2"}], batch_id=batch.id)
+    succeeded = await claim_job("worker-1")
+    failed = await claim_job("worker-1")
+    
+    await complete_job(succeeded)
+    await complete_job(succeeded)
+    await fail_job(failed, "boom")
+    
+    stored = await ComplianceBatch.get(batch.id)
+    assert (stored.succeeded_count, stored.failed_count) == (1, 1)
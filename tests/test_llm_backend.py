@@ -0,0 +1,74 @@
+
+import pytest
+
+from app.services import llm_backend
+from app.services.llm_backend import CircuitBreaker, CircuitOpenError
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the monotonic clock seen by the circuit breaker with one the test moves."""
+    now = [1000.0]
+    monkeypatch.setattr(llm_backend.time, "monotonic", lambda: now[0])
+    return now
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    """Test that the circuit opens after the threshold of failures in a row, and a success resets the count."""
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_circuit_lets_one_trial_call_through(clock):
+    """Test that after the reset time a single trial call goes through and its success closes the circuit."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    open_breaker(breaker)
+    
+    clock[0] += 30
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.before_call()
+
+def test_failed_trial_reopens_circuit(clock):
+    """Test that a failed trial call opens the circuit for another reset period."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    open_breaker(breaker)
+    
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock[0] += 1
+    breaker.before_call()
+
+def test_abandoned_trial_frees_trial_slot(clock):
+    """Test that a cancelled trial call lets the next call try again without reopening the circuit."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    open_breaker(breaker)
+    
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_abandoned()
+    
+    assert breaker.is_open
+    breaker.before_call()
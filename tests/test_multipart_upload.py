@@ -0,0 +1,118 @@
+
+import hashlib
+import os
+import pytest
+from starlette.requests import Request
+
+from app.api.multipart_upload import InvalidUploadError, StreamingUpload
+from app.core.config import settings
+from app.services import upload_store
+from app.services.storage import LocalStorageBackend
+from app.services.upload_store import UploadTooLargeError, blob_key, store_upload_blob
+
+BOUNDARY = "test-boundary"
+
+def make_form(*parts):
+    """Build a multipart body from (name, value) fields and (name, filename, content) files."""
+    body = b""
+    for part in parts:
+        if len(part) == 2:
+            body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{part[0]}"\r\n\r\n{part[1]}\r\n'.encode()
+        else:
+            name, filename, content = part
+            body += (
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: application/pdf\r\n\r\n"
+            ).encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+def make_request(body, piece_size=1000, content_length=True):
+    """Build a request whose body arrives in pieces, recording how many were received."""
+    received = []
+    pieces = [body[start:start + piece_size] for start in range(0, len(body), piece_size)]
+    
+    async def receive():
+        index = len(received)
+        received.append(index)
+        if index < len(pieces):
+            return {"type": "http.request", "body": pieces[index], "more_body": index < len(pieces) - 1}
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    return request, received, len(pieces)
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEMP_UPLOAD_DIR", str(tmp_path))
+    storage = LocalStorageBackend(str(tmp_path))
+    monkeypatch.setattr(upload_store, "get_storage", lambda: storage)
+    return storage
+
+@pytest.mark.asyncio
+async def test_streams_file_and_reads_fields_around_it(local_storage):
+    """Test that the file is stored by content and fields before and after it are read."""
+    content = os.urandom(10_000)
+    body = make_form(("company_name", "Acme"), ("file", "report.pdf", content), ("fiscal_year", "2023"))
+    request, _, _ = make_request(body)
+    
+    upload = StreamingUpload(request, "file", max_size=len(content))
+    assert await upload.read_filename() == "report.pdf"
+    stored = await store_upload_blob(upload.file_chunks(), chunk_size=4096)
+    fields = await upload.read_fields()
+    
+    assert fields == {"company_name": "Acme", "fiscal_year": "2023"}
+    assert stored.size == len(content)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    assert stored.key == blob_key(stored.sha256)
+    assert await local_storage.size(stored.key) == len(content)
+
+@pytest.mark.asyncio
+async def test_oversized_file_stops_reading_early(local_storage, tmp_path):
+    """Test that an oversized file without Content-Length is rejected before the body is read in full."""
+    body = make_form(("file", "report.pdf", b"x" * 50_000))
+    request, received, pieces = make_request(body, content_length=False)
+    
+    upload = StreamingUpload(request, "file", max_size=10_000)
+    with pytest.raises(UploadTooLargeError):
+        await store_upload_blob(upload.file_chunks(), max_size=10_000)
+    
+    assert len(received) < pieces // 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+def test_announced_oversized_body_is_rejected_before_reading(local_storage):
+    """Test that a body announced larger than the limit is rejected without reading it."""
+    request, received, _ = make_request(make_form(("file", "report.pdf", b"x" * 200_000)))
+    
+    with pytest.raises(UploadTooLargeError):
+        StreamingUpload(request, "file", max_size=10_000)
+    
+    assert received == []
+
+@pytest.mark.asyncio
+async def test_missing_file_field():
+    """Test that a form without the file is rejected."""
+    request, _, _ = make_request(make_form(("company_name", "Acme"), ("other", "report.pdf", b"%PDF")))
+    upload = StreamingUpload(request, "file", max_size=1000)
+    
+    with pytest.raises(InvalidUploadError):
+        await upload.read_filename()
+
+@pytest.mark.asyncio
+async def test_truncated_body(local_storage):
+    """Test that a body ending within the file is rejected."""
+    body = make_form(("file", "report.pdf", b"x" * 5000))
+    request, _, _ = make_request(body[:3000], content_length=False)
+    upload = StreamingUpload(request, "file", max_size=10_000)
+    
+    with pytest.raises(InvalidUploadError):
+        await store_upload_blob(upload.file_chunks(), max_size=10_000)
+
+def test_rejects_other_content_types():
+    """Test that only multipart form bodies are accepted."""
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]})
+    
+    with pytest.raises(InvalidUploadError):
+        StreamingUpload(request, "file", max_size=1000)
@@ -0,0 +1,48 @@
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.endpoints.system import get_page_cache_stats
+from app.core.config import settings
+from app.services import page_cache
+from app.services.page_cache import PageTextCache
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "cache" / "pages.sqlite"
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "PAGE_CACHE_PATH", str(path))
+    monkeypatch.setattr(page_cache, "_page_cache", None)
+    return path
+
+def test_hits_misses_and_eviction(cache_path):
+    """Test that lookups are counted and the least recently used entries are evicted."""
+    cache = PageTextCache(str(cache_path), max_bytes=10)
+    cache.put_many({"a": "12345", "b": "12345"})
+    
+    assert cache.get_many(["a", "c"]) == {"a": "12345"}
+    cache.put_many({"d": "12345"})
+    
+    assert cache.get_many(["a", "b", "d"]) == {"a": "12345", "d": "12345"}
+    assert cache.stats() == {"hits": 3, "misses": 2, "entries": 2, "bytes": 10, "max_bytes": 10}
+
+@pytest.mark.asyncio
+async def test_system_page_cache_stats(cache_path):
+    """Test that the page cache statistics are reported with the hit rate."""
+    page_cache.get_page_cache().get_many(["missing"])
+    
+    stats = await get_page_cache_stats()
+    
+    assert stats["enabled"] is True
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (0, 1, 0.0)
+
+@pytest.mark.asyncio
+async def test_system_page_cache_stats_of_corrupt_cache(cache_path):
+    """Test that a corrupt cache file is reported as unavailable."""
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_bytes(b"not a database" * 100)
+    
+    with pytest.raises(HTTPException) as error:
+        await get_page_cache_stats()
+    
+    assert error.value.status_code == 503
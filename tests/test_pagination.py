@@ -0,0 +1,47 @@
+
+import base64
+import pytest
+import string
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.pagination import decode_cursor, encode_cursor, keyset_filter
+
+def test_cursor_round_trip():
+    """Test that cursor values, dates and ObjectIds included, decode to what was encoded."""
+    values = [datetime(2024, 3, 1, 12, 30, 15, 123000), ObjectId(), "Acme", 2023]
+    
+    cursor = encode_cursor(values)
+    
+    assert set(cursor) <= set(string.ascii_letters + string.digits + "-_=")
+    assert decode_cursor(cursor, len(values)) == values
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"{not json").decode("ascii"),
+    base64.urlsafe_b64encode(b'{"a": 1}').decode("ascii"),  # Not a list
+    encode_cursor([1, 2, 3]),  # Wrong number of values
+    "é",
+])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    """Test that malformed and mismatched cursors are answered with 400."""
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 2)
+    
+    assert error.value.status_code == 400
+
+def test_keyset_filter_single_field():
+    """Test that a sort on one field filters on that field alone."""
+    assert keyset_filter([("upload_date", -1)], ["d"]) == {"upload_date": {"$lt": "d"}}
+    assert keyset_filter([("name", 1)], ["n"]) == {"name": {"$gt": "n"}}
+
+def test_keyset_filter_several_fields():
+    """Test that ties on the leading sort fields are broken by the following ones."""
+    sort = [("fiscal_year", -1), ("company_name", 1), ("_id", -1)]
+    
+    assert keyset_filter(sort, [2023, "Acme", "id"]) == {"$or": [
+        {"fiscal_year": {"$lt": 2023}},
+        {"fiscal_year": 2023, "company_name": {"$gt": "Acme"}},
+        {"fiscal_year": 2023, "company_name": "Acme", "_id": {"$lt": "id"}},
+    ]}
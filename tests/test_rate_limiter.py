@@ -0,0 +1,77 @@
+
+import asyncio
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the clock and sleep of the rate limiter with a simulated clock."""
+    now = [0.0]
+    sleeps = []
+    
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", sleep)
+    return now, sleeps
+
+@pytest.mark.asyncio
+async def test_burst_up_to_capacity(clock):
+    """Test that up to capacity tokens are taken without waiting."""
+    _, sleeps = clock
+    bucket = TokenBucket(rate=2, capacity=3)
+    
+    for _ in range(3):
+        await bucket.acquire()
+    
+    assert sleeps == []
+
+@pytest.mark.asyncio
+async def test_waits_for_refill(clock):
+    """Test that once the bucket is empty a call waits for the tokens to be added."""
+    now, sleeps = clock
+    bucket = TokenBucket(rate=2, capacity=1)
+    
+    await bucket.acquire()
+    await bucket.acquire()
+    assert sleeps == [pytest.approx(0.5)]
+    
+    await bucket.acquire(tokens=1)
+    assert now[0] == pytest.approx(1.0)
+
+@pytest.mark.asyncio
+async def test_refill_is_capped_at_capacity(clock):
+    """Test that an idle bucket does not store more than its capacity."""
+    now, sleeps = clock
+    bucket = TokenBucket(rate=10, capacity=2)
+    
+    now[0] += 60
+    for _ in range(3):
+        await bucket.acquire()
+    
+    assert sleeps == [pytest.approx(0.1)]
+
+@pytest.mark.asyncio
+async def test_zero_rate_disables_limit(clock):
+    """Test that a rate of zero never waits."""
+    _, sleeps = clock
+    bucket = TokenBucket(rate=0, capacity=1)
+    
+    for _ in range(10):
+        await bucket.acquire()
+    
+    assert sleeps == []
+
+@pytest.mark.asyncio
+async def test_waiters_share_the_rate(clock):
+    """Test that concurrent callers are spread over time at the configured rate."""
+    now, _ = clock
+    bucket = TokenBucket(rate=4, capacity=1)
+    
+    await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+    
+    assert now[0] == pytest.approx(1.0)
@@ -0,0 +1,49 @@
+
+from app.services.report_search import make_snippet, snippet_patterns
+
+def test_snippet_patterns_prefer_phrases():
+    """Test that a quoted phrase is looked for before the single terms."""
+    phrase, terms = snippet_patterns('"going concern" audit')
+    
+    assert phrase.search("Material uncertainty on Going\n concern.").group() == "Going\n concern"
+    assert phrase.search("going on, no concern") is None
+    assert terms.search("An audit.").group() == "audit"
+
+def test_snippet_patterns_leave_out_negated_terms():
+    """Test that negated terms are not highlighted."""
+    (terms,) = snippet_patterns("risk -covid")
+    
+    assert terms.search("covid only") is None
+    assert terms.search("Principal RISKS").group() == "RISK"
+
+def test_snippet_patterns_match_word_prefixes():
+    """Test that terms match at the start of words only, longest term first."""
+    (terms,) = snippet_patterns("risk risks")
+    
+    assert terms.search("asterisk") is None
+    assert terms.search("the risks").group() == "risks"
+
+def test_snippet_patterns_escape_terms():
+    """Test that punctuation of the query does not end up in a pattern."""
+    assert snippet_patterns("") == []
+    assert snippet_patterns("-excluded") == []
+    (terms,) = snippet_patterns("c++ (audit)")
+    
+    assert terms.search("the audit").group() == "audit"
+
+def test_make_snippet_places_hit():
+    """Test that the snippet is cut around the hit, with ellipses where the text was cut."""
+    text = "x " * 100 + "dividend policy" + " y" * 100
+    
+    snippet = make_snippet(text, snippet_patterns("dividend"), 60)
+    
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "dividend" in snippet
+    assert snippet.index("dividend") < len(snippet) // 2
+
+def test_make_snippet_without_hit():
+    """Test that the start of the page is returned when nothing matches."""
+    text = "Chairman's   statement\nand more."
+    
+    assert make_snippet(text, snippet_patterns("dividend"), 100) == "Chairman's statement and more."
+    assert make_snippet(text, [], 10) == "Chairman's…"
@@ -0,0 +1,60 @@
+
+from app.services.retrieval import BM25Index, Passage, chunk_pages, tokenize
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    """Test that terms are lower-cased and stopwords and single characters dropped."""
+    assert tokenize("The Audit Committee of a Company, 2023 (b)") == ["audit", "committee", "company", "2023"]
+
+def test_chunk_pages_overlaps_and_cuts_at_whitespace():
+    """Test that passages overlap, end at whitespace and are located by page and offset."""
+    text = "alpha beta gamma delta epsilon zeta eta theta"
+    passages = chunk_pages([(3, text)], passage_chars=20, overlap_chars=5)
+    
+    assert all(passage.page_number == 3 for passage in passages)
+    assert all(len(passage.text) <= 20 for passage in passages)
+    for passage in passages:
+        assert text[passage.offset:].startswith(passage.text)
+        # No word is cut at the end of a passage
+        end = passage.offset + len(passage.text)
+        assert end == len(text) or text[end] == " "
+    
+    # Consecutive passages share text and together cover the page
+    for previous, current in zip(passages, passages[1:]):
+        assert current.offset < previous.offset + len(previous.text)
+    assert passages[0].offset == 0
+    assert passages[-1].text.endswith("theta")
+
+def test_chunk_pages_never_spans_pages():
+    """Test that each page is split on its own and empty pages give no passages."""
+    passages = chunk_pages([(1, "first page"), (2, "   "), (3, "third page")], passage_chars=100, overlap_chars=10)
+    
+    assert passages == [Passage(1, 0, "first page"), Passage(3, 0, "third page")]
+
+def test_chunk_pages_without_whitespace():
+    """Test that text without whitespace is still split into passages of the maximum length."""
+    passages = chunk_pages([(1, "x" * 25)], passage_chars=10, overlap_chars=0)
+    
+    assert [passage.offset for passage in passages] == [0, 10, 20]
+    assert [len(passage.text) for passage in passages] == [10, 10, 5]
+
+def test_bm25_search_ranks_matching_passages():
+    """Test that the best passages containing query terms are returned, in page order."""
+    passages = [
+        Passage(1, 0, "Revenue grew in all segments."),
+        Passage(2, 0, "The audit committee reviewed the audit plan and the audit fees."),
+        Passage(3, 0, "Dividends were paid twice."),
+        Passage(4, 0, "The committee met four times."),
+    ]
+    index = BM25Index(passages)
+    
+    assert index.search("audit committee", top_k=2) == [passages[1], passages[3]]
+    assert index.search("audit committee", top_k=1) == [passages[1]]
+    assert index.search("dividends", top_k=5) == [passages[2]]
+
+def test_bm25_search_falls_back_to_first_passages():
+    """Test that a query with no known term returns the first passages of the report."""
+    passages = [Passage(page, 0, f"page {page} text") for page in range(1, 5)]
+    index = BM25Index(passages)
+    
+    assert index.search("whistleblower", top_k=2) == passages[:2]
+    assert BM25Index([]).search("audit", top_k=3) == []
@@ -0,0 +1,79 @@
+
+import pytest
+from types import SimpleNamespace
+from beanie import PydanticObjectId
+
+from app.models.regulatory_requirement import RequirementRules
+from app.services.rule_matcher import RuleMatcher, validate_rules
+
+def make_requirement(name, **rules):
+    """Build a stand-in requirement carrying only what the matcher reads."""
+    return SimpleNamespace(id=PydanticObjectId(), name=name, rules=RequirementRules(**rules) if rules else None)
+
+@pytest.mark.parametrize("pattern", [
+    "(?i)risk factors",  # Global flag, not at the start once combined
+    r"(a)\1",  # Backreference
+    r"(a)(?(1)b|c)",  # Conditional on a group
+    "x*",  # Matches the empty string
+    "(?=risk)",  # Zero-width
+    "(?P<name>risk)",  # Named group
+    "risk(",  # Invalid
+])
+def test_validate_rules_rejects_unusable_patterns(pattern):
+    """Test that patterns which do not survive the combined expression are rejected."""
+    with pytest.raises(ValueError):
+        validate_rules(RequirementRules(patterns=[pattern]))
+
+def test_validate_rules_accepts_scoped_flags_and_keywords():
+    """Test that scoped flags, plain groups and keywords are accepted."""
+    validate_rules(RequirementRules(patterns=["(?i:risk) factors", r"(audit|review)\s+committee"], keywords=["going concern"]))
+
+def test_validate_rules_rejects_empty_keyword():
+    """Test that an empty keyword, which matches everywhere, is rejected."""
+    with pytest.raises(ValueError):
+        validate_rules(RequirementRules(keywords=[""]))
+
+def test_scan_finds_overlapping_matches():
+    """Test that requirements matching the same text are all found, at their first match."""
+    risk = make_requirement("Risk", patterns=[r"risk\s+factors"])
+    factors = make_requirement("Factors", keywords=["factors"])
+    same_start = make_requirement("Same start", keywords=["risk"])
+    absent = make_requirement("Absent", keywords=["whistleblower"], non_compliant_if_absent=True)
+    matcher = RuleMatcher([risk, factors, same_start, absent])
+    
+    matches = matcher.scan([(1, "Nothing here."), (2, "Our RISK factors are listed. More factors.")])
+    
+    assert matches[risk.id].page_number == 2
+    assert matches[risk.id].offset == 4
+    assert matches[factors.id].offset == 9
+    assert matches[same_start.id].offset == 4
+    assert matches[same_start.id].snippet == "Our RISK factors are listed. More factors."
+    assert absent.id not in matches
+
+def test_decide():
+    """Test verdicts for matched, absent and inconclusive requirements."""
+    matched = make_requirement("Matched", keywords=["audit"])
+    absent = make_requirement("Absent", keywords=["whistleblower"], non_compliant_if_absent=True)
+    open_ended = make_requirement("Open", keywords=["dividend"])
+    no_rules = make_requirement("No rules")
+    matcher = RuleMatcher([matched, absent, open_ended, no_rules])
+    matches = matcher.scan([(1, "The audit committee met twice.")])
+    
+    assert matcher.decide(matched, matches.get(matched.id))["is_compliant"] is True
+    assert matcher.decide(absent, matches.get(absent.id))["is_compliant"] is False
+    assert matcher.decide(open_ended, matches.get(open_ended.id)) is None
+    assert matcher.decide(no_rules, None) is None
+
+def test_invalid_stored_rules_are_left_to_the_llm():
+    """Test that rules stored before validation was tightened never settle a requirement."""
+    # Bypass validation, as for rules already in the database
+    rules = RequirementRules.construct(patterns=["x*"], keywords=[], non_compliant_if_absent=True, confidence=0.95)
+    invalid = SimpleNamespace(id=PydanticObjectId(), name="Invalid", rules=rules)
+    valid = make_requirement("Valid", keywords=["audit"])
+    matcher = RuleMatcher([invalid, valid])
+    
+    matches = matcher.scan([(1, "An audit.")])
+    
+    assert invalid.id not in matches
+    assert matcher.decide(invalid, None) is None
+    assert matcher.decide(valid, matches.get(valid.id))["is_compliant"] is True
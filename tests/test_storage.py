@@ -0,0 +1,130 @@
+
+import os
+import boto3
+import pytest
+from types import SimpleNamespace
+from moto import mock_aws
+
+from app.core.config import settings
+from app.services.storage import LocalStorageBackend, S3StorageBackend, StoredObjectNotFoundError
+from app.services.upload_store import blob_key, report_blob_key
+
+BUCKET = "test-reports"
+
+# Smallest part size S3 accepts, so larger files go up in several parts
+PART_SIZE = 5 * 1024 * 1024
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    path = tmp_path / "uploads"
+    path.mkdir()
+    monkeypatch.setattr(settings, "TEMP_UPLOAD_DIR", str(path))
+    return path
+
+@pytest.fixture
+def s3_storage(upload_dir):
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield S3StorageBackend(
+            BUCKET,
+            prefix="reports",
+            region="us-east-1",
+            access_key_id="testing",
+            secret_access_key="testing",
+            part_size=PART_SIZE
+        )
+
+def write_file(directory, name, content):
+    path = directory / name
+    path.write_bytes(content)
+    return str(path)
+
+async def read_all(storage, key, start, length, chunk_size=None):
+    return b"".join([chunk async for chunk in storage.read_range(key, start, length, chunk_size)])
+
+@pytest.mark.asyncio
+async def test_s3_put_file_and_size(s3_storage, upload_dir):
+    """Test storing a file in S3, in several parts, and reading its size."""
+    content = os.urandom(PART_SIZE + 1024)
+    await s3_storage.put_file("blobs/ab/cd/abcd.pdf", write_file(upload_dir, "report.pdf", content))
+    
+    assert await s3_storage.size("blobs/ab/cd/abcd.pdf") == len(content)
+    assert await s3_storage.size("blobs/ab/cd/missing.pdf") is None
+    
+    # Keys are stored under the prefix
+    stored = boto3.client("s3", region_name="us-east-1").head_object(Bucket=BUCKET, Key="reports/blobs/ab/cd/abcd.pdf")
+    assert stored["ContentType"] == "application/pdf"
+
+@pytest.mark.asyncio
+async def test_s3_read_range(s3_storage, upload_dir):
+    """Test reading byte ranges of an S3 object in chunks."""
+    content = bytes(range(256)) * 40
+    await s3_storage.put_file("report.pdf", write_file(upload_dir, "report.pdf", content))
+    
+    assert await read_all(s3_storage, "report.pdf", 0, len(content)) == content
+    assert await read_all(s3_storage, "report.pdf", 100, 1000, chunk_size=64) == content[100:1100]
+    assert await read_all(s3_storage, "report.pdf", 5, 0) == b""
+
+@pytest.mark.asyncio
+async def test_s3_read_range_missing_object(s3_storage):
+    """Test that reading a missing S3 object raises StoredObjectNotFoundError."""
+    with pytest.raises(StoredObjectNotFoundError):
+        await read_all(s3_storage, "missing.pdf", 0, 10)
+
+@pytest.mark.asyncio
+async def test_s3_local_copy(s3_storage, upload_dir):
+    """Test that a local copy of an S3 object has its content and is removed afterwards."""
+    content = os.urandom(4096)
+    await s3_storage.put_file("report.pdf", write_file(upload_dir, "report.pdf", content))
+    
+    async with s3_storage.local_copy("report.pdf") as path:
+        with open(path, "rb") as file:
+            assert file.read() == content
+    
+    assert not os.path.exists(path)
+
+@pytest.mark.asyncio
+async def test_s3_local_copy_missing_object(s3_storage, upload_dir):
+    """Test that copying a missing S3 object raises and leaves no file behind."""
+    with pytest.raises(StoredObjectNotFoundError):
+        async with s3_storage.local_copy("missing.pdf"):
+            pass
+    
+    assert not any(name.startswith(".download-") for name in os.listdir(upload_dir))
+
+@pytest.mark.asyncio
+async def test_s3_delete(s3_storage, upload_dir):
+    """Test deleting an S3 object, and that deleting a missing one is not an error."""
+    await s3_storage.put_file("report.pdf", write_file(upload_dir, "report.pdf", b"%PDF-1.4"))
+    
+    await s3_storage.delete("report.pdf")
+    await s3_storage.delete("report.pdf")
+    
+    assert await s3_storage.size("report.pdf") is None
+
+@pytest.mark.asyncio
+async def test_local_storage(upload_dir, tmp_path):
+    """Test the local backend moves files into place and reads them back."""
+    storage = LocalStorageBackend(str(upload_dir))
+    content = b"0123456789" * 100
+    
+    await storage.put_file("blobs/ab/cd/abcd.pdf", write_file(tmp_path, "report.pdf", content))
+    
+    assert await storage.size("blobs/ab/cd/abcd.pdf") == len(content)
+    assert await read_all(storage, "blobs/ab/cd/abcd.pdf", 10, 20, chunk_size=7) == content[10:30]
+    
+    await storage.delete("blobs/ab/cd/abcd.pdf")
+    assert await storage.size("blobs/ab/cd/abcd.pdf") is None
+
+def test_report_blob_key(upload_dir):
+    """Test the storage key of reports from before storage keys and content hashes."""
+    sha256 = "ab" * 32
+    
+    assert report_blob_key(SimpleNamespace(storage_key="reports/x.pdf", content_hash=sha256, file_path=None)) == "reports/x.pdf"
+    assert report_blob_key(SimpleNamespace(storage_key=None, content_hash=sha256, file_path=None)) == blob_key(sha256)
+    
+    legacy = SimpleNamespace(storage_key=None, content_hash=None, file_path=os.path.join(str(upload_dir), "1234_report.pdf"))
+    assert report_blob_key(legacy) == "1234_report.pdf"
+    
+    outside = SimpleNamespace(storage_key=None, content_hash=None, file_path="/elsewhere/report.pdf")
+    assert report_blob_key(outside) is None